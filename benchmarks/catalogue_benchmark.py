@@ -0,0 +1,79 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from csv_reader_writer.episodes_catalogue import iter_episodes, read_episodes, write_episodes
+from model.podcast.episode import Episode
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark reading a synthetic episodes catalogue from csv, parquet '
+                                                 'and sqlite')
+    parser.add_argument('--episodes', type=int, default=200_000, help='Number of synthetic episodes')
+    parser.add_argument('--episodes-per-pid', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3, help='Best of this many runs is reported')
+    return parser.parse_args()
+
+
+def synthetic_episodes(num_episodes: int, episodes_per_pid: int) -> List[Episode]:
+    return [Episode(pid=i // episodes_per_pid,
+                    eid=i,
+                    programme_title=f'Programme {i // episodes_per_pid}',
+                    episode_title=f'Episode {i}',
+                    episode_date=datetime(2010, 1, 1) + timedelta(days=i % episodes_per_pid),
+                    duration_seconds=1800,
+                    og_title=f'Episode {i} - Programme {i // episodes_per_pid}',
+                    og_description=f'Description of episode {i}',
+                    cids=[1, 2],
+                    category_names=['Category 1', 'Category 2'],
+                    file_url=f'https://podcasts.rthk.hk/podcast/media/{i}.mp4',
+                    language='zh-CN',
+                    format='video')
+            for i in range(num_episodes)]
+
+
+def _best_of(repeat: int, read: Callable[[], List[Episode]]) -> str:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        episodes = read()
+        timings.append(time.perf_counter() - started_at)
+    return f'{min(timings):.2f}s for {len(episodes)} episodes'
+
+
+def _peak_memory(read: Callable[[], List[Episode]]) -> str:
+    # Python allocations only; pyarrow's own buffers aren't traced
+    tracemalloc.start()
+    read()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return f'{peak / 1024 / 1024:.1f}MiB'
+
+
+def _run(args: argparse.Namespace):
+    episodes = synthetic_episodes(args.episodes, args.episodes_per_pid)
+    pids = sorted({episode.pid for episode in episodes})[::50]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for suffix in ['.csv', '.parquet', '.sqlite']:
+            path = os.path.join(tmp_dir, f'episodes{suffix}')
+            write_episodes(episodes, path)
+            print(f'{suffix}: {os.path.getsize(path) / 1024 / 1024:.1f}MiB')
+            print(f'{suffix} full read: {_best_of(args.repeat, lambda: read_episodes(path))}')
+            print(f'{suffix} read of {len(pids)} pids: '
+                  f'{_best_of(args.repeat, lambda: read_episodes(path, filters=[("pid", "in", pids)]))}')
+            print(f'{suffix} read of dates and urls: '
+                  f'{_best_of(args.repeat, lambda: read_episodes(path, columns=["episode_date", "file_url"]))}')
+            filters = [('pid', 'in', pids)]
+            print(f'{suffix} peak memory of read of {len(pids)} pids: '
+                  f'{_peak_memory(lambda: read_episodes(path, filters=filters))} with read_episodes, '
+                  f'{_peak_memory(lambda: list(iter_episodes(path, filters=filters)))} with iter_episodes')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    _run(_parse_args())
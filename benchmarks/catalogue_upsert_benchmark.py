@@ -0,0 +1,54 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.catalogue_benchmark import synthetic_episodes
+from csv_reader_writer.episodes_catalogue import iter_episodes, read_episodes, upsert_episodes, write_episodes
+from csv_reader_writer.episodes_csv_merger import compact_segments
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark updating the episodes of one pid in a synthetic csv '
+                                                 'catalogue by rewriting it vs upserting them')
+    parser.add_argument('--episodes', type=int, default=200_000, help='Number of synthetic episodes')
+    parser.add_argument('--episodes-per-pid', type=int, default=500)
+    parser.add_argument('--segments', type=int, default=10, help='Number of upserts before reading and compacting')
+    return parser.parse_args()
+
+
+def _time(update: Callable[[], object]) -> str:
+    started_at = time.perf_counter()
+    update()
+    return f'{time.perf_counter() - started_at:.3f}s'
+
+
+def _rewrite(path: str, pid_episodes):
+    episodes_by_pid_eid = {(e.pid, e.eid): e for e in read_episodes(path)}
+    episodes_by_pid_eid.update(((e.pid, e.eid), e) for e in pid_episodes)
+    write_episodes(list(episodes_by_pid_eid.values()), path)
+
+
+def _run(args: argparse.Namespace):
+    episodes = synthetic_episodes(args.episodes, args.episodes_per_pid)
+    updated_episodes = [e._replace(episode_title=f'{e.episode_title} updated') for e in episodes]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'episodes.csv')
+        write_episodes(episodes, path)
+        pid_episodes = updated_episodes[:args.episodes_per_pid]
+        print(f'{len(pid_episodes)} episodes of one pid in a catalogue of {len(episodes)}')
+        print(f'read, update and rewrite: {_time(lambda: _rewrite(path, pid_episodes))}')
+        write_episodes(episodes, path)
+        print(f'upsert: {_time(lambda: upsert_episodes(pid_episodes, path))}')
+        for i in range(1, args.segments):
+            upsert_episodes(updated_episodes[i * args.episodes_per_pid:(i + 1) * args.episodes_per_pid], path)
+        print(f'read with {args.segments} segments: {_time(lambda: list(iter_episodes(path)))}')
+        print(f'compact {args.segments} segments: {_time(lambda: compact_segments(path))}')
+        print(f'read compacted: {_time(lambda: list(iter_episodes(path)))}')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    _run(_parse_args())
@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.crawl_order import largest_first_as_estimated
+from crawler.podcast.episode_list_crawler import EpisodeListCrawler
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from crawler.podcast.work_queue import WorkQueue
+from model.podcast.episode import Episode
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark crawl time of pids in discovered vs largest-first order, '
+                                                 'on a site where a few programmes have many more years')
+    parser.add_argument('--pids', type=int, default=60, help='Number of synthetic programmes to crawl')
+    parser.add_argument('--huge-every', type=int, default=20, help='Every nth programme is huge, the last one first')
+    parser.add_argument('--years', type=int, default=2, help='Years of most programmes')
+    parser.add_argument('--huge-years', type=int, default=10, help='Years of huge programmes')
+    parser.add_argument('--episodes-per-year', type=int, default=10)
+    parser.add_argument('--huge-episodes-per-year', type=int, default=100, help='Episodes per year of huge programmes')
+    parser.add_argument('--skip-episode-pages', default=False, action='store_true')
+    parser.add_argument('--pid-workers', type=int, default=10)
+    parser.add_argument('--eid-workers', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds of server latency per response')
+    parser.add_argument('--bandwidth', type=int, default=256 * 1024, help='Server bytes per second per response')
+    return parser.parse_args()
+
+
+async def _crawl(server: ReplayServer, pids: List[int], args: argparse.Namespace, order: str) -> Dict[str, float]:
+    async with HttpClient(parallelism=args.eid_workers + args.pid_workers,
+                          url_rewrites=server.url_rewrites) as http_client, \
+            WorkQueue('pid', num_workers=args.pid_workers) as pid_work_queue, \
+            WorkQueue('eid', num_workers=args.eid_workers) as eid_work_queue:
+        crawler = EpisodeListCrawler(http_client, eid_work_queue=eid_work_queue)
+        requests_before = server.stats['requests']
+        started_at = time.perf_counter()
+        if order == 'largest-first':
+            pids_and_programme_pages = largest_first_as_estimated(pids, {}, crawler, num_workers=args.pid_workers)
+        else:
+            pids_and_programme_pages = ((pid, None) for pid in pids)
+
+        async def _crawl_pid(pid_and_programme_page: Tuple[int, Optional[Tuple[List[int], Episode]]]):
+            pid, programme_page = pid_and_programme_page
+            return await crawler.list_all_episodes(pid, fetch_episode_pages=not args.skip_episode_pages,
+                                                   programme_page=programme_page)
+
+        async for _ in pid_work_queue.map_unordered(_crawl_pid, pids_and_programme_pages):
+            pass
+        return {'seconds': time.perf_counter() - started_at, 'requests': server.stats['requests'] - requests_before}
+
+
+async def _run(args: argparse.Namespace):
+    site = SyntheticSite(num_programmes=args.pids,
+                         num_years_for_pid=lambda pid: args.huge_years if (pid + 1) % args.huge_every == 0
+                         else args.years,
+                         episodes_per_year_for_pid=lambda pid: args.huge_episodes_per_year
+                         if (pid + 1) % args.huge_every == 0 else args.episodes_per_year)
+    async with ReplayServer(site, latency=args.latency, bandwidth=args.bandwidth) as server:
+        # Discovered order puts the huge programmes at the end of every run of --huge-every pids
+        for order in ['discovered', 'largest-first']:
+            result = await _crawl(server, site.pids, args, order)
+            print(f'{order}: {result["seconds"]:.2f}s for {result["requests"]} requests')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_run(_parse_args()))
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import List
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.episode_list_crawler import EpisodeListCrawler
+from crawler.podcast.parse_pool import PARSE_POOL_KINDS, ParsePool
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from downloader.M3U8Downloader import M3U8Downloader
+from downloader.Mp4Downloader import Mp4Downloader
+from model.podcast.episode import Episode
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark crawlers and downloaders against a local replay server')
+    parser.add_argument('--pids', type=int, default=200, help='Number of synthetic programmes to crawl')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--episodes-per-year', type=int, default=20)
+    parser.add_argument('--downloads', type=int, default=20, help='Number of episodes to download per downloader')
+    parser.add_argument('--parallelism', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.01, help='Seconds of server latency per response')
+    parser.add_argument('--bandwidth', type=int, help='Server bytes per second per response')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--parse-pool', choices=PARSE_POOL_KINDS, default='process')
+    parser.add_argument('--parse-workers', type=int)
+    return parser.parse_args()
+
+
+async def _benchmark_episode_list_crawler(http_client: HttpClient, parse_pool: ParsePool,
+                                          pids: List[int]) -> List[Episode]:
+    crawler = EpisodeListCrawler(http_client, parse_pool)
+    started_at = time.perf_counter()
+    results = await asyncio.gather(*map(crawler.list_all_episodes, pids))
+    elapsed = time.perf_counter() - started_at
+    episodes = [episode for _, episodes_for_pid in results for episode in episodes_for_pid]
+    print(f'EpisodeListCrawler: {len(pids)} pids, {len(episodes)} episodes in {elapsed:.2f}s '
+          f'({len(episodes) / elapsed:.0f} episodes/s), parse stats: {parse_pool.stats}')
+    return episodes
+
+
+async def _benchmark_m3u8_downloader(http_client: HttpClient, episodes: List[Episode], out_dir: str):
+    # Only fetches playlists and chunks: merging chunks needs ffmpeg and isn't what we're measuring
+    downloader = M3U8Downloader(http_client)
+
+    async def _download(episode: Episode):
+        chunklist_url = await downloader._get_best_chunklist_url(episode.m3u8_url)
+        chunk_urls = await downloader._get_chunk_urls(chunklist_url)
+        progress_bar = await downloader._initialise_progress_bar(chunk_urls)
+        out_path = os.path.join(out_dir, f'rthk_{episode.pid}_{episode.eid}.mp4')
+        await asyncio.gather(*[downloader._download_and_save_chunk(i, chunk_url, out_path, progress_bar)
+                               for i, chunk_url in enumerate(chunk_urls)])
+        progress_bar.close()
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*map(_download, episodes))
+    elapsed = time.perf_counter() - started_at
+    print(f'M3U8Downloader: {len(episodes)} episodes, {_dir_size(out_dir) / 1024 ** 2:.1f} MB in {elapsed:.2f}s')
+
+
+async def _benchmark_mp4_downloader(http_client: HttpClient, episodes: List[Episode], out_dir: str):
+    downloader = Mp4Downloader(http_client)
+    started_at = time.perf_counter()
+    await asyncio.gather(*[downloader.save_download(episode.file_url,
+                                                    out_path=os.path.join(out_dir, f'{episode.eid}.mp4'))
+                           for episode in episodes])
+    elapsed = time.perf_counter() - started_at
+    print(f'Mp4Downloader: {len(episodes)} episodes, {_dir_size(out_dir) / 1024 ** 2:.1f} MB in {elapsed:.2f}s')
+
+
+def _dir_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+async def _run(args: argparse.Namespace):
+    site = SyntheticSite(num_programmes=args.pids, num_years=args.years, episodes_per_year=args.episodes_per_year)
+    async with ReplayServer(site,
+                            latency=args.latency,
+                            bandwidth=args.bandwidth,
+                            error_rate=args.error_rate) as server:
+        async with HttpClient(parallelism=args.parallelism, url_rewrites=server.url_rewrites) as http_client, \
+                ParsePool(args.parse_pool, max_workers=args.parse_workers) as parse_pool:
+            episodes = await _benchmark_episode_list_crawler(http_client, parse_pool, site.pids)
+            with tempfile.TemporaryDirectory() as m3u8_dir, tempfile.TemporaryDirectory() as mp4_dir:
+                await _benchmark_m3u8_downloader(http_client, episodes[:args.downloads], m3u8_dir)
+                await _benchmark_mp4_downloader(http_client, episodes[:args.downloads], mp4_dir)
+            print(f'Client stats: {http_client.stats}, host limits: {http_client.host_limits()}')
+        print(f'Server stats: {dict(server.stats)}')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_run(_parse_args()))
@@ -0,0 +1,58 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+from benchmarks.catalogue_benchmark import synthetic_episodes
+from csv_reader_writer.episodes_csv_merger import EpisodesCsvMerger
+from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from csv_reader_writer.episodes_csv_writer import EpisodesCsvWriter
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark combining per-pid csvs by reading them all vs merging them')
+    parser.add_argument('--episodes', type=int, default=200_000, help='Number of synthetic episodes')
+    parser.add_argument('--episodes-per-pid', type=int, default=200)
+    parser.add_argument('--parallelism', type=int, default=4)
+    return parser.parse_args()
+
+
+def _measure(combine: Callable[[], object]) -> str:
+    # Python allocations of this process only
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    combine()
+    seconds = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return f'{seconds:.2f}s, {peak / 1024 / 1024:.1f}MiB peak'
+
+
+def _read_and_write(pid_paths, path: str):
+    episodes = [episode for pid_path in pid_paths for episode in EpisodesCsvReader().read_to_episodes(pid_path)]
+    EpisodesCsvWriter(episodes).write_to_csv(path)
+
+
+def _run(args: argparse.Namespace):
+    episodes = synthetic_episodes(args.episodes, args.episodes_per_pid)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pid_paths = []
+        for i in range(0, len(episodes), args.episodes_per_pid):
+            pid_paths.append(os.path.join(tmp_dir, f'{episodes[i].pid}.rthk.tmp.csv'))
+            EpisodesCsvWriter(episodes[i:i + args.episodes_per_pid]).write_to_csv(pid_paths[-1])
+        del episodes
+        print(f'{len(pid_paths)} per-pid csvs')
+        print(f'read all and write: {_measure(lambda: _read_and_write(pid_paths, os.path.join(tmp_dir, "a.csv")))}')
+        merger = EpisodesCsvMerger(pid_paths)
+        print(f'merge: {_measure(lambda: merger.merge_to_csv(os.path.join(tmp_dir, "b.csv")))}')
+        merger = EpisodesCsvMerger(pid_paths, parallelism=args.parallelism)
+        print(f'merge with {args.parallelism} processes: '
+              f'{_measure(lambda: merger.merge_to_csv(os.path.join(tmp_dir, "c.csv")))}')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    _run(_parse_args())
@@ -0,0 +1,60 @@
+import argparse
+import ast
+import logging
+import math
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.catalogue_benchmark import synthetic_episodes
+from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from csv_reader_writer.episodes_csv_writer import EpisodesCsvWriter
+from model.podcast.episode import Episode
+from util.dates import ymd_to_date
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark EpisodesCsvReader against reading row by row with iterrows')
+    parser.add_argument('--episodes', type=int, default=200_000, help='Number of synthetic episodes')
+    parser.add_argument('--episodes-per-pid', type=int, default=500)
+    return parser.parse_args()
+
+
+def _read_with_iterrows(path: str) -> List[Episode]:
+    # EpisodesCsvReader before columns were converted at once
+    def _nan_to_none(v: any) -> any:
+        if isinstance(v, float) and math.isnan(v):
+            return None
+        return v
+
+    def _parse_list(s: str) -> List[str]:
+        return ast.literal_eval(s) if s else []
+
+    frame = pd.read_csv(path,
+                        parse_dates=['episode_date'],
+                        date_parser=np.vectorize(ymd_to_date),
+                        converters={'cids': _parse_list, 'category_names': _parse_list})
+    return [Episode(**{k: _nan_to_none(v) for k, v in row.to_dict().items()}) for i, row in frame.iterrows()]
+
+
+def _run(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'episodes.csv')
+        EpisodesCsvWriter(synthetic_episodes(args.episodes, args.episodes_per_pid)).write_to_csv(path)
+        timings = {}
+        for name, read in [('iterrows', _read_with_iterrows),
+                           ('EpisodesCsvReader', EpisodesCsvReader().read_to_episodes)]:
+            started_at = time.perf_counter()
+            episodes = read(path)
+            timings[name] = time.perf_counter() - started_at
+            print(f'{name}: {timings[name]:.2f}s for {len(episodes)} episodes')
+        print(f'speedup: {timings["iterrows"] / timings["EpisodesCsvReader"]:.1f}x')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    _run(_parse_args())
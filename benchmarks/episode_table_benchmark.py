@@ -0,0 +1,42 @@
+import argparse
+import gc
+import logging
+import os
+import tempfile
+import tracemalloc
+from typing import Callable
+
+from benchmarks.catalogue_benchmark import synthetic_episodes
+from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from csv_reader_writer.episodes_csv_writer import EpisodesCsvWriter
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark memory of a catalogue held as Episodes vs an EpisodeTable')
+    parser.add_argument('--episodes', type=int, default=200_000, help='Number of synthetic episodes')
+    parser.add_argument('--episodes-per-pid', type=int, default=500)
+    return parser.parse_args()
+
+
+def _measure(read: Callable[[], object]) -> str:
+    gc.collect()
+    tracemalloc.start()
+    catalogue = read()
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return f'{held / 1024 / 1024:.1f}MiB held ({held / len(catalogue):.0f} bytes per episode), ' \
+           f'{peak / 1024 / 1024:.1f}MiB peak while reading'
+
+
+def _run(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'episodes.csv')
+        EpisodesCsvWriter(synthetic_episodes(args.episodes, args.episodes_per_pid)).write_to_csv(path)
+        print(f'Episodes: {_measure(lambda: EpisodesCsvReader().read_to_episodes(path))}')
+        print(f'EpisodeTable: {_measure(lambda: EpisodesCsvReader().read_to_episode_table(path))}')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    _run(_parse_args())
@@ -0,0 +1,61 @@
+import argparse
+import glob
+import os
+import time
+from typing import Callable, List
+
+import ujson
+
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from parser.podcast.beautiful_soup_item_page_parser import BeautifulSoupItemPageParser
+from parser.podcast.item_page_parser import ItemPage, ItemPageParser
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark item.php parsing with lxml against BeautifulSoup')
+    parser.add_argument('--recorded-dir', help='HTTP cache directory from list-podcast-programmes with item.php pages')
+    parser.add_argument('--pages', type=int, default=500, help='Number of synthetic pages when not replaying')
+    parser.add_argument('--repeat', type=int, default=3)
+    return parser.parse_args()
+
+
+def _load_pages(args: argparse.Namespace) -> List[str]:
+    if args.recorded_dir:
+        pages = []
+        for path in glob.iglob(os.path.join(args.recorded_dir, '*', '*.json')):
+            with open(path, encoding='utf-8') as f:
+                response = ujson.load(f)
+            if '/item.php?' in response['url']:
+                pages.append(response['body'])
+        return pages
+    site = SyntheticSite(num_programmes=max(1, args.pages // 30), num_years=3, episodes_per_year=10)
+    pages = [site.item_html(pid) for pid in site.pids]
+    pages += [site.item_html(pid, e.eid) for pid in site.pids for year in site.years(pid)
+              for e in site.episodes(pid, year)]
+    return pages[:args.pages]
+
+
+def _benchmark(name: str, parse: Callable[[str], ItemPage], pages: List[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for page in pages:
+            parse(page)
+        best = min(best, time.perf_counter() - started_at)
+    print(f'{name}: {len(pages)} pages in {best:.3f}s ({len(pages) / best:.0f} pages/s)')
+    return best
+
+
+def _run(args: argparse.Namespace):
+    pages = _load_pages(args)
+    parser = ItemPageParser()
+    beautiful_soup_parser = BeautifulSoupItemPageParser()
+    mismatches = sum(parser.parse(page) != beautiful_soup_parser.parse(page) for page in pages)
+    print(f'{mismatches} of {len(pages)} pages parse differently')
+    beautiful_soup_time = _benchmark('BeautifulSoup', beautiful_soup_parser.parse, pages, args.repeat)
+    lxml_time = _benchmark('ItemPageParser', parser.parse, pages, args.repeat)
+    print(f'Speedup: {beautiful_soup_time / lxml_time:.1f}x')
+
+
+if __name__ == '__main__':
+    _run(_parse_args())
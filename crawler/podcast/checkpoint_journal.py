@@ -0,0 +1,124 @@
+import logging
+import os
+import sqlite3
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import ujson
+
+from model.podcast.episode import Episode
+from util.dates import date_to_ymd, ymd_to_date
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS years (pid INTEGER, year INTEGER, episodes TEXT, PRIMARY KEY (pid, year));
+CREATE TABLE IF NOT EXISTS episode_pages (pid INTEGER, eid INTEGER, episode TEXT, PRIMARY KEY (pid, eid));
+CREATE TABLE IF NOT EXISTS pids (pid INTEGER PRIMARY KEY, episodes TEXT);
+'''
+
+
+class CheckpointJournal:
+    """
+    Durable record of crawl work as it completes: episodeList.php years, episode pages and finished pids.
+    A crawl restarted with the same journal skips exactly the work recorded in it.
+    Every record is committed on its own, so a crash loses at most the requests in flight.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> 'CheckpointJournal':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        self._connection = sqlite3.connect(self._path)
+        # WAL with synchronous=NORMAL keeps commits cheap while surviving process crashes
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+        num_pids, = self._connection.execute('SELECT COUNT(*) FROM pids').fetchone()
+        num_pages, = self._connection.execute('SELECT COUNT(*) FROM episode_pages').fetchone()
+        logging.info(f'Opened checkpoint journal with {num_pids} finished pids and {num_pages} episode pages '
+                     f'of unfinished pids: {self._path}')
+
+    def close(self):
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+    def delete(self):
+        self.close()
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(self._path + suffix):
+                os.remove(self._path + suffix)
+
+    def finished_pids(self) -> List[int]:
+        return [pid for pid, in self._connection.execute('SELECT pid FROM pids')]
+
+    def finished_pid_episodes(self) -> Iterator[Tuple[int, List[Episode]]]:
+        for pid, episodes in self._connection.execute('SELECT pid, episodes FROM pids ORDER BY pid'):
+            yield pid, _load_episodes(episodes)
+
+    def record_finished_pid(self, pid: int, episodes: List[Episode]):
+        # Supersedes the pid's years and episode pages, which are no longer needed
+        with self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO pids VALUES (?, ?)', (pid, _dump_episodes(episodes)))
+            self._connection.execute('DELETE FROM years WHERE pid = ?', (pid,))
+            self._connection.execute('DELETE FROM episode_pages WHERE pid = ?', (pid,))
+
+    def year_episodes(self, pid: int) -> Dict[int, List[Episode]]:
+        return {year: _load_episodes(episodes)
+                for year, episodes in self._connection.execute('SELECT year, episodes FROM years WHERE pid = ?',
+                                                               (pid,))}
+
+    def record_year(self, pid: int, year: int, episodes: List[Episode]):
+        with self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO years VALUES (?, ?, ?)',
+                                     (pid, year, _dump_episodes(episodes)))
+
+    def episode_pages(self, pid: int) -> Dict[int, Episode]:
+        return {eid: _load_episode(episode)
+                for eid, episode in self._connection.execute('SELECT eid, episode FROM episode_pages WHERE pid = ?',
+                                                             (pid,))}
+
+    def record_episode_page(self, episode: Episode):
+        with self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO episode_pages VALUES (?, ?, ?)',
+                                     (episode.pid, episode.eid, _dump_episode(episode)))
+
+
+def _episode_to_json(episode: Episode) -> dict:
+    def _to_json_value(value):
+        if value is None or value != value:  # None, nan or NaT
+            return None
+        if isinstance(value, date):
+            return date_to_ymd(value)
+        return value
+
+    return {field: _to_json_value(value) for field, value in episode._asdict().items()}
+
+
+def _episode_from_json(fields: dict) -> Episode:
+    if fields['episode_date']:
+        fields['episode_date'] = ymd_to_date(fields['episode_date'])
+    return Episode(**fields)
+
+
+def _load_episode(episode: str) -> Episode:
+    return _episode_from_json(ujson.loads(episode))
+
+
+def _dump_episode(episode: Episode) -> str:
+    return ujson.dumps(_episode_to_json(episode), ensure_ascii=False)
+
+
+def _dump_episodes(episodes: List[Episode]) -> str:
+    return ujson.dumps([_episode_to_json(episode) for episode in episodes], ensure_ascii=False)
+
+
+def _load_episodes(episodes: str) -> List[Episode]:
+    return [_episode_from_json(fields) for fields in ujson.loads(episodes)]
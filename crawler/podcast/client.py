@@ -1,123 +1,379 @@
 import asyncio
+import collections
+import functools
 import logging
 import os
 import re
-from typing import Optional
+import time
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
 
 import aiofiles
 import aiohttp
 import tqdm
 from aiohttp import ClientError
 
+from crawler.podcast.host_limiter import PerHostLimiter
+from crawler.podcast.request_coalescer import RequestCoalescer
+from crawler.podcast.response_cache import ResponseCache
+from crawler.podcast.retry_policy import CircuitOpenError, PerHostCircuitBreaker, RetryPolicy, RetryableStatusError
 
-async def get(url: str, sem: asyncio.Semaphore):
+T = TypeVar('T')
+P = TypeVar('P')
+
+_RETRYABLE_ERRORS = (ClientError, asyncio.TimeoutError, RetryableStatusError)
+
+
+class NotResumableError(Exception):
+    pass
+
+
+class ConditionalResponse(NamedTuple):
+    status: int
+    body: Optional[bytes]  # None if not modified
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class HttpClient:
     """
-    >>> '<!doctype html>' in asyncio.run(get('http://google.com', sem=asyncio.Semaphore()))
+    Long-lived HTTP client shared by all crawlers and downloaders of a run.
+    Connections are pooled and kept alive, so requests to the same host reuse TCP/TLS sessions.
+    Concurrency per host adapts to how the host responds, never exceeding limit_per_host (or parallelism if unset).
+    Every request is retried according to retry_policy, and hosts that keep failing are cut off by a circuit breaker.
+    Text requests for the same url are fetched once per run, keeping up to memory_cache_bytes of bodies in memory.
+
+    >>> async def _get(url: str) -> str:
+    ...     async with HttpClient() as client:
+    ...         return await client.get(url)
+    >>> '<!doctype html>' in asyncio.run(_get('http://google.com'))
     True
     """
-    async with sem:
-        async with aiohttp.ClientSession() as client:
-            async with client.get(url) as resp:
-                text = await resp.text()
-    return text
 
+    def __init__(self,
+                 parallelism: int = 20,
+                 limit_per_host: int = 0,
+                 dns_cache_ttl: int = 300,
+                 keepalive_timeout: float = 60,
+                 connect_timeout: Optional[float] = 60,
+                 read_timeout: Optional[float] = 300,
+                 response_cache: Optional[ResponseCache] = None,
+                 memory_cache_bytes: int = 32 * 1024 ** 2,
+                 retry_policy: RetryPolicy = RetryPolicy(),
+                 circuit_breaker: Optional[PerHostCircuitBreaker] = None,
+                 url_rewrites: Optional[Dict[str, str]] = None):
+        self._parallelism = parallelism
+        self._limit_per_host = limit_per_host
+        self._dns_cache_ttl = dns_cache_ttl
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self._response_cache = response_cache
+        self._request_coalescer = RequestCoalescer(max_size_bytes=memory_cache_bytes)
+        self._host_limiter = PerHostLimiter(max_limit=limit_per_host or parallelism)
+        self._retry_policy = retry_policy
+        self._circuit_breaker = circuit_breaker or PerHostCircuitBreaker()
+        self._url_rewrites = url_rewrites or {}
+        self._stats = collections.Counter()
+        self._session: Optional[aiohttp.ClientSession] = None
 
-async def get_content_length(url: str, sem: asyncio.Semaphore, num_retries: int = 0, timeout: int = 300) -> Optional[
-    int]:
-    while num_retries > -1:
-        try:
-            async with sem:
-                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as client:
-                    async with client.head(url) as resp:
-                        content_length = resp.headers.get('Content-Length')
-                        logging.debug(f'Got content length {content_length} for url: {url}')
-                        return int(content_length) if content_length else None
-        except asyncio.TimeoutError:
-            num_retries -= 1
-            logging.warning(f'Retrying get content_length: {url}. Remaining retries: {num_retries}')
+    async def __aenter__(self) -> 'HttpClient':
+        await self.open()
+        return self
 
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
 
-class NotResumableError(Exception):
-    pass
+    async def open(self):
+        connector = aiohttp.TCPConnector(limit=self._parallelism,
+                                         limit_per_host=self._limit_per_host,
+                                         ttl_dns_cache=self._dns_cache_ttl,
+                                         keepalive_timeout=self._keepalive_timeout)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
 
+    async def close(self):
+        self._request_coalescer.cancel_all()
+        if self._session:
+            await self._session.close()
+            self._session = None
+        if self._response_cache:
+            logging.info(f'Response cache stats: {self._response_cache.stats}')
+        logging.info(f'Final concurrency limits per host: {self.host_limits()}')
+        logging.info(f'Request stats: {self.stats}')
+        logging.info(f'In-memory response stats: {self._request_coalescer.stats}')
 
-async def get_resumable(url: str,
-                        write_to_file: str,
-                        sem: asyncio.Semaphore,
-                        progress_bar: Optional[tqdm.tqdm] = None,
-                        tqdm_local_position: Optional[int] = None):
-    async with sem:
-        async with aiohttp.ClientSession() as client:
-            async with client.head(url) as resp:
-                accept_ranges = resp.headers.get('Accept-Ranges')
-                content_length = resp.headers.get('Content-Length')
-                if not accept_ranges or not 'bytes' in accept_ranges or not content_length:
-                    raise NotResumableError(f'URL does not support resume: {url}')
-
-            local_progress_bar = progress_bar
-            if not progress_bar:
-                local_progress_bar = tqdm.tqdm(total=int(content_length) / 1024,
-                                               unit='KB',
-                                               position=tqdm_local_position)
+    def host_limits(self) -> Dict[str, int]:
+        return self._host_limiter.limits()
 
-            if not os.path.exists(write_to_file):
-                async with aiofiles.open(write_to_file, mode='w'):
-                    pass
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
 
-            while True:
-                try:
-                    async with aiofiles.open(write_to_file, mode='r+b') as f:
-                        async with client.get(url, headers={
-                            'Range': f'bytes={os.path.getsize(write_to_file)}-{content_length}'
-                        }) as resp:
-                            if resp.status == 416:
-                                logging.debug(f'Download already complete for url: {url}')
-                                local_progress_bar.update(os.path.getsize(write_to_file) / 1024)
-                            else:
-                                start_bytes = int(re.search(r'bytes (\d+)-\d+', resp.headers['Content-Range']).group(1))
-                                logging.debug(f'Resuming download from byte position {start_bytes} for: {url}')
-                                local_progress_bar.update(start_bytes / 1024)
-                                await f.seek(start_bytes)
-
-                                async for chunk in resp.content.iter_chunked(1024):
-                                    await f.write(chunk)
-                                    local_progress_bar.update(1)
-                    break
-                except ClientError:
-                    logging.warning(f'Will retry resumable download: {url}', exc_info=True)
+    async def get(self, url: str) -> str:
+        return await self._request_coalescer.get(url, functools.partial(self._get, url))
 
-            if not progress_bar:
-                local_progress_bar.close()
+    async def _get(self, url: str) -> str:
+        request_url = self._rewrite_url(url)
+        cached = None
+        if self._response_cache:
+            cached = await self._response_cache.lookup(url)
+            if cached and self._response_cache.is_fresh(cached):
+                self._response_cache.record_hit()
+                return cached.body
 
+        async def _get() -> str:
+            headers = self._response_cache.conditional_headers(cached) if cached else {}
+            async with self._host_limiter.slot(request_url) as slot:
+                async with self._session.get(request_url, headers=headers) as resp:
+                    slot.record_response(resp.status)
+                    self._raise_for_retryable_status(url, resp.status)
+                    if resp.status == 304 and cached:
+                        logging.debug(f'Not modified since last crawl: {url}')
+                        await self._response_cache.refresh(cached)
+                        return cached.body
+                    text = await resp.text()
+                    if self._response_cache and resp.status == 200:
+                        await self._response_cache.store(url,
+                                                         text,
+                                                         etag=resp.headers.get('ETag'),
+                                                         last_modified=resp.headers.get('Last-Modified'),
+                                                         encoding=resp.get_encoding())
+            return text
+
+        return await self._retrying(request_url, _get)
+
+    async def get_incremental(self, url: str, new_parser: Callable[[], P]) -> P:
+        # Feeds the body to a parser with feed(bytes), e.g. lxml's XMLPullParser, chunk by chunk as it arrives.
+        # Every attempt gets a fresh parser from new_parser, and the parser of the successful one is returned.
+        request_url = self._rewrite_url(url)
+        cached = None
+        if self._response_cache:
+            cached = await self._response_cache.lookup(url)
+            if cached and self._response_cache.is_fresh(cached):
+                self._response_cache.record_hit()
+                parser = new_parser()
+                parser.feed(cached.body.encode(cached.encoding))
+                return parser
+
+        async def _get_incremental() -> P:
+            parser = new_parser()
+            headers = self._response_cache.conditional_headers(cached) if cached else {}
+            async with self._host_limiter.slot(request_url) as slot:
+                async with self._session.get(request_url, headers=headers) as resp:
+                    slot.record_response(resp.status)
+                    self._raise_for_retryable_status(url, resp.status)
+                    if resp.status == 304 and cached:
+                        logging.debug(f'Not modified since last crawl: {url}')
+                        await self._response_cache.refresh(cached)
+                        parser.feed(cached.body.encode(cached.encoding))
+                        return parser
+                    # The cache needs the whole body, so it is only kept when caching
+                    body = bytearray() if self._response_cache and resp.status == 200 else None
+                    async for chunk in resp.content.iter_any():
+                        parser.feed(chunk)
+                        if body is not None:
+                            body.extend(chunk)
+                    if body is not None:
+                        encoding = resp.get_encoding()
+                        await self._response_cache.store(url,
+                                                         body.decode(encoding),
+                                                         etag=resp.headers.get('ETag'),
+                                                         last_modified=resp.headers.get('Last-Modified'),
+                                                         encoding=encoding)
+            return parser
+
+        return await self._retrying(request_url, _get_incremental)
+
+    async def get_conditional(self, url: str, etag: Optional[str] = None,
+                              last_modified: Optional[str] = None) -> ConditionalResponse:
+        # Revalidates with validators the caller keeps, bypassing the response cache.
+        # Validators of a 304 are those sent unless the server gives new ones.
+        request_url = self._rewrite_url(url)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        async def _get_conditional() -> ConditionalResponse:
+            async with self._host_limiter.slot(request_url) as slot:
+                async with self._session.get(request_url, headers=headers) as resp:
+                    slot.record_response(resp.status)
+                    self._raise_for_retryable_status(url, resp.status)
+                    if resp.status == 304:
+                        self._stats['not_modified'] += 1
+                        return ConditionalResponse(status=resp.status,
+                                                   body=None,
+                                                   etag=resp.headers.get('ETag', etag),
+                                                   last_modified=resp.headers.get('Last-Modified', last_modified))
+                    return ConditionalResponse(status=resp.status,
+                                               body=await resp.read(),
+                                               etag=resp.headers.get('ETag'),
+                                               last_modified=resp.headers.get('Last-Modified'))
+
+        return await self._retrying(request_url, _get_conditional)
+
+    async def get_content_length(self, url: str, num_retries: Optional[int] = None,
+                                 timeout: Optional[float] = None) -> Optional[int]:
+        url = self._rewrite_url(url)
+
+        async def _get_content_length() -> Optional[int]:
+            request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+            async with self._host_limiter.slot(url) as slot:
+                async with self._session.head(url, timeout=request_timeout) as resp:
+                    slot.record_response(resp.status)
+                    self._raise_for_retryable_status(url, resp.status)
+                    content_length = resp.headers.get('Content-Length')
+                    logging.debug(f'Got content length {content_length} for url: {url}')
+                    return int(content_length) if content_length else None
+
+        policy = self._retry_policy
+        if num_retries is not None:
+            policy = policy._replace(max_attempts=num_retries + 1)
+        return await self._retrying(url, _get_content_length, policy=policy)
+
+    async def get_resumable(self,
+                            url: str,
+                            write_to_file: str,
+                            progress_bar: Optional[tqdm.tqdm] = None,
+                            tqdm_local_position: Optional[int] = None):
+        url = self._rewrite_url(url)
+
+        async def _head() -> Tuple[Optional[str], Optional[str]]:
+            async with self._host_limiter.slot(url) as slot:
+                async with self._session.head(url) as resp:
+                    slot.record_response(resp.status)
+                    self._raise_for_retryable_status(url, resp.status)
+                    return resp.headers.get('Accept-Ranges'), resp.headers.get('Content-Length')
+
+        accept_ranges, content_length = await self._retrying(url, _head)
+        if not accept_ranges or not 'bytes' in accept_ranges or not content_length:
+            raise NotResumableError(f'URL does not support resume: {url}')
+
+        local_progress_bar = progress_bar
+        if not progress_bar:
+            local_progress_bar = tqdm.tqdm(total=int(content_length) / 1024,
+                                           unit='KB',
+                                           position=tqdm_local_position)
+
+        if not os.path.exists(write_to_file):
+            async with aiofiles.open(write_to_file, mode='w'):
+                pass
+
+        async def _download_remaining():
+            async with self._host_limiter.slot(url) as slot:
+                async with aiofiles.open(write_to_file, mode='r+b') as f:
+                    async with self._session.get(url, headers={
+                        'Range': f'bytes={os.path.getsize(write_to_file)}-{content_length}'
+                    }) as resp:
+                        slot.record_response(resp.status)
+                        self._raise_for_retryable_status(url, resp.status)
+                        if resp.status == 416:
+                            logging.debug(f'Download already complete for url: {url}')
+                            local_progress_bar.update(os.path.getsize(write_to_file) / 1024)
+                        else:
+                            start_bytes = int(re.search(r'bytes (\d+)-\d+', resp.headers['Content-Range']).group(1))
+                            logging.debug(f'Resuming download from byte position {start_bytes} for: {url}')
+                            local_progress_bar.update(start_bytes / 1024)
+                            await f.seek(start_bytes)
 
-async def get_bytes(url: str,
-                    sem: asyncio.Semaphore,
-                    progress_bar: Optional[tqdm.tqdm] = None,
-                    tqdm_local_position: Optional[int] = None) -> bytes:
-    async with sem:
-        async with aiohttp.ClientSession() as client:
-            local_progress_bar = progress_bar
-            if not progress_bar:
-                local_progress_bar = tqdm.tqdm(unit='KB',
-                                               position=tqdm_local_position)
-            while True:
-                try:
-                    async with aiofiles.tempfile.TemporaryFile(mode='w+b') as f:
-                        async with client.get(url) as resp:
                             async for chunk in resp.content.iter_chunked(1024):
                                 await f.write(chunk)
                                 local_progress_bar.update(1)
 
-                        await f.seek(0)
-                        raw_bytes = await f.read()
-                    break
-                except ClientError:
-                    logging.warning(f'Will retry non-resumable download: {url}', exc_info=True)
+        try:
+            await self._retrying(url, _download_remaining, progress=lambda: os.path.getsize(write_to_file))
+        finally:
+            if not progress_bar:
+                local_progress_bar.close()
+
+    async def get_bytes(self,
+                        url: str,
+                        progress_bar: Optional[tqdm.tqdm] = None,
+                        tqdm_local_position: Optional[int] = None) -> bytes:
+        url = self._rewrite_url(url)
+        local_progress_bar = progress_bar
+        if not progress_bar:
+            local_progress_bar = tqdm.tqdm(unit='KB',
+                                           position=tqdm_local_position)
+
+        async def _get_bytes() -> bytes:
+            async with self._host_limiter.slot(url) as slot:
+                async with aiofiles.tempfile.TemporaryFile(mode='w+b') as f:
+                    async with self._session.get(url) as resp:
+                        slot.record_response(resp.status)
+                        self._raise_for_retryable_status(url, resp.status)
+                        async for chunk in resp.content.iter_chunked(1024):
+                            await f.write(chunk)
+                            local_progress_bar.update(1)
 
+                    await f.seek(0)
+                    return await f.read()
+
+        try:
+            return await self._retrying(url, _get_bytes)
+        finally:
             if not progress_bar:
                 local_progress_bar.close()
 
-            return raw_bytes
+    def _rewrite_url(self, url: str) -> str:
+        for prefix, replacement in self._url_rewrites.items():
+            if url.startswith(prefix):
+                return replacement + url[len(prefix):]
+        return url
+
+    def _raise_for_retryable_status(self, url: str, status: int):
+        if status in self._retry_policy.retryable_statuses:
+            raise RetryableStatusError(url, status)
+
+    async def _retrying(self,
+                        url: str,
+                        attempt: Callable[[], Awaitable[T]],
+                        policy: Optional[RetryPolicy] = None,
+                        progress: Optional[Callable[[], int]] = None) -> T:
+        # If progress() grew during a failed attempt (e.g. bytes were written), the attempt isn't counted and the
+        # deadline starts again, so that it limits the time without progress
+        policy = policy or self._retry_policy
+        host = urlsplit(url).netloc
+        breaker = self._circuit_breaker.for_url(url)
+        started_at = time.monotonic()
+        num_failed_attempts = 0
+        last_progress = progress() if progress else 0
+        while True:
+            try:
+                breaker.check()
+                try:
+                    result = await attempt()
+                except _RETRYABLE_ERRORS:
+                    breaker.record_failure()
+                    raise
+                except BaseException:
+                    breaker.abort_trial()
+                    raise
+                breaker.record_success()
+                return result
+            except (*_RETRYABLE_ERRORS, CircuitOpenError) as e:
+                current_progress = progress() if progress else 0
+                if current_progress > last_progress:
+                    num_failed_attempts = 0
+                    started_at = time.monotonic()
+                last_progress = current_progress
+                num_failed_attempts += 1
+
+                delay = policy.backoff(num_failed_attempts)
+                if isinstance(e, CircuitOpenError):
+                    self._stats['circuit_open'] += 1
+                    delay = max(delay, breaker.retry_after())
+                elapsed = time.monotonic() - started_at
+                if num_failed_attempts >= policy.max_attempts or \
+                        (policy.deadline is not None and elapsed + delay > policy.deadline):
+                    self._stats['gave_up'] += 1
+                    logging.warning(f'Giving up on {url} after {num_failed_attempts} attempts: {e!r}')
+                    raise
+                self._stats['retries'] += 1
+                self._stats[f'retries:{host}'] += 1
+                logging.warning(f'Will retry {url} in {delay:.1f}s '
+                                f'(attempt {num_failed_attempts}/{policy.max_attempts}): {e!r}')
+                await asyncio.sleep(delay)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+import asyncio
+import heapq
+import logging
+import statistics
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from crawler.podcast.episode_list_crawler import EpisodeListCrawler
+from crawler.podcast.work_queue import WorkQueue
+from model.podcast.episode import Episode
+
+DEFAULT_EPISODES_PER_YEAR = 52
+
+
+async def largest_first_as_estimated(pids: List[int],
+                                     previous_episodes_by_pid: Dict[int, List[Episode]],
+                                     episode_list_crawler: EpisodeListCrawler,
+                                     num_workers: int
+                                     ) -> AsyncIterator[Tuple[int, Optional[Tuple[List[int], Episode]]]]:
+    # Longest-processing-time-first order: starting the largest jobs first keeps the tail of the crawl from waiting on
+    # one huge programme started last. Each pid pulled is the largest of those estimated so far, with the programme
+    # page fetched for its estimate if any, to be passed to list_all_episodes rather than fetched again. Known pids are
+    # estimated from their previous episodes at once, so crawling starts on them while the others are estimated from
+    # their available years, at the typical rate of known ones, num_workers at a time. The estimates run on a queue of
+    # their own, as the pid work queue pulling from this generator would otherwise wait on its own jobs.
+    ready = [(-float(len(previous_episodes_by_pid[pid])), pid) for pid in pids if previous_episodes_by_pid.get(pid)]
+    heapq.heapify(ready)
+    episodes_per_year = _typical_episodes_per_year(list(previous_episodes_by_pid.values()))
+    programme_pages = {}
+    estimates = asyncio.Queue()
+
+    async def _estimate_from_years(pid: int) -> Tuple[float, int]:
+        try:
+            programme_pages[pid] = await episode_list_crawler.get_programme_page(pid)
+            return -len(programme_pages[pid][0]) * episodes_per_year, pid
+        except Exception:
+            logging.warning(f'Failed to list available years of pid {pid}, will crawl it as the smallest', exc_info=True)
+            return 0.0, pid
+
+    async def _estimate_all(unknown_pids: List[int]):
+        try:
+            async with WorkQueue('estimate', num_workers=num_workers) as work_queue:
+                async for estimate in work_queue.map_unordered(_estimate_from_years, unknown_pids):
+                    estimates.put_nowait(estimate)
+        finally:
+            estimates.put_nowait(None)
+
+    estimator = asyncio.create_task(_estimate_all([pid for pid in pids if not previous_episodes_by_pid.get(pid)]))
+    estimating = True
+    try:
+        while True:
+            # Waits for an estimate only when no pid is ready
+            while estimating and (not ready or not estimates.empty()):
+                estimate = await estimates.get()
+                if estimate is None:
+                    estimating = False
+                    await estimator  # Raises errors of estimating
+                else:
+                    heapq.heappush(ready, estimate)
+            if not ready:
+                return
+            _, pid = heapq.heappop(ready)
+            yield pid, programme_pages.pop(pid, None)
+    finally:
+        estimator.cancel()
+
+
+def _typical_episodes_per_year(episodes_by_pid: List[List[Episode]]) -> float:
+    """
+    >>> from datetime import datetime
+    >>> _typical_episodes_per_year([[Episode(pid=1, eid=i, episode_date=datetime(2000 + i % 2, 1, 1)) for i in range(10)]])
+    5.0
+    >>> _typical_episodes_per_year([])
+    52
+    """
+    rates = []
+    for episodes in episodes_by_pid:
+        years = {episode.episode_date.year for episode in episodes if _is_set(episode.episode_date)}
+        if years:
+            rates.append(len(episodes) / len(years))
+    return statistics.median(rates) if rates else DEFAULT_EPISODES_PER_YEAR
+
+
+def _is_set(value) -> bool:
+    return value is not None and value == value  # not None, nan or NaT
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -1,89 +1,127 @@
 import asyncio
 import logging
-import re
-from typing import Dict, List, Tuple
+from datetime import date
+from typing import Collection, Dict, List, Optional, Tuple
 
-import xmltodict
-from bs4 import BeautifulSoup
-
-from crawler.podcast import client
+from crawler.podcast.checkpoint_journal import CheckpointJournal
+from crawler.podcast.client import HttpClient
+from crawler.podcast.parse_pool import ParsePool
+from crawler.podcast.work_queue import WorkQueue
 from model.podcast.episode import Episode
-from util.dates import duration_to_seconds, ymd_to_date
+from parser.podcast.episode_list_parser import EpisodeListParser
+from parser.podcast.item_page_parser import ItemPageParser
 from util.lists import flatten
 
 
 class EpisodeListCrawler:
-    def __init__(self, sem: asyncio.Semaphore):
-        self._sem = sem
+    def __init__(self,
+                 http_client: HttpClient,
+                 parse_pool: Optional[ParsePool] = None,
+                 eid_work_queue: Optional[WorkQueue] = None,
+                 checkpoint_journal: Optional[CheckpointJournal] = None):
+        # Without eid_work_queue, all episode pages of a pid are requested at once.
+        # With checkpoint_journal, years and episode pages recorded in it are not crawled again.
+        self._http_client = http_client
+        self._checkpoint_journal = checkpoint_journal
+        self._parse_pool = parse_pool or ParsePool('inline')
+        self._eid_work_queue = eid_work_queue
+        self._episode_list_parser = EpisodeListParser()
+        self._item_page_parser = ItemPageParser()
 
-    async def list_all_episodes(self, pid: int) -> Tuple[int, List[Episode]]:
+    async def list_all_episodes(self,
+                                pid: int,
+                                known_episodes: Collection[Episode] = (),
+                                recent_years: int = 1,
+                                fetch_episode_pages: bool = True,
+                                programme_page: Optional[Tuple[List[int], Episode]] = None
+                                ) -> Tuple[int, List[Episode]]:
+        # With known_episodes from a previous crawl, only recent years and years missing from known_episodes
+        # are re-crawled, and only episodes not already known have their html fetched.
+        # Without fetch_episode_pages, og_title, og_description and m3u8_url are only kept from known_episodes.
+        # With programme_page from get_programme_page, the pid page isn't fetched again.
         logging.info(f'Crawling pid {pid}...')
-        years = await self._list_available_years(pid)
+        years, programme_info = programme_page or await self.get_programme_page(pid)
+        years_to_crawl = self._select_years_to_crawl(years, known_episodes, recent_years) if known_episodes else years
+        known_episodes_by_eid = {e.eid: e for e in known_episodes}
 
-        episodes_from_xml = await self._list_episodes_xml(pid, years)
-        eids = [episode.eid for episode in episodes_from_xml]
+        episodes_from_xml = await self._list_episodes_xml(pid, years_to_crawl)
+        # Known episodes outside the re-crawled years are kept, including undated ones and those of years no longer
+        # listed, unless the re-crawled years list them again
+        eids_from_xml = {e.eid for e in episodes_from_xml}
+        kept_episodes = [e for e in known_episodes if _year_of(e) not in years_to_crawl and e.eid not in eids_from_xml]
+        new_eids = [episode.eid for episode in episodes_from_xml if episode.eid not in known_episodes_by_eid]
+        if known_episodes:
+            logging.info(f'pid {pid}: re-crawling years {years_to_crawl}, found {len(new_eids)} new episodes')
 
-        episodes_from_html = await self._list_episodes_html(pid, eids)
+        episodes_from_html = await self._list_episodes_html(pid, new_eids) if fetch_episode_pages else []
+        episodes_from_html += [known_episodes_by_eid[e.eid] for e in episodes_from_xml
+                               if e.eid in known_episodes_by_eid]
 
-        def _merge(episodes_from_xml: List[Episode], episodes_from_html: List[Episode]) -> List[Episode]:
-            xml_episodes_grouped_by_pid_eid: Dict[(int, int), Episode] = {(e.pid, e.eid): e for e in episodes_from_xml}
-            html_episodes_grouped_by_pid_eid: Dict[(int, int), Episode] = {(e.pid, e.eid): e for e in
-                                                                           episodes_from_html}
+        def _merge(programme_info: Episode, episodes_from_xml: List[Episode],
+                   episodes_from_html: List[Episode]) -> List[Episode]:
+            html_episodes_grouped_by_eid: Dict[int, Episode] = {e.eid: e for e in episodes_from_html}
             merged_episodes = [
-                Episode(
-                    pid=pid,
-                    eid=eid,
-                    programme_title=html_episodes_grouped_by_pid_eid[(pid, eid)].programme_title,
-                    episode_title=xml_episodes_grouped_by_pid_eid[(pid, eid)].episode_title,
-                    episode_date=xml_episodes_grouped_by_pid_eid[(pid, eid)].episode_date,
-                    duration_seconds=xml_episodes_grouped_by_pid_eid[(pid, eid)].duration_seconds,
-                    og_title=html_episodes_grouped_by_pid_eid[(pid, eid)].og_title,
-                    og_description=html_episodes_grouped_by_pid_eid[(pid, eid)].og_description,
-                    cids=html_episodes_grouped_by_pid_eid[(pid, eid)].cids,
-                    category_names=html_episodes_grouped_by_pid_eid[(pid, eid)].category_names,
-                    file_url=xml_episodes_grouped_by_pid_eid[(pid, eid)].file_url,
-                    m3u8_url=html_episodes_grouped_by_pid_eid[(pid, eid)].m3u8_url,
-                    rss_url=html_episodes_grouped_by_pid_eid[(pid, eid)].rss_url,
-                    language=html_episodes_grouped_by_pid_eid[(pid, eid)].language,
-                    format=xml_episodes_grouped_by_pid_eid[(pid, eid)].format
-                ) for (pid, eid) in xml_episodes_grouped_by_pid_eid.keys()
+                programme_info._replace(
+                    eid=e.eid,
+                    episode_title=e.episode_title,
+                    episode_date=e.episode_date,
+                    duration_seconds=e.duration_seconds,
+                    og_title=html_episodes_grouped_by_eid.get(e.eid, e).og_title,
+                    og_description=html_episodes_grouped_by_eid.get(e.eid, e).og_description,
+                    file_url=e.file_url,
+                    m3u8_url=html_episodes_grouped_by_eid.get(e.eid, e).m3u8_url,
+                    format=e.format
+                ) for e in episodes_from_xml
             ]
             return merged_episodes
 
         all_episodes = _merge(
+            programme_info,
             episodes_from_xml,
             episodes_from_html
-        )
+        ) + [programme_info._replace(**_episode_fields(e)) for e in kept_episodes]
         logging.info(f'Got {len(all_episodes)} episodes for pid {pid}')
         return (pid, all_episodes)
 
-    async def _list_available_years(self, pid: int) -> List[int]:
-        html = await client.get(
-            f'https://podcast.rthk.hk/podcast/item.php?pid={pid}',
-            sem=self._sem
+    def _select_years_to_crawl(self, years: List[int], known_episodes: Collection[Episode],
+                               recent_years: int) -> List[int]:
+        known_years = {_year_of(e) for e in known_episodes}
+        first_recent_year = date.today().year - recent_years + 1
+        return [year for year in years if year >= first_recent_year or year not in known_years]
+
+    async def get_programme_page(self, pid: int) -> Tuple[List[int], Episode]:
+        # Available years, and fields shared by all episodes of the programme as an Episode without eid
+        html = await self._http_client.get(
+            f'https://podcast.rthk.hk/podcast/item.php?pid={pid}'
+        )
+        page = await self._parse_pool.run(self._item_page_parser.parse, html)
+        logging.debug(f'pid {pid} has available years: {page.years}')
+        programme_info = Episode(
+            pid=pid,
+            eid=None,
+            programme_title=page.programme_title,
+            cids=page.cids,
+            category_names=page.category_names,
+            rss_url=page.rss_url,
+            language=page.language
         )
-        soup = BeautifulSoup(html, features="lxml")
-        years = [int(option['value'])
-                 for option in soup.select('#switch-years > option')
-                 if int(option['value']) > 1900]  # Filter out invalid years, e.g. 0000
-        logging.debug(f'pid {pid} has available years: {years}')
-        return years
+        return page.years, programme_info
 
     async def _list_episodes_xml(self, pid: int, years: List[int]) -> List[Episode]:
+        journaled_year_episodes = self._checkpoint_journal.year_episodes(pid) if self._checkpoint_journal else {}
+
         async def _list_episodes_in_year(year: int) -> List[Episode]:
-            xml = await client.get(
+            if year in journaled_year_episodes:
+                return journaled_year_episodes[year]
+            # Deliberately parsed on the event loop while downloading rather than in the parse pool: the pool would
+            # need the whole document, which can be very large, and each chunk is cheap to parse between reads
+            parser = await self._http_client.get_incremental(
                 f'https://podcast.rthk.hk/podcast/episodeList.php?pid={pid}&year={year}&display=all',
-                sem=self._sem)
-            root = xmltodict.parse(xml, force_list={'episode'})
-            return [Episode(
-                pid=int(e['pid']),
-                eid=int(e['eid']),
-                episode_title=e['episodeTitle'],
-                episode_date=ymd_to_date(e['episodeDate']),
-                duration_seconds=duration_to_seconds(e['duration']),
-                file_url=e['mediafile'],
-                format=e['format']
-            ) for e in root['episodeList']['episode']]
+                self._episode_list_parser.incremental)
+            episodes = parser.close()
+            if self._checkpoint_journal:
+                self._checkpoint_journal.record_year(pid, year, episodes)
+            return episodes
 
         nested_episodes = await asyncio.gather(*map(_list_episodes_in_year, years))
         episodes = flatten(nested_episodes)
@@ -92,52 +130,46 @@ class EpisodeListCrawler:
 
     async def _list_episodes_html(self, pid: int, eids: List[int]) -> List[Episode]:
         async def _get_episode_info(eid: int) -> Episode:
-            html = await client.get(
-                f'https://podcast.rthk.hk/podcast/item.php?pid={pid}&eid={eid}',
-                sem=self._sem)
-            soup = BeautifulSoup(html, features="lxml")
+            html = await self._http_client.get(
+                f'https://podcast.rthk.hk/podcast/item.php?pid={pid}&eid={eid}')
             try:
-                programme_title = soup.select_one(
-                    '#prog-detail > div > div.prog-box > div.prog-box-title > div.prog-title > h2').get_text()
-                og_title = soup.select_one('meta[property="og:title"]')['content']
-                og_description = soup.select_one('meta[property="og:description"]')['content']
-                category_divs = soup.select(
-                    '#prog-detail > div > div.prog-box > div.prog-box-info > ul > li:nth-child(3) > a')
-                cids = [int(re.fullmatch(r'category.php\?cid=(\d+)&lang=.*', div['href']).group(1))
-                        for div in category_divs]
-                category_names = [div.get_text() for div in category_divs]
-                m3u8_url = re.search(f'[^"]+\.m3u8', html) and re.search(f'[^"]+\.m3u8', html).group()
-                rss_url = soup.select_one(
-                    '#prog-detail > div > div.prog-box > div.subscribe-divs > div > div > a:nth-child(2)')['href']
-                language = soup.select_one(
-                    '#prog-detail > div > div.prog-box > div.prog-box-info > ul > li:nth-child(2) > span').get_text()
+                page = await self._parse_pool.run(self._item_page_parser.parse, html)
                 logging.debug(f'Got html episode info for (pid, eid) = ({pid}, {eid})')
-                return Episode(
+                episode = Episode(
                     pid=pid,
                     eid=eid,
-                    programme_title=programme_title,
-                    og_title=og_title,
-                    og_description=og_description,
-                    cids=cids,
-                    category_names=category_names,
-                    m3u8_url=m3u8_url,
-                    rss_url=rss_url,
-                    language=language
+                    og_title=page.og_title,
+                    og_description=page.og_description,
+                    m3u8_url=page.m3u8_url
                 )
+                if self._checkpoint_journal:
+                    self._checkpoint_journal.record_episode_page(episode)
+                return episode
             except:
                 logging.warning(f'Failed to get html episode info for (pid, eid) = ({pid}, {eid})', exc_info=True)
                 return Episode(
                     pid=pid,
                     eid=eid,
-                    programme_title=None,
                     og_title=None,
                     og_description=None,
-                    cids=None,
-                    category_names=None,
-                    m3u8_url=None,
-                    rss_url=None,
-                    language=None
+                    m3u8_url=None
                 )
 
-        episodes = await asyncio.gather(*map(_get_episode_info, eids))
-        return list(episodes)
+        journaled_episodes = self._checkpoint_journal.episode_pages(pid) if self._checkpoint_journal else {}
+        episodes = [journaled_episodes[eid] for eid in eids if eid in journaled_episodes]
+        eids = [eid for eid in eids if eid not in journaled_episodes]
+        if self._eid_work_queue:
+            return episodes + [episode async for episode in self._eid_work_queue.map_unordered(_get_episode_info, eids)]
+        return episodes + list(await asyncio.gather(*map(_get_episode_info, eids)))
+
+
+def _year_of(episode: Episode) -> Optional[int]:
+    year = getattr(episode.episode_date, 'year', None)
+    # NaT dates from csv have a nan year
+    return year if isinstance(year, int) else None
+
+
+def _episode_fields(episode: Episode) -> Dict[str, object]:
+    return {field: getattr(episode, field)
+            for field in ['eid', 'episode_title', 'episode_date', 'duration_seconds', 'og_title', 'og_description',
+                          'file_url', 'm3u8_url', 'format']}
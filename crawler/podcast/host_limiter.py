@@ -0,0 +1,161 @@
+import asyncio
+import collections
+import contextlib
+import logging
+import time
+from typing import AsyncIterator, Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+from aiohttp import ClientError
+
+THROTTLED_STATUSES = {429, 503}
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit for a single host, adjusted AIMD-style:
+    the limit grows by one per window of successful requests, and is cut multiplicatively
+    when the server throttles (429/503), requests fail, or latency climbs well above its baseline.
+    """
+
+    def __init__(self,
+                 host: str,
+                 initial_limit: int,
+                 max_limit: int,
+                 min_limit: int = 1,
+                 latency_tolerance: float = 3.0,
+                 decrease_cooldown: float = 1.0):
+        self._host = host
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._max_limit = max_limit
+        self._min_limit = min_limit
+        self._latency_tolerance = latency_tolerance
+        self._decrease_cooldown = decrease_cooldown
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        self._latency_ewma: Optional[float] = None
+        self._baseline_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self.stats = collections.Counter()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self):
+        while self._in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # We were woken up but won't use the slot, pass it on
+                    self._wake_waiters()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        self._in_flight += 1
+
+    def release(self):
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def on_success(self, latency: float):
+        self.stats['success'] += 1
+        self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+        if self._baseline_latency is None or latency < self._baseline_latency:
+            self._baseline_latency = latency
+        else:
+            # Let the baseline drift up slowly, so a one-off fast response doesn't pin it forever
+            self._baseline_latency *= 1.001
+
+        if self._latency_ewma > self._baseline_latency * self._latency_tolerance:
+            self._decrease(0.9, reason=f'latency {self._latency_ewma:.2f}s')
+        else:
+            self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+            self._wake_waiters()
+
+    def on_throttled(self, status: int):
+        self.stats['throttled'] += 1
+        self._decrease(0.5, reason=f'status {status}')
+
+    def on_error(self):
+        self.stats['error'] += 1
+        self._decrease(0.75, reason='error')
+
+    def _decrease(self, factor: float, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self._decrease_cooldown:
+            return
+        self._last_decrease = now
+        old_limit = self.limit
+        self._limit = max(self._min_limit, self._limit * factor)
+        if self.limit != old_limit:
+            logging.debug(f'Reduced concurrency for {self._host} from {old_limit} to {self.limit} ({reason})')
+
+    def _wake_waiters(self):
+        free_slots = self.limit - self._in_flight
+        while free_slots > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free_slots -= 1
+
+
+class RequestSlot:
+    def __init__(self, limiter: AdaptiveLimiter):
+        self._limiter = limiter
+        self._started_at = time.monotonic()
+
+    def record_response(self, status: int):
+        # Latency is measured up to the response headers, so long downloads don't look like slow servers
+        now = time.monotonic()
+        latency, self._started_at = now - self._started_at, now
+        if status in THROTTLED_STATUSES:
+            self._limiter.on_throttled(status)
+        elif status >= 500:
+            self._limiter.on_error()
+        else:
+            self._limiter.on_success(latency)
+
+    def record_error(self):
+        self._started_at = time.monotonic()
+        self._limiter.on_error()
+
+
+class PerHostLimiter:
+    def __init__(self, max_limit: int, initial_limit: Optional[int] = None, **limiter_kwargs):
+        self._max_limit = max_limit
+        self._initial_limit = initial_limit or max(1, max_limit // 2)
+        self._limiter_kwargs = limiter_kwargs
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def for_url(self, url: str) -> AdaptiveLimiter:
+        host = urlsplit(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = AdaptiveLimiter(host,
+                                                   initial_limit=self._initial_limit,
+                                                   max_limit=self._max_limit,
+                                                   **self._limiter_kwargs)
+        return self._limiters[host]
+
+    def limits(self) -> Dict[str, int]:
+        return {host: limiter.limit for host, limiter in self._limiters.items()}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[RequestSlot]:
+        limiter = self.for_url(url)
+        await limiter.acquire()
+        slot = RequestSlot(limiter)
+        try:
+            yield slot
+        except (ClientError, asyncio.TimeoutError):
+            slot.record_error()
+            raise
+        finally:
+            limiter.release()
@@ -0,0 +1,95 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import time
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+PARSE_POOL_KINDS = ['process', 'thread', 'inline']
+
+
+class ParsePool:
+    """
+    Runs CPU-bound parsing of responses outside the event loop, so that network I/O keeps making progress meanwhile.
+    kind is 'process' (parse functions and their arguments must be picklable), 'thread' or 'inline' (no offloading).
+
+    >>> async def _parse() -> int:
+    ...     async with ParsePool('thread', max_workers=2) as parse_pool:
+    ...         return await parse_pool.run(int, '42')
+    >>> asyncio.run(_parse())
+    42
+    """
+
+    def __init__(self, kind: str = 'process', max_workers: Optional[int] = None):
+        if kind not in PARSE_POOL_KINDS:
+            raise ValueError(f'Unknown parse pool kind: {kind}')
+        self._kind = kind
+        self._max_workers = max_workers
+        self._executor: Optional[concurrent.futures.Executor] = None
+        self._queue_depth = 0
+        self._stats = collections.Counter()
+
+    async def __aenter__(self) -> 'ParsePool':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def open(self):
+        if self._kind == 'process':
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._max_workers)
+        elif self._kind == 'thread':
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers,
+                                                                   thread_name_prefix='parse')
+
+    async def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._stats:
+            logging.info(f'Parse stats: {self.stats}')
+
+    @property
+    def queue_depth(self) -> int:
+        # Parses submitted but not finished yet, whether waiting for a worker or running
+        return self._queue_depth
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        stats = dict(self._stats)
+        if self._stats['parsed']:
+            stats['mean_parse_seconds'] = self._stats['parse_seconds'] / self._stats['parsed']
+        return stats
+
+    async def run(self, parse: Callable[..., T], *args) -> T:
+        self._queue_depth += 1
+        self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue_depth)
+        submitted_at = time.perf_counter()
+        try:
+            if self._executor:
+                result, parse_seconds = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, _timed, parse, *args)
+            else:
+                result, parse_seconds = _timed(parse, *args)
+        finally:
+            self._queue_depth -= 1
+        self._stats['parsed'] += 1
+        self._stats['parse_seconds'] += parse_seconds
+        self._stats['wait_seconds'] += time.perf_counter() - submitted_at - parse_seconds
+        return result
+
+
+def _timed(parse: Callable[..., T], *args) -> Tuple[T, float]:
+    # Runs in the worker, so that parse time excludes queueing and pickling
+    started_at = time.perf_counter()
+    result = parse(*args)
+    return result, time.perf_counter() - started_at
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -1,35 +1,26 @@
-import asyncio
+from typing import Optional
 
-from bs4 import BeautifulSoup
-
-from crawler.podcast import client
+from crawler.podcast.client import HttpClient
+from crawler.podcast.parse_pool import ParsePool
 from model.podcast.programme import ProgrammeInfo
+from parser.podcast.item_page_parser import ItemPageParser
 
 
 class ProgrammeInfoCrawler:
-    def __init__(self, sem: asyncio.Semaphore):
-        self._sem = sem
+    def __init__(self, http_client: HttpClient, parse_pool: Optional[ParsePool] = None):
+        self._http_client = http_client
+        self._parse_pool = parse_pool or ParsePool('inline')
+        self._item_page_parser = ItemPageParser()
 
     async def get_programme_info(self, pid: int) -> ProgrammeInfo:
-        html = await client.get(
-            f'https://podcast.rthk.hk/podcast/item.php?pid={pid}',
-            sem=self._sem)
-        soup = BeautifulSoup(html, features="lxml")
-        title = soup.select_one(
-            '#prog-detail > div > div.prog-box > div.prog-box-title > div.prog-title > h2').get_text()
-        description = soup.select_one('#prog-detail > div > div.tab-box-about > div').get_text()
-        language = soup.select_one(
-            '#prog-detail > div > div.prog-box > div.prog-box-info > ul > li:nth-child(2) > span').get_text()
-        category_divs = soup.select(
-            '#prog-detail > div > div.prog-box > div.prog-box-info > ul > li:nth-child(3) > a')
-        category_names = [div.get_text() for div in category_divs]
-        rss_url = soup.select_one(
-            '#prog-detail > div > div.prog-box > div.subscribe-divs > div > div > a:nth-child(2)')['href']
+        html = await self._http_client.get(
+            f'https://podcast.rthk.hk/podcast/item.php?pid={pid}')
+        page = await self._parse_pool.run(self._item_page_parser.parse, html)
         return ProgrammeInfo(
             pid=pid,
-            title=title,
-            description=description,
-            language=language,
-            category_names=category_names,
-            rss_url=rss_url
+            title=page.programme_title,
+            description=page.description,
+            language=page.language,
+            category_names=page.category_names,
+            rss_url=page.rss_url
         )
@@ -0,0 +1,45 @@
+import logging
+import os
+import time
+from typing import List, Optional
+
+import ujson
+
+from model.podcast.programme import Programme
+from util.paths import atomic_path
+
+
+class ProgrammeListCache:
+    """
+    Programmes listed per language, persisted to a json file so that runs within ttl seconds of each other
+    skip programme discovery.
+    """
+
+    def __init__(self, path: str, ttl: float = 24 * 3600):
+        self._path = path
+        self._ttl = ttl
+
+    def lookup(self, language: str) -> Optional[List[Programme]]:
+        entry = self._read().get(language)
+        if not entry or time.time() - entry['stored_at'] >= self._ttl:
+            return None
+        logging.info(f'Using {len(entry["programmes"])} {language} programmes listed at '
+                     f'{time.ctime(entry["stored_at"])} from: {self._path}')
+        return [Programme(**programme) for programme in entry['programmes']]
+
+    def store(self, language: str, programmes: List[Programme]):
+        entries = self._read()
+        entries[language] = {'stored_at': time.time(),
+                             'programmes': [programme._asdict() for programme in programmes]}
+        with atomic_path(self._path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+            ujson.dump(entries, f, ensure_ascii=False)
+
+    def _read(self) -> dict:
+        if not os.path.isfile(self._path):
+            return {}
+        try:
+            with open(self._path, encoding='utf-8') as f:
+                return ujson.load(f)
+        except (OSError, ValueError):
+            logging.warning(f'Ignoring unreadable programme list cache: {self._path}', exc_info=True)
+            return {}
@@ -1,43 +1,55 @@
 import asyncio
 import logging
-import math
-from typing import List
+from typing import List, Optional
 
-import xmltodict
-
-from crawler.podcast import client
+from crawler.podcast.client import HttpClient
+from crawler.podcast.parse_pool import ParsePool
+from crawler.podcast.programme_list_cache import ProgrammeListCache
 from model.podcast.programme import Programme
+from parser.podcast.programme_list_parser import ProgrammeListParser
 from util.lists import flatten
 
+ALL_LANGUAGES = [
+    'zh-CN',
+    'en-US'
+]
+
 
 class ProgrammeListCrawler:
-    def __init__(self, sem: asyncio.Semaphore):
-        self._sem = sem
+    def __init__(self, http_client: HttpClient, parse_pool: Optional[ParsePool] = None,
+                 programme_list_cache: Optional[ProgrammeListCache] = None):
+        self._http_client = http_client
+        self._parse_pool = parse_pool or ParsePool('inline')
+        self._programme_list_cache = programme_list_cache
+        self._programme_list_parser = ProgrammeListParser()
+
+    async def list_all_programmes(self, languages: List[str] = ALL_LANGUAGES) -> List[Programme]:
+        # Languages are listed concurrently, each from the cache if it is fresh
+        nested_programmes = await asyncio.gather(*map(self.list_programmes, languages))
+        return flatten(nested_programmes)
 
     async def list_programmes(self, language: str) -> List[Programme]:
-        async def _get_total_pages() -> int:
-            xml = await client.get(
-                f'https://podcast.rthk.hk/podcast/programmeList.php?type=all&page=1&order=hot&lang={language}',
-                sem=self._sem)
-            root = xmltodict.parse(xml)
-            total_series = int(root['programmeList']['total'])
-            programme_per_page = int(root['programmeList']['programmePerPage'])
-            total_pages = math.ceil(total_series / programme_per_page)
-            logging.debug(f'Total num of programme pages: {total_pages}')
-            return total_pages
+        if self._programme_list_cache:
+            programmes = self._programme_list_cache.lookup(language)
+            if programmes is not None:
+                return programmes
+
+        async def _get_page(page: int) -> str:
+            return await self._http_client.get(
+                f'https://podcast.rthk.hk/podcast/programmeList.php?type=all&page={page}&order=hot&lang={language}')
 
         async def _list_programmes_in_page(page: int) -> List[Programme]:
-            xml = await client.get(
-                f'https://podcast.rthk.hk/podcast/programmeList.php?type=all&page={page}&order=hot&lang={language}',
-                sem=self._sem)
-            root = xmltodict.parse(xml, force_list={'programme'})
+            programmes = await self._parse_pool.run(self._programme_list_parser.parse, await _get_page(page))
             logging.debug(f'Got programmes in page: {page}')
-            return [Programme(
-                pid=int(p['link'].removeprefix('item.php?pid=')),
-                title=p['title'],
-                format=p['format']
-            ) for p in root['programmeList']['programme']]
-
-        total_pages = await _get_total_pages()
-        nested_programmes = await asyncio.gather(*map(_list_programmes_in_page, range(1, total_pages + 1)))
-        return flatten(nested_programmes)
+            return programmes
+
+        # Page 1 tells the number of pages besides listing the first programmes
+        total_pages, first_programmes = await self._parse_pool.run(self._programme_list_parser.parse_first_page,
+                                                                   await _get_page(1))
+        logging.debug(f'Total num of programme pages: {total_pages}')
+        nested_programmes = await asyncio.gather(*map(_list_programmes_in_page, range(2, total_pages + 1)))
+        programmes = first_programmes + flatten(nested_programmes)
+
+        if self._programme_list_cache:
+            self._programme_list_cache.store(language, programmes)
+        return programmes
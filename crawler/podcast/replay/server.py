@@ -0,0 +1,171 @@
+import asyncio
+import collections
+import hashlib
+import logging
+import random
+import re
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from crawler.podcast.replay.synthetic_site import PODCAST_BASE_URL, SyntheticSite
+from crawler.podcast.response_cache import ResponseCache
+
+
+class ReplayServer:
+    """
+    Local stand-in for podcast.rthk.hk and its media hosts.
+    Responses come from a recorded ResponseCache directory (e.g. one filled by list-podcast-programmes
+    --http-cache-dir) when available, and from a SyntheticSite otherwise.
+    Latency, bandwidth, error injection and Range support are configurable.
+    """
+
+    def __init__(self,
+                 site: Optional[SyntheticSite] = None,
+                 recorded_cache: Optional[ResponseCache] = None,
+                 latency: float = 0.0,
+                 bandwidth: Optional[int] = None,
+                 error_rate: float = 0.0,
+                 error_status: int = 503,
+                 range_support: bool = True,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 seed: int = 0):
+        self._site = site or SyntheticSite()
+        self._recorded_cache = recorded_cache
+        self._latency = latency
+        self._bandwidth = bandwidth  # bytes per second per response
+        self._error_rate = error_rate
+        self._error_status = error_status
+        self._range_support = range_support
+        self._host = host
+        self._port = port
+        self._random = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+        self._base_url = ''
+        self.stats = collections.Counter()
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url
+
+    @property
+    def url_rewrites(self) -> Dict[str, str]:
+        # For HttpClient(url_rewrites=...), so that crawlers using the real site urls hit this server instead
+        return {PODCAST_BASE_URL: self.base_url}
+
+    async def __aenter__(self) -> 'ReplayServer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        host, port = self._runner.addresses[0][:2]
+        self._base_url = f'http://{host}:{port}'
+        logging.info(f'Replay server listening on: {self.base_url}')
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.stats['requests'] += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        if self._error_rate and self._random.random() < self._error_rate:
+            self.stats['injected_errors'] += 1
+            return web.Response(status=self._error_status)
+
+        if self._recorded_cache:
+            recorded = await self._recorded_cache.lookup(f'{PODCAST_BASE_URL}{request.path_qs}')
+            if recorded:
+                self.stats['recorded'] += 1
+                return await self._respond(request, recorded.body.encode('utf-8'), 'text/html')
+
+        path, query = request.path, request.query
+        try:
+            if path == '/podcast/programmeList.php':
+                body = self._site.programme_list_xml(query['lang'], int(query.get('page', 1)))
+                return await self._respond(request, body.encode('utf-8'), 'text/xml')
+            if path == '/podcast/episodeList.php':
+                pid = int(query['pid'])
+                if not self._site.has_programme(pid):
+                    raise web.HTTPNotFound()
+                body = self._site.episode_list_xml(pid, int(query['year']), base_url=self.base_url)
+                return await self._respond(request, body.encode('utf-8'), 'text/xml')
+            if path == '/podcast/item.php':
+                pid = int(query['pid'])
+                if not self._site.has_programme(pid):
+                    raise web.HTTPNotFound()
+                eid = int(query['eid']) if 'eid' in query else None
+                body = self._site.item_html(pid, eid, base_url=self.base_url)
+                return await self._respond(request, body.encode('utf-8'), 'text/html')
+            match = re.fullmatch(r'/podcast/programme_(\d+)\.xml', path)
+            if match:
+                pid = int(match.group(1))
+                if not self._site.has_programme(pid):
+                    raise web.HTTPNotFound()
+                body = self._site.rss_xml(pid, base_url=self.base_url)
+                return await self._respond(request, body.encode('utf-8'), 'application/rss+xml')
+        except (KeyError, ValueError):
+            raise web.HTTPBadRequest()
+
+        match = re.fullmatch(r'/hls/(\d+)/(\d+)/(playlist\.m3u8|chunklist_b\d+\.m3u8|media_\d+\.ts)', path)
+        if match:
+            pid, eid, name = int(match.group(1)), int(match.group(2)), match.group(3)
+            if name == 'playlist.m3u8':
+                body = self._site.master_playlist(pid, eid).encode('utf-8')
+            elif name.endswith('.m3u8'):
+                body = self._site.chunklist(pid, eid).encode('utf-8')
+            else:
+                body = self._site.media_bytes(f'{pid}/{eid}/{name}', self._site.segment_size)
+            return await self._respond(request, body, 'application/vnd.apple.mpegurl')
+
+        match = re.fullmatch(r'/media/(\d+)/(\d+)\.mp4', path)
+        if match:
+            body = self._site.media_bytes(f'{match.group(1)}/{match.group(2)}', self._site.mp4_size)
+            return await self._respond(request, body, 'video/mp4')
+
+        raise web.HTTPNotFound()
+
+    async def _respond(self, request: web.Request, body: bytes, content_type: str) -> web.StreamResponse:
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            self.stats['not_modified'] += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        status, headers = 200, {'Content-Type': content_type, 'ETag': etag}
+        if self._range_support:
+            headers['Accept-Ranges'] = 'bytes'
+            if 'Range' in request.headers:
+                try:
+                    byte_range = request.http_range
+                except ValueError:
+                    raise web.HTTPRequestRangeNotSatisfiable()
+                start = byte_range.start or 0
+                stop = min(len(body), byte_range.stop) if byte_range.stop is not None else len(body)
+                if start >= len(body):
+                    return web.Response(status=416, headers={'Content-Range': f'bytes */{len(body)}'})
+                status = 206
+                headers['Content-Range'] = f'bytes {start}-{stop - 1}/{len(body)}'
+                body = body[start:stop]
+        self.stats['bytes_sent'] += len(body)
+
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = len(body)
+        await response.prepare(request)
+        if request.method != 'HEAD':
+            chunk_size = max(1, self._bandwidth // 10) if self._bandwidth else len(body) or 1
+            for offset in range(0, len(body), chunk_size):
+                await response.write(body[offset:offset + chunk_size])
+                if self._bandwidth:
+                    await asyncio.sleep(chunk_size / self._bandwidth)
+        await response.write_eof()
+        return response
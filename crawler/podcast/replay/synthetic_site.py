@@ -0,0 +1,223 @@
+import math
+from datetime import date, datetime, time, timedelta, timezone
+from email.utils import format_datetime
+from typing import Callable, List, NamedTuple, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+PODCAST_BASE_URL = 'https://podcast.rthk.hk'
+
+LANGUAGES = {
+    'zh-CN': '中文',
+    'en-US': '英文',
+}
+
+
+class SyntheticEpisode(NamedTuple):
+    pid: int
+    eid: int
+    title: str
+    episode_date: date
+    duration_seconds: int
+
+
+class SyntheticSite:
+    """
+    Deterministic stand-in for podcast.rthk.hk. Pages mirror the markup of the real site closely enough
+    for the crawlers' selectors, with every media url pointing at the base_url they are rendered with.
+    """
+
+    def __init__(self,
+                 num_programmes: int = 10,
+                 first_pid: int = 1000,
+                 num_years: int = 3,
+                 num_years_for_pid: Optional[Callable[[int], int]] = None,
+                 last_year: int = 2021,
+                 episodes_per_year: int = 10,
+                 episodes_per_year_for_pid: Optional[Callable[[int], int]] = None,
+                 programmes_per_page: int = 20,
+                 segments_per_episode: int = 4,
+                 segment_size: int = 64 * 1024,
+                 mp4_size: int = 256 * 1024):
+        self._pids = list(range(first_pid, first_pid + num_programmes))
+        self._num_years_for_pid = num_years_for_pid or (lambda pid: num_years)
+        self._last_year = last_year
+        self._episodes_per_year_for_pid = episodes_per_year_for_pid or (lambda pid: episodes_per_year)
+        self._programmes_per_page = programmes_per_page
+        self.segments_per_episode = segments_per_episode
+        self.segment_size = segment_size
+        self.mp4_size = mp4_size
+
+    @property
+    def pids(self) -> List[int]:
+        return list(self._pids)
+
+    def has_programme(self, pid: int) -> bool:
+        return pid in self._pids
+
+    def language_of(self, pid: int) -> str:
+        return 'en-US' if pid % 2 else 'zh-CN'
+
+    def format_of(self, pid: int) -> str:
+        return 'audio' if pid % 3 == 0 else 'video'
+
+    def programme_title(self, pid: int) -> str:
+        return f'節目 {pid}' if self.language_of(pid) == 'zh-CN' else f'Programme {pid}'
+
+    def rss_url(self, pid: int) -> str:
+        # Like the real site, feeds live on podcast.rthk.hk rather than on the media hosts
+        return f'{PODCAST_BASE_URL}/podcast/programme_{pid}.xml'
+
+    def categories(self, pid: int) -> List[tuple]:
+        return [(pid % 7 + 1, f'Category {pid % 7 + 1}'), (8, 'Category 8')]
+
+    def years(self, pid: int) -> List[int]:
+        return list(range(self._last_year, self._last_year - self._num_years_for_pid(pid), -1))
+
+    def episodes(self, pid: int, year: int) -> List[SyntheticEpisode]:
+        if year not in self.years(pid):
+            return []
+        num_episodes = self._episodes_per_year_for_pid(pid)
+        year_index = self._last_year - year
+        days_between_episodes = max(1, 365 // max(1, num_episodes))
+        return [SyntheticEpisode(pid=pid,
+                                 eid=self._eid(pid, year_index, i),
+                                 title=f'{self.programme_title(pid)} {year} #{i + 1}',
+                                 episode_date=date(year, 1, 1) + timedelta(days=min(364, i * days_between_episodes)),
+                                 duration_seconds=1800 + i)
+                for i in range(num_episodes)]
+
+    def episode(self, pid: int, eid: int) -> Optional[SyntheticEpisode]:
+        year = self._last_year - (eid % 10 ** 7) // 10 ** 4
+        for episode in self.episodes(pid, year):
+            if episode.eid == eid:
+                return episode
+        return None
+
+    def _eid(self, pid: int, year_index: int, i: int) -> int:
+        return pid * 10 ** 7 + year_index * 10 ** 4 + i
+
+    def programme_list_xml(self, language: str, page: int) -> str:
+        pids = [pid for pid in self._pids if self.language_of(pid) == language]
+        page_pids = pids[(page - 1) * self._programmes_per_page:page * self._programmes_per_page]
+        programmes = ''.join(
+            f'<programme>'
+            f'<link>item.php?pid={pid}</link>'
+            f'<title>{escape(self.programme_title(pid))}</title>'
+            f'<format>{self.format_of(pid)}</format>'
+            f'</programme>'
+            for pid in page_pids)
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<programmeList>'
+                f'<total>{len(pids)}</total>'
+                f'<programmePerPage>{self._programmes_per_page}</programmePerPage>'
+                f'<totalPage>{max(1, math.ceil(len(pids) / self._programmes_per_page))}</totalPage>'
+                f'{programmes}'
+                f'</programmeList>')
+
+    def episode_list_xml(self, pid: int, year: int, base_url: str = '') -> str:
+        episodes = ''.join(
+            f'<episode>'
+            f'<pid>{e.pid}</pid>'
+            f'<eid>{e.eid}</eid>'
+            f'<episodeTitle>{escape(e.title)}</episodeTitle>'
+            f'<episodeDate>{e.episode_date.isoformat()}</episodeDate>'
+            f'<duration>{e.duration_seconds // 3600:02d}:{e.duration_seconds // 60 % 60:02d}:'
+            f'{e.duration_seconds % 60:02d}</duration>'
+            f'<mediafile>{self.mp4_url(e.pid, e.eid, base_url)}</mediafile>'
+            f'<format>{self.format_of(pid)}</format>'
+            f'</episode>'
+            for e in self.episodes(pid, year))
+        return f'<?xml version="1.0" encoding="UTF-8"?><episodeList>{episodes}</episodeList>'
+
+    def rss_xml(self, pid: int, num_items: int = 20, base_url: str = '') -> str:
+        episodes = sorted((e for year in self.years(pid) for e in self.episodes(pid, year)),
+                          key=lambda e: e.episode_date, reverse=True)[:num_items]
+        items = ''.join(
+            f'<item>'
+            f'<title>{escape(e.title)}</title>'
+            f'<pubDate>{format_datetime(datetime.combine(e.episode_date, time(), timezone(timedelta(hours=8))))}</pubDate>'
+            f'<enclosure url={quoteattr(self.mp4_url(e.pid, e.eid, base_url))} type="video/mp4" />'
+            f'<guid>{escape(self.mp4_url(e.pid, e.eid, base_url))}</guid>'
+            f'</item>'
+            for e in episodes)
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<rss version="2.0"><channel>'
+                f'<title>{escape(self.programme_title(pid))}</title>'
+                f'{items}'
+                f'</channel></rss>')
+
+    def item_html(self, pid: int, eid: Optional[int] = None, base_url: str = '') -> str:
+        language = self.language_of(pid)
+        programme_title = self.programme_title(pid)
+        episode = self.episode(pid, eid) if eid is not None else None
+        if episode:
+            og_title = f'{programme_title} - {episode.title}'
+            og_description = f'Description of {episode.title}'
+            m3u8_url = self.m3u8_url(pid, episode.eid, base_url)
+        else:
+            og_title = programme_title
+            og_description = f'About {programme_title}'
+            m3u8_url = self.m3u8_url(pid, self.episodes(pid, self.years(pid)[0])[0].eid, base_url)
+        category_links = ''.join(
+            f'<a href={quoteattr(f"category.php?cid={cid}&lang={language}")}>{escape(name)}</a>'
+            for cid, name in self.categories(pid))
+        year_options = '<option value="0000">全部</option>' + ''.join(
+            f'<option value="{year}">{year}</option>' for year in self.years(pid))
+        return f'''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta property="og:title" content={quoteattr(og_title)} />
+<meta property="og:description" content={quoteattr(og_description)} />
+<title>{escape(programme_title)}</title>
+</head>
+<body>
+<div id="prog-detail">
+  <div class="container">
+    <div class="prog-box">
+      <div class="prog-box-title"><div class="prog-title"><h2>{escape(programme_title)}</h2></div></div>
+      <div class="prog-box-info">
+        <ul>
+          <li><span>{self.format_of(pid)}</span></li>
+          <li><span>{LANGUAGES[language]}</span></li>
+          <li>{category_links}</li>
+        </ul>
+      </div>
+      <div class="subscribe-divs">
+        <div><div><a href="https://itunes.apple.com/hk/podcast/id{pid}">iTunes</a><a href={quoteattr(self.rss_url(pid))}>RSS</a></div></div>
+      </div>
+    </div>
+    <div class="tab-box-about"><div>《{escape(programme_title)}》是一個測試節目。</div></div>
+  </div>
+</div>
+<select id="switch-years">{year_options}</select>
+<script>var player = {{"file": "{m3u8_url}"}};</script>
+</body>
+</html>'''
+
+    def m3u8_url(self, pid: int, eid: int, base_url: str = '') -> str:
+        return f'{base_url}/hls/{pid}/{eid}/playlist.m3u8'
+
+    def mp4_url(self, pid: int, eid: int, base_url: str = '') -> str:
+        return f'{base_url}/media/{pid}/{eid}.mp4'
+
+    def master_playlist(self, pid: int, eid: int) -> str:
+        return '\n'.join([
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            '#EXT-X-STREAM-INF:BANDWIDTH=250000,RESOLUTION=256x144',
+            'chunklist_b250000.m3u8',
+            '#EXT-X-STREAM-INF:BANDWIDTH=1000000,RESOLUTION=848x480',
+            'chunklist_b1000000.m3u8',
+        ])
+
+    def chunklist(self, pid: int, eid: int) -> str:
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:10']
+        for n in range(self.segments_per_episode):
+            lines += ['#EXTINF:10.0,', f'media_{n}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines)
+
+    def media_bytes(self, name: str, size: int) -> bytes:
+        pattern = f'{name};'.encode('utf-8')
+        return (pattern * (size // len(pattern) + 1))[:size]
@@ -0,0 +1,87 @@
+import asyncio
+import collections
+import functools
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+class RequestCoalescer:
+    """
+    Single-flight layer for text responses: concurrent requests for the same url share one fetch, and completed
+    bodies stay in memory for later requests until they exceed max_size_bytes, least recently used first out.
+    Failed fetches aren't kept, so the next request for the url fetches it again.
+
+    >>> async def _get_twice() -> int:
+    ...     fetches = []
+    ...     async def _fetch() -> str:
+    ...         fetches.append(1)
+    ...         await asyncio.sleep(0.01)
+    ...         return 'body'
+    ...     coalescer = RequestCoalescer()
+    ...     await asyncio.gather(coalescer.get('url', _fetch), coalescer.get('url', _fetch))
+    ...     await coalescer.get('url', _fetch)
+    ...     return len(fetches)
+    >>> asyncio.run(_get_twice())
+    1
+    """
+
+    def __init__(self, max_size_bytes: int = 32 * 1024 ** 2):
+        self._max_size_bytes = max_size_bytes
+        # Bodies with their size in utf-8 bytes, as pages are mostly Chinese characters of 3 bytes each
+        self._bodies: Dict[str, Tuple[str, int]] = collections.OrderedDict()
+        self._size = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._stats = collections.Counter()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+    async def get(self, url: str, fetch: Callable[[], Awaitable[str]]) -> str:
+        body = self._lookup(url)
+        if body is not None:
+            self._stats['hit'] += 1
+            return body
+        future = self._in_flight.get(url)
+        if future:
+            self._stats['coalesced'] += 1
+        else:
+            self._stats['fetched'] += 1
+            future = asyncio.ensure_future(fetch())
+            self._in_flight[url] = future
+            future.add_done_callback(functools.partial(self._on_fetched, url))
+        # A waiter giving up doesn't cancel the fetch others may be waiting for
+        return await asyncio.shield(future)
+
+    def cancel_all(self):
+        for future in list(self._in_flight.values()):
+            future.cancel()
+
+    def _lookup(self, url: str) -> Optional[str]:
+        body_and_size = self._bodies.get(url)
+        if body_and_size is None:
+            return None
+        self._bodies.move_to_end(url)
+        return body_and_size[0]
+
+    def _on_fetched(self, url: str, future: asyncio.Future):
+        del self._in_flight[url]
+        if future.cancelled() or future.exception():
+            return
+        self._store(url, future.result())
+
+    def _store(self, url: str, body: str):
+        size = len(body.encode('utf-8'))
+        if size > self._max_size_bytes:
+            return
+        self._bodies[url] = body, size
+        self._size += size
+        while self._size > self._max_size_bytes:
+            _, (_, evicted_size) = self._bodies.popitem(last=False)
+            self._size -= evicted_size
+            self._stats['evicted'] += 1
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
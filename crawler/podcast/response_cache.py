@@ -0,0 +1,176 @@
+import collections
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import aiofiles
+import ujson
+
+from util.paths import unique_tmp_path_for
+
+# (url regex, seconds a cached response is served without revalidation). First match wins.
+DEFAULT_TTLS: List[Tuple[str, float]] = [
+    (r'/programmeList\.php\?', 12 * 3600),
+    (r'/episodeList\.php\?', 3600),
+    (r'/item\.php\?pid=\d+&eid=\d+', 7 * 24 * 3600),
+    (r'/item\.php\?pid=\d+$', 3600),
+]
+
+
+class CachedResponse(NamedTuple):
+    url: str
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    # Charset the body was sent in, so it can be encoded back to the bytes received
+    encoding: str = 'utf-8'
+
+
+class ResponseCache:
+    """
+    Persistent cache of text responses keyed by URL.
+    Entries past their TTL are revalidated with If-None-Match / If-Modified-Since instead of re-downloaded,
+    and the least recently used entries are evicted once the cache grows past max_size_bytes.
+    """
+
+    def __init__(self,
+                 cache_dir: str,
+                 max_size_bytes: int = 1024 ** 3,
+                 ttls: List[Tuple[str, float]] = DEFAULT_TTLS,
+                 default_ttl: float = 0):
+        self._cache_dir = cache_dir
+        self._max_size_bytes = max_size_bytes
+        self._ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self._default_ttl = default_ttl
+        self._stats = collections.Counter()
+        # path -> (size in bytes, last access time)
+        self._index: Dict[str, Tuple[int, float]] = {}
+        self._total_size = 0
+        self._load_index()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+    def ttl_for(self, url: str) -> float:
+        for pattern, ttl in self._ttls:
+            if pattern.search(url):
+                return ttl
+        return self._default_ttl
+
+    def is_fresh(self, response: CachedResponse) -> bool:
+        return time.time() - response.stored_at < self.ttl_for(response.url)
+
+    def conditional_headers(self, response: CachedResponse) -> Dict[str, str]:
+        headers = {}
+        if response.etag:
+            headers['If-None-Match'] = response.etag
+        if response.last_modified:
+            headers['If-Modified-Since'] = response.last_modified
+        return headers
+
+    async def lookup(self, url: str) -> Optional[CachedResponse]:
+        path = self._path_for(url)
+        if path not in self._index:
+            self._stats['miss'] += 1
+            return None
+        try:
+            async with aiofiles.open(path, mode='r', encoding='utf-8') as f:
+                response = CachedResponse(**ujson.loads(await f.read()))
+        except (OSError, ValueError, TypeError):
+            logging.warning(f'Dropping unreadable cache entry for url: {url}', exc_info=True)
+            self._remove(path)
+            self._stats['miss'] += 1
+            return None
+        if response.url != url:
+            # sha256 collision, treat as a miss
+            self._stats['miss'] += 1
+            return None
+        self._touch(path)
+        return response
+
+    async def store(self, url: str, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                    encoding: str = 'utf-8') -> CachedResponse:
+        response = CachedResponse(url=url, body=body, etag=etag, last_modified=last_modified, stored_at=time.time(),
+                                  encoding=encoding)
+        await self._write(response)
+        self._stats['store'] += 1
+        return response
+
+    async def refresh(self, response: CachedResponse) -> CachedResponse:
+        # Server answered 304 Not Modified: keep the body, restart the TTL
+        refreshed = response._replace(stored_at=time.time())
+        await self._write(refreshed)
+        self._stats['revalidated'] += 1
+        return refreshed
+
+    def record_hit(self):
+        self._stats['hit'] += 1
+
+    def _path_for(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self._cache_dir, digest[:2], f'{digest}.json')
+
+    async def _write(self, response: CachedResponse):
+        path = self._path_for(response.url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = unique_tmp_path_for(path)
+        async with aiofiles.open(tmp_path, mode='w', encoding='utf-8') as f:
+            await f.write(ujson.dumps(response._asdict(), ensure_ascii=False))
+        os.replace(tmp_path, path)
+
+        self._remove_from_index(path)
+        size = os.path.getsize(path)
+        self._index[path] = (size, time.time())
+        self._total_size += size
+        if self._total_size > self._max_size_bytes:
+            self._evict()
+
+    def _load_index(self):
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir, exist_ok=True)
+            return
+        for shard in os.scandir(self._cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    self._index[entry.path] = (stat.st_size, stat.st_mtime)
+                    self._total_size += stat.st_size
+        logging.info(f'Loaded {len(self._index)} cached responses ({self._total_size} bytes) from: {self._cache_dir}')
+
+    def _touch(self, path: str):
+        size, _ = self._index[path]
+        now = time.time()
+        self._index[path] = (size, now)
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def _evict(self):
+        # Evict down to 90% of the limit so we don't evict on every subsequent store
+        target_size = self._max_size_bytes * 0.9
+        for path, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_size <= target_size:
+                break
+            self._remove(path)
+            self._stats['evicted'] += 1
+        logging.debug(f'Evicted cache entries, cache size is now {self._total_size} bytes')
+
+    def _remove(self, path: str):
+        self._remove_from_index(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_from_index(self, path: str):
+        if path in self._index:
+            size, _ = self._index.pop(path)
+            self._total_size -= size
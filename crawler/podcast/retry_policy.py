@@ -0,0 +1,107 @@
+import logging
+import random
+import time
+from typing import Dict, FrozenSet, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryableStatusError(Exception):
+    def __init__(self, url: str, status: int):
+        super().__init__(f'Got retryable status {status} for url: {url}')
+        self.status = status
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class RetryPolicy(NamedTuple):
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    # No further attempts are started once this many seconds have passed since the first one
+    deadline: Optional[float] = 600.0
+    retryable_statuses: FrozenSet[int] = RETRYABLE_STATUSES
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Exponential backoff with full jitter.
+
+        >>> all(0 <= RetryPolicy(base_delay=1, max_delay=5).backoff(a) <= 5 for a in range(10))
+        True
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Stops traffic to a host after failure_threshold consecutive failures.
+    After reset_timeout, a single trial request is let through: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, host: str, failure_threshold: int = 10, reset_timeout: float = 30.0):
+        self._host = host
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def retry_after(self) -> float:
+        if not self.is_open:
+            return 0
+        return max(0.0, self._opened_at + self._reset_timeout - time.monotonic())
+
+    def check(self):
+        if not self.is_open:
+            return
+        if self.retry_after() > 0 or self._trial_in_flight:
+            raise CircuitOpenError(f'Circuit open for host: {self._host}')
+        self._trial_in_flight = True
+
+    def abort_trial(self):
+        # The trial request ended without telling us anything about the host, e.g. it was cancelled
+        self._trial_in_flight = False
+
+    def record_success(self):
+        if self.is_open:
+            logging.info(f'Circuit closed for host: {self._host}')
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._consecutive_failures += 1
+        if self._trial_in_flight or self._consecutive_failures >= self._failure_threshold:
+            if not self.is_open or self._trial_in_flight:
+                logging.warning(f'Circuit opened for host {self._host} after '
+                                f'{self._consecutive_failures} consecutive failures')
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class PerHostCircuitBreaker:
+    def __init__(self, **breaker_kwargs):
+        self._breaker_kwargs = breaker_kwargs
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(host, **self._breaker_kwargs)
+        return self._breakers[host]
+
+    def open_hosts(self):
+        return [host for host, breaker in self._breakers.items() if breaker.is_open]
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
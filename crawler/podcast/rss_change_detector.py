@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import ujson
+from aiohttp import ClientError
+from lxml import etree
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.retry_policy import CircuitOpenError, RetryableStatusError
+from model.podcast.episode import Episode
+from parser.podcast.rss_feed_parser import RssFeedParser, RssItem
+from util.paths import atomic_path
+
+
+class FeedState(NamedTuple):
+    rss_url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class FeedCheck(NamedTuple):
+    pid: int
+    changed: bool
+    reason: str
+    state: Optional[FeedState]  # Validators to revalidate the feed with next time
+
+
+class RssChangeDetector:
+    """
+    Cheaply tells whether a programme published anything since its episodes were crawled, by revalidating its RSS
+    feed with the ETag / Last-Modified of the previous check, and otherwise comparing the feed's items with the
+    known episodes. An item is new if its enclosure isn't the file_url of a known episode, unless it predates them all.
+    Anything that can't be checked counts as changed, so the full crawl stays the fallback.
+    """
+
+    def __init__(self, http_client: HttpClient, feed_states: Optional[Dict[int, FeedState]] = None):
+        self._http_client = http_client
+        self._feed_states = feed_states or {}
+        self._rss_feed_parser = RssFeedParser()
+
+    async def check(self, pid: int, known_episodes: List[Episode]) -> FeedCheck:
+        if not known_episodes:
+            return FeedCheck(pid=pid, changed=True, reason='no known episodes', state=None)
+        rss_url = next((episode.rss_url for episode in known_episodes if _is_set(episode.rss_url)), None)
+        if not rss_url:
+            return FeedCheck(pid=pid, changed=True, reason='no RSS feed', state=None)
+
+        state = self._feed_states.get(pid)
+        if state and state.rss_url != rss_url:
+            state = None
+        try:
+            resp = await self._http_client.get_conditional(rss_url,
+                                                           etag=state.etag if state else None,
+                                                           last_modified=state.last_modified if state else None)
+        except (ClientError, asyncio.TimeoutError, RetryableStatusError, CircuitOpenError) as e:
+            logging.warning(f'Failed to check RSS feed of pid {pid}: {e!r}')
+            return FeedCheck(pid=pid, changed=True, reason='RSS feed unavailable', state=None)
+
+        new_state = FeedState(rss_url=rss_url, etag=resp.etag, last_modified=resp.last_modified)
+        if resp.status == 304:
+            return FeedCheck(pid=pid, changed=False, reason='not modified', state=new_state)
+        if resp.status != 200:
+            logging.warning(f'RSS feed of pid {pid} returned {resp.status}: {rss_url}')
+            return FeedCheck(pid=pid, changed=True, reason='RSS feed unavailable', state=None)
+        try:
+            items = self._rss_feed_parser.parse(resp.body)
+        except etree.LxmlError:
+            logging.warning(f'Failed to parse RSS feed of pid {pid}: {rss_url}', exc_info=True)
+            return FeedCheck(pid=pid, changed=True, reason='RSS feed unparsable', state=None)
+
+        new_items = _new_items(items, known_episodes)
+        if new_items:
+            logging.debug(f'pid {pid} has {len(new_items)} new RSS items, e.g.: {new_items[0]}')
+            return FeedCheck(pid=pid, changed=True, reason='new RSS items', state=new_state)
+        return FeedCheck(pid=pid, changed=False, reason='no new RSS items', state=new_state)
+
+
+def _is_set(value) -> bool:
+    return value is not None and value == value  # not None or nan
+
+
+def _to_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _url_path(url: str) -> str:
+    # Feeds and episodeList.php may link the same file over different schemes or hosts
+    return urlsplit(url).path
+
+
+def _new_items(items: List[RssItem], known_episodes: List[Episode]) -> List[RssItem]:
+    known_paths = {_url_path(episode.file_url) for episode in known_episodes if _is_set(episode.file_url)}
+    known_dates = [_to_date(episode.episode_date) for episode in known_episodes if _is_set(episode.episode_date)]
+    earliest_date = min(known_dates) if known_dates else None
+    return [item for item in items
+            if not (item.enclosure_url and _url_path(item.enclosure_url) in known_paths)
+            and not (item.pub_date and earliest_date and item.pub_date < earliest_date)]
+
+
+def feed_states_path_for(csv_path: str) -> str:
+    return f'{csv_path}.rss.json'
+
+
+def read_feed_states(path: str) -> Dict[int, FeedState]:
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return {int(pid): FeedState(**state) for pid, state in ujson.load(f).items()}
+
+
+def write_feed_states(path: str, feed_states: Dict[int, FeedState]):
+    with atomic_path(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+        ujson.dump({str(pid): state._asdict() for pid, state in sorted(feed_states.items())}, f)
@@ -0,0 +1,111 @@
+import collections
+from typing import Dict, List, NamedTuple
+
+import ujson
+
+from util.paths import atomic_path
+
+
+class Shard(NamedTuple):
+    """
+    One of count deterministic partitions of pids, numbered from 1.
+
+    >>> shard = Shard.parse('3/8')
+    >>> shard, [pid for pid in range(20) if shard.contains(pid)]
+    (Shard(index=3, count=8), [2, 10, 18])
+    >>> str(shard)
+    '3/8'
+    """
+    index: int
+    count: int
+
+    @staticmethod
+    def parse(spec: str) -> 'Shard':
+        index, _, count = spec.partition('/')
+        shard = Shard(index=int(index), count=int(count))
+        if not 1 <= shard.index <= shard.count:
+            raise ValueError(f'Shard is not of the form INDEX/COUNT with 1 <= INDEX <= COUNT: {spec}')
+        return shard
+
+    def contains(self, pid: int) -> bool:
+        return pid % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        return f'{self.index}/{self.count}'
+
+
+class ShardManifest(NamedTuple):
+    shard: Shard
+    discovered_pids: List[int]  # All pids found by this shard, including those of other shards
+    written_pids: List[int]  # pids of this shard with episodes in its csv
+    empty_pids: List[int]  # pids of this shard without any episodes
+
+    def write(self, path: str):
+        with atomic_path(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+            ujson.dump({'shard': str(self.shard),
+                        'discovered_pids': sorted(self.discovered_pids),
+                        'written_pids': sorted(self.written_pids),
+                        'empty_pids': sorted(self.empty_pids)}, f)
+
+    @staticmethod
+    def read(path: str) -> 'ShardManifest':
+        with open(path, encoding='utf-8') as f:
+            manifest = ujson.load(f)
+        return ShardManifest(shard=Shard.parse(manifest['shard']),
+                             discovered_pids=manifest['discovered_pids'],
+                             written_pids=manifest['written_pids'],
+                             empty_pids=manifest['empty_pids'])
+
+
+def manifest_path_for(csv_path: str) -> str:
+    return f'{csv_path}.shard.json'
+
+
+def find_conflicts(manifests: List[ShardManifest]) -> List[str]:
+    """
+    Returns the reasons why the shards' csvs can't be merged without duplicates.
+
+    >>> find_conflicts([ShardManifest(Shard(1, 2), [1, 2], [2], []), ShardManifest(Shard(1, 2), [1, 2], [2], [])])
+    ['Shard 1/2 is given 2 times', 'pid 2 is in more than one shard: 1/2, 1/2']
+    """
+    counts = {manifest.shard.count for manifest in manifests}
+    if len(counts) > 1:
+        return [f'Shards disagree on the number of shards: {sorted(counts)}']
+    conflicts = [f'Shard {shard} is given {n} times' for shard, n in _count_shards(manifests).items() if n > 1]
+    shards_by_pid = collections.defaultdict(list)
+    for manifest in manifests:
+        for pid in manifest.written_pids + manifest.empty_pids:
+            shards_by_pid[pid].append(manifest.shard)
+            if not manifest.shard.contains(pid):
+                conflicts.append(f'pid {pid} does not belong to shard {manifest.shard}')
+    conflicts += [f'pid {pid} is in more than one shard: {", ".join(map(str, shards))}'
+                  for pid, shards in sorted(shards_by_pid.items()) if len(shards) > 1]
+    return conflicts
+
+
+def find_missing(manifests: List[ShardManifest]) -> List[str]:
+    """
+    Returns the shards and pids missing from the shards' csvs.
+
+    >>> find_missing([ShardManifest(Shard(1, 3), [1, 2, 3], [3], []), ShardManifest(Shard(2, 3), [1, 2, 4], [1], [4])])
+    ['Shard 3/3 is missing', 'pid 2 was discovered but is missing from shard 3/3']
+    """
+    count = manifests[0].shard.count
+    given_shards = _count_shards(manifests)
+    missing = [f'Shard {shard} is missing' for shard in (Shard(index, count) for index in range(1, count + 1))
+               if shard not in given_shards]
+    crawled_pids = {pid for manifest in manifests for pid in manifest.written_pids + manifest.empty_pids}
+    discovered_pids = sorted({pid for manifest in manifests for pid in manifest.discovered_pids})
+    missing += [f'pid {pid} was discovered but is missing from shard {Shard(pid % count + 1, count)}'
+                for pid in discovered_pids if pid not in crawled_pids]
+    return missing
+
+
+def _count_shards(manifests: List[ShardManifest]) -> Dict[Shard, int]:
+    return collections.Counter(manifest.shard for manifest in manifests)
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,46 @@
+import pytest
+
+from crawler.podcast.checkpoint_journal import CheckpointJournal
+from crawler.podcast.client import HttpClient
+from crawler.podcast.episode_list_crawler import EpisodeListCrawler
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from model.podcast.episode import Episode
+from util.dates import ymd_to_date
+
+
+@pytest.mark.asyncio
+async def test_restarted_crawl_skips_journaled_work_offline(tmp_path):
+    site = SyntheticSite(num_programmes=1, num_years=2, episodes_per_year=10)
+    journal_path = str(tmp_path / 'out.csv.checkpoint.sqlite')
+    async with ReplayServer(site) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites, memory_cache_bytes=0) as http_client:
+            with CheckpointJournal(journal_path) as journal:
+                _, episodes = await EpisodeListCrawler(http_client, checkpoint_journal=journal) \
+                    .list_all_episodes(site.pids[0])
+                assert server.stats['requests'] == 1 + 2 + 20
+
+            # As if the crawl died before the pid finished
+            with CheckpointJournal(journal_path) as journal:
+                _, restarted_episodes = await EpisodeListCrawler(http_client, checkpoint_journal=journal) \
+                    .list_all_episodes(site.pids[0])
+                assert server.stats['requests'] == 1 + 2 + 20 + 1
+                assert sorted(restarted_episodes) == sorted(episodes)
+
+
+def test_finished_pid_supersedes_years_and_episode_pages(tmp_path):
+    site = SyntheticSite(num_programmes=1)
+    pid = site.pids[0]
+    episodes = [Episode(pid=pid, eid=1, programme_title='節目', episode_date=ymd_to_date('2021-02-03'),
+                        duration_seconds=60, cids=[1, 2], category_names=['a', 'b']),
+                Episode(pid=pid, eid=2)]
+    with CheckpointJournal(str(tmp_path / 'journal.sqlite')) as journal:
+        journal.record_year(pid, 2021, episodes)
+        journal.record_episode_page(episodes[0])
+        journal.record_finished_pid(pid, episodes)
+        assert journal.year_episodes(pid) == {}
+        assert journal.episode_pages(pid) == {}
+        assert journal.finished_pids() == [pid]
+        assert list(journal.finished_pid_episodes()) == [(pid, episodes)]
+        journal.delete()
+    assert list(tmp_path.iterdir()) == []
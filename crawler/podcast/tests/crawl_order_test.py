@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.crawl_order import largest_first_as_estimated
+from crawler.podcast.episode_list_crawler import EpisodeListCrawler
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from crawler.podcast.work_queue import WorkQueue
+from model.podcast.episode import Episode
+from util.dates import ymd_to_date
+
+
+class _BlockedProgrammePages:
+    # Programme pages of pids with years, each returned once released
+    def __init__(self, num_years_by_pid):
+        self._num_years_by_pid = num_years_by_pid
+        self.released = {pid: asyncio.Event() for pid in num_years_by_pid}
+
+    async def get_programme_page(self, pid):
+        await self.released[pid].wait()
+        return list(range(2021 - self._num_years_by_pid[pid], 2021)), Episode(pid=pid, eid=0)
+
+
+async def _settle():
+    # Lets the released estimates, which do no I/O, reach the crawl order
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_crawls_known_pids_while_estimating_others():
+    previous_episodes_by_pid = {
+        1000: [Episode(pid=1000, eid=i, episode_date=ymd_to_date(f'{2020 + i % 2}-01-01')) for i in range(100)],
+        1004: [Episode(pid=1004, eid=i, episode_date=ymd_to_date('2020-01-01')) for i in range(10)],
+    }
+    # 30 episodes per year in previous episodes
+    programme_pages = _BlockedProgrammePages({1001: 2, 1002: 10, 1003: 2})
+    pids = largest_first_as_estimated([1000, 1001, 1002, 1003, 1004], previous_episodes_by_pid, programme_pages,
+                                      num_workers=2)
+    # Known pids don't wait for any estimate
+    assert await pids.__anext__() == (1000, None)
+    assert await pids.__anext__() == (1004, None)
+
+    programme_pages.released[1001].set()
+    assert await pids.__anext__() == (1001, ([2019, 2020], Episode(pid=1001, eid=0)))
+
+    programme_pages.released[1003].set()
+    programme_pages.released[1002].set()
+    await _settle()
+    assert [pid async for pid, _ in pids] == [1002, 1003]
+
+
+@pytest.mark.asyncio
+async def test_programme_pages_of_estimates_are_reused_offline():
+    site = SyntheticSite(num_programmes=3, num_years_for_pid=lambda pid: 10 if pid == 1002 else 2)
+    async with ReplayServer(site) as server:
+        # Without the in-memory cache, so that reusing programme pages doesn't depend on it
+        async with HttpClient(url_rewrites=server.url_rewrites, memory_cache_bytes=0) as http_client:
+            crawler = EpisodeListCrawler(http_client)
+            programme_pages = {pid: programme_page async for pid, programme_page
+                               in largest_first_as_estimated(site.pids, {}, crawler, num_workers=2)}
+            assert sorted(programme_pages) == site.pids
+            assert programme_pages[1002][0] == site.years(1002)
+
+            # Programme pages fetched for the estimate are reused by the crawl, which only fetches the years
+            requests_before = server.stats['requests']
+            await crawler.list_all_episodes(1002, fetch_episode_pages=False, programme_page=programme_pages[1002])
+            assert server.stats['requests'] - requests_before == 10
+
+
+@pytest.mark.asyncio
+async def test_pid_work_queue_pulls_estimates_without_waiting_on_itself_offline():
+    site = SyntheticSite(num_programmes=4, num_years=1, episodes_per_year=2)
+    async with ReplayServer(site) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites) as http_client, \
+                WorkQueue('pid', num_workers=1) as pid_work_queue:
+            crawler = EpisodeListCrawler(http_client)
+
+            async def _crawl_pid(pid_and_programme_page):
+                pid, programme_page = pid_and_programme_page
+                return await crawler.list_all_episodes(pid, fetch_episode_pages=False, programme_page=programme_page)
+
+            pids_and_programme_pages = largest_first_as_estimated(site.pids, {}, crawler, num_workers=1)
+            crawled = [pid async for pid, _ in pid_work_queue.map_unordered(_crawl_pid, pids_and_programme_pages)]
+            assert sorted(crawled) == site.pids
@@ -1,13 +1,84 @@
-import asyncio
+from datetime import date, datetime
 
 import pytest
 
+from crawler.podcast.client import HttpClient
 from crawler.podcast.episode_list_crawler import EpisodeListCrawler
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from crawler.podcast.retry_policy import RetryPolicy
 
 
 @pytest.mark.asyncio
 async def test_list_all_episodes():
-    crawler = EpisodeListCrawler(asyncio.Semaphore(100))
-    pid, episodes = await crawler.list_all_episodes(pid=256)
-    assert pid == 244
-    assert len(episodes) >= 555
+    async with HttpClient(parallelism=100) as http_client:
+        crawler = EpisodeListCrawler(http_client)
+        pid, episodes = await crawler.list_all_episodes(pid=256)
+        assert pid == 244
+        assert len(episodes) >= 555
+
+
+@pytest.mark.asyncio
+async def test_list_all_episodes_offline():
+    site = SyntheticSite(num_programmes=1, num_years=3, episodes_per_year=20)
+    async with ReplayServer(site, error_rate=0.05) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites,
+                              retry_policy=RetryPolicy(base_delay=0.01)) as http_client:
+            crawler = EpisodeListCrawler(http_client)
+            pid, episodes = await crawler.list_all_episodes(pid=site.pids[0])
+            assert pid == site.pids[0]
+            assert len(episodes) == 60
+            assert episodes[0].programme_title == '節目 1000'
+            assert episodes[0].cids == [7, 8]
+            assert episodes[0].m3u8_url.endswith(f'/hls/1000/{episodes[0].eid}/playlist.m3u8')
+            assert episodes[0].rss_url == 'https://podcast.rthk.hk/podcast/programme_1000.xml'
+
+
+@pytest.mark.asyncio
+async def test_list_all_episodes_with_known_episodes_offline():
+    site = SyntheticSite(num_programmes=1, num_years=3, last_year=date.today().year, episodes_per_year=20)
+    async with ReplayServer(site) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites, memory_cache_bytes=0) as http_client:
+            crawler = EpisodeListCrawler(http_client)
+            _, all_episodes = await crawler.list_all_episodes(pid=site.pids[0])
+            new_eids = {e.eid for e in all_episodes if e.episode_date.year == date.today().year}
+            new_eids = set(sorted(new_eids)[-5:])
+            known_episodes = [e for e in all_episodes if e.eid not in new_eids]
+
+            requests_before = server.stats['requests']
+            pid, episodes = await crawler.list_all_episodes(pid=site.pids[0], known_episodes=known_episodes)
+            # 1 item.php for years, 1 episodeList.php for the current year, 5 item.php for new episodes
+            assert server.stats['requests'] - requests_before == 7
+            assert sorted(episodes, key=lambda e: e.eid) == sorted(all_episodes, key=lambda e: e.eid)
+
+
+@pytest.mark.asyncio
+async def test_list_all_episodes_keeps_undated_and_unlisted_known_episodes_offline():
+    site = SyntheticSite(num_programmes=1, num_years=3, last_year=date.today().year, episodes_per_year=20)
+    async with ReplayServer(site) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites) as http_client:
+            crawler = EpisodeListCrawler(http_client)
+            _, all_episodes = await crawler.list_all_episodes(pid=site.pids[0])
+            undated_episode = all_episodes[0]._replace(eid=1, episode_date=None)
+            unlisted_year_episode = all_episodes[0]._replace(eid=2, episode_date=datetime(1990, 1, 1))
+            known_episodes = all_episodes + [undated_episode, unlisted_year_episode]
+
+            _, episodes = await crawler.list_all_episodes(pid=site.pids[0], known_episodes=known_episodes)
+            assert sorted(episodes, key=lambda e: e.eid) == sorted(known_episodes, key=lambda e: e.eid)
+
+
+@pytest.mark.asyncio
+async def test_list_all_episodes_without_episode_pages_offline():
+    site = SyntheticSite(num_programmes=1, num_years=3, episodes_per_year=20)
+    async with ReplayServer(site) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites) as http_client:
+            crawler = EpisodeListCrawler(http_client)
+            pid, episodes = await crawler.list_all_episodes(pid=site.pids[0], fetch_episode_pages=False)
+            # 1 item.php for the programme, 1 episodeList.php per year
+            assert server.stats['requests'] == 4
+            assert len(episodes) == 60
+            assert episodes[0].programme_title == '節目 1000'
+            assert episodes[0].cids == [7, 8]
+            assert episodes[0].rss_url == 'https://podcast.rthk.hk/podcast/programme_1000.xml'
+            assert episodes[0].og_title is None
+            assert episodes[0].m3u8_url is None
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from crawler.podcast.host_limiter import AdaptiveLimiter, PerHostLimiter
+
+
+def test_additive_increase_multiplicative_decrease():
+    limiter = AdaptiveLimiter('podcast.rthk.hk', initial_limit=4, max_limit=6, decrease_cooldown=0)
+    for _ in range(100):
+        limiter.on_success(latency=0.1)
+    assert limiter.limit == 6
+
+    limiter.on_throttled(429)
+    assert limiter.limit == 3
+    limiter.on_error()
+    assert limiter.limit == 2
+
+
+def test_limits_are_per_host():
+    host_limiter = PerHostLimiter(max_limit=10)
+    host_limiter.for_url('https://podcast.rthk.hk/podcast/item.php?pid=1').on_throttled(503)
+    host_limiter.for_url('https://stmw3.rthk.hk/abc/chunklist.m3u8')
+    assert host_limiter.limits() == {'podcast.rthk.hk': 2, 'stmw3.rthk.hk': 5}
+
+
+@pytest.mark.asyncio
+async def test_in_flight_never_exceeds_limit():
+    host_limiter = PerHostLimiter(max_limit=3, initial_limit=3)
+    max_in_flight = 0
+
+    async def _request():
+        nonlocal max_in_flight
+        async with host_limiter.slot('https://podcast.rthk.hk/x'):
+            max_in_flight = max(max_in_flight, host_limiter.for_url('https://podcast.rthk.hk/x').in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[_request() for _ in range(20)])
+    assert max_in_flight == 3
+    assert host_limiter.for_url('https://podcast.rthk.hk/x').in_flight == 0
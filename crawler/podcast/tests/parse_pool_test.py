@@ -0,0 +1,36 @@
+import pytest
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.episode_list_crawler import EpisodeListCrawler
+from crawler.podcast.parse_pool import ParsePool
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+
+
+@pytest.mark.asyncio
+async def test_inline_pool_reports_stats():
+    async with ParsePool('inline') as parse_pool:
+        assert await parse_pool.run(int, '42') == 42
+        assert parse_pool.queue_depth == 0
+        assert parse_pool.stats['parsed'] == 1
+        assert parse_pool.stats['max_queue_depth'] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_pool_parses_like_inline_offline():
+    site = SyntheticSite(num_programmes=3, num_years=2, episodes_per_year=5)
+    async with ReplayServer(site) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites) as http_client:
+            inline_episodes = [await EpisodeListCrawler(http_client).list_all_episodes(pid) for pid in site.pids]
+            async with ParsePool('process', max_workers=2) as parse_pool:
+                crawler = EpisodeListCrawler(http_client, parse_pool)
+                process_episodes = [await crawler.list_all_episodes(pid) for pid in site.pids]
+                # item.php pages; episodeList.php documents are parsed as they are downloaded
+                assert parse_pool.stats['parsed'] == 3 * (1 + 10)
+                assert parse_pool.queue_depth == 0
+            assert process_episodes == inline_episodes
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        ParsePool('gpu')
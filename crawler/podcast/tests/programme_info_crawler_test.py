@@ -1,16 +1,31 @@
-import asyncio
-
 import pytest
 
+from crawler.podcast.client import HttpClient
 from crawler.podcast.programme_info_crawler import ProgrammeInfoCrawler
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
 
 
 @pytest.mark.asyncio
 async def test_list_programme():
-    crawler = ProgrammeInfoCrawler(asyncio.Semaphore())
-    programme_info = await crawler.get_programme_info(244)
-    assert programme_info.pid == 244
-    assert programme_info.title == '鏗鏘集'
-    assert '《鏗鏘集》是一個屬於觀眾的節目。 ' in programme_info.description
-    assert programme_info.language == '中文'
-    assert programme_info.rss_url == 'https://podcast.rthk.hk/podcast/hongkongconnection_i.xml'
+    async with HttpClient(parallelism=1) as http_client:
+        crawler = ProgrammeInfoCrawler(http_client)
+        programme_info = await crawler.get_programme_info(244)
+        assert programme_info.pid == 244
+        assert programme_info.title == '鏗鏘集'
+        assert '《鏗鏘集》是一個屬於觀眾的節目。 ' in programme_info.description
+        assert programme_info.language == '中文'
+        assert programme_info.rss_url == 'https://podcast.rthk.hk/podcast/hongkongconnection_i.xml'
+
+
+@pytest.mark.asyncio
+async def test_list_programme_offline():
+    async with ReplayServer(SyntheticSite(num_programmes=2)) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites) as http_client:
+            crawler = ProgrammeInfoCrawler(http_client)
+            programme_info = await crawler.get_programme_info(1001)
+            assert programme_info.pid == 1001
+            assert programme_info.title == 'Programme 1001'
+            assert programme_info.language == '英文'
+            assert programme_info.category_names == ['Category 1', 'Category 8']
+            assert programme_info.rss_url == 'https://podcast.rthk.hk/podcast/programme_1001.xml'
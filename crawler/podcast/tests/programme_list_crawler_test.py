@@ -1,14 +1,51 @@
-import asyncio
-
 import pytest
 
+from crawler.podcast.client import HttpClient
+from crawler.podcast.programme_list_cache import ProgrammeListCache
 from crawler.podcast.programme_list_crawler import ProgrammeListCrawler
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
 
 
 @pytest.mark.asyncio
 async def test_list_programme():
-    crawler = ProgrammeListCrawler(asyncio.Semaphore(100))
-    chinese_programmes = await crawler.list_programmes(language='zh-CN')
-    english_programmes = await crawler.list_programmes(language='en-US')
-    assert len(chinese_programmes) >= 1011
-    assert len(english_programmes) >= 230
+    async with HttpClient(parallelism=100) as http_client:
+        crawler = ProgrammeListCrawler(http_client)
+        chinese_programmes = await crawler.list_programmes(language='zh-CN')
+        english_programmes = await crawler.list_programmes(language='en-US')
+        assert len(chinese_programmes) >= 1011
+        assert len(english_programmes) >= 230
+
+
+@pytest.mark.asyncio
+async def test_list_programme_offline():
+    async with ReplayServer(SyntheticSite(num_programmes=101, programmes_per_page=20)) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites) as http_client:
+            crawler = ProgrammeListCrawler(http_client)
+            chinese_programmes = await crawler.list_programmes(language='zh-CN')
+            english_programmes = await crawler.list_programmes(language='en-US')
+            assert len(chinese_programmes) == 51
+            assert len(english_programmes) == 50
+
+
+@pytest.mark.asyncio
+async def test_list_all_programmes_with_cache_offline(tmp_path):
+    async with ReplayServer(SyntheticSite(num_programmes=101, programmes_per_page=20)) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites, memory_cache_bytes=0) as http_client:
+            crawler = ProgrammeListCrawler(http_client,
+                                           programme_list_cache=ProgrammeListCache(str(tmp_path / 'programmes.json')))
+            programmes = await crawler.list_all_programmes()
+            # 3 pages per language, page 1 fetched only once
+            assert server.stats['requests'] == 6
+            assert len(programmes) == 101
+
+            crawler = ProgrammeListCrawler(http_client,
+                                           programme_list_cache=ProgrammeListCache(str(tmp_path / 'programmes.json')))
+            assert await crawler.list_all_programmes() == programmes
+            assert server.stats['requests'] == 6
+
+            crawler = ProgrammeListCrawler(http_client,
+                                           programme_list_cache=ProgrammeListCache(str(tmp_path / 'programmes.json'),
+                                                                                   ttl=0))
+            assert await crawler.list_all_programmes() == programmes
+            assert server.stats['requests'] == 12
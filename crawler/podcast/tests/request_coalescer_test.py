@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from crawler.podcast.request_coalescer import RequestCoalescer
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_share_one_request_offline():
+    site = SyntheticSite(num_programmes=1)
+    async with ReplayServer(site, latency=0.05) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites) as http_client:
+            url = f'https://podcast.rthk.hk/podcast/item.php?pid={site.pids[0]}'
+            bodies = await asyncio.gather(*[http_client.get(url) for _ in range(10)])
+            assert await http_client.get(url) == bodies[0]
+            assert len(set(bodies)) == 1
+            assert server.stats['requests'] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_fetch_is_not_kept():
+    attempts = []
+
+    async def _fetch() -> str:
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError()
+        return 'body'
+
+    coalescer = RequestCoalescer()
+    with pytest.raises(ValueError):
+        await coalescer.get('url', _fetch)
+    assert await coalescer.get('url', _fetch) == 'body'
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used():
+    async def _fetch() -> str:
+        return 'x' * 40
+
+    coalescer = RequestCoalescer(max_size_bytes=100)
+    for url in ['a', 'b', 'a', 'c']:
+        await coalescer.get(url, _fetch)
+    assert coalescer.stats == {'fetched': 3, 'hit': 1, 'evicted': 1}
+    await coalescer.get('a', _fetch)
+    assert coalescer.stats['hit'] == 2
+
+
+@pytest.mark.asyncio
+async def test_counts_size_in_utf8_bytes():
+    async def _fetch() -> str:
+        return '節目' * 10  # 20 characters of 60 bytes
+
+    coalescer = RequestCoalescer(max_size_bytes=100)
+    for url in ['a', 'b']:
+        await coalescer.get(url, _fetch)
+    assert coalescer.stats['evicted'] == 1
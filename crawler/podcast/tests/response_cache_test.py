@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from lxml import etree
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.response_cache import ResponseCache
+
+
+@pytest.mark.asyncio
+async def test_store_and_lookup(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttls=[(r'/fresh', 3600)])
+    await cache.store('http://host/fresh', '<xml/>', etag='"abc"')
+    await cache.store('http://host/stale', '<html/>', last_modified='Mon, 01 Jan 2021 00:00:00 GMT')
+
+    fresh = await cache.lookup('http://host/fresh')
+    stale = await cache.lookup('http://host/stale')
+    assert fresh.body == '<xml/>'
+    assert cache.is_fresh(fresh)
+    assert not cache.is_fresh(stale)
+    assert cache.conditional_headers(fresh) == {'If-None-Match': '"abc"'}
+    assert cache.conditional_headers(stale) == {'If-Modified-Since': 'Mon, 01 Jan 2021 00:00:00 GMT'}
+    assert await cache.lookup('http://host/missing') is None
+
+    # Index is rebuilt from disk
+    assert (await ResponseCache(str(tmp_path)).lookup('http://host/fresh')).etag == '"abc"'
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stores_of_same_url(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    bodies = [str(i) * (1000 * i) for i in range(1, 10)]
+    await asyncio.gather(*(cache.store('http://host/page', body) for body in bodies))
+
+    assert (await cache.lookup('http://host/page')).body in bodies
+    assert [path.suffix for path in tmp_path.glob('*/*')] == ['.json']
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_size_bytes=1000)
+    for i in range(10):
+        await cache.store(f'http://host/{i}', 'x' * 200)
+    assert cache.stats['evicted'] > 0
+    assert await cache.lookup('http://host/0') is None
+    assert (await cache.lookup('http://host/9')).body == 'x' * 200
+
+
+@pytest.mark.asyncio
+async def test_client_revalidates_with_etag(tmp_path):
+    requests = []
+
+    async def _handle(request: web.Request) -> web.Response:
+        requests.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304)
+        return web.Response(text='<episodeList/>', headers={'ETag': '"v1"'})
+
+    app = web.Application()
+    app.router.add_get('/podcast/episodeList.php', _handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f'http://127.0.0.1:{port}/podcast/episodeList.php?pid=1&year=2021&display=all'
+
+    try:
+        cache = ResponseCache(str(tmp_path), ttls=[])
+        async with HttpClient(response_cache=cache, memory_cache_bytes=0) as http_client:
+            assert await http_client.get(url) == '<episodeList/>'
+            assert await http_client.get(url) == '<episodeList/>'
+        assert requests == [None, '"v1"']
+        assert cache.stats['revalidated'] == 1
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_client_feeds_cached_body_in_its_charset(tmp_path):
+    body = '<?xml version="1.0" encoding="big5"?><episodeList><title>節目</title></episodeList>'.encode('big5')
+
+    async def _handle(request: web.Request) -> web.Response:
+        return web.Response(body=body, content_type='text/xml', charset='big5')
+
+    app = web.Application()
+    app.router.add_get('/podcast/episodeList.php', _handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f'http://127.0.0.1:{port}/podcast/episodeList.php?pid=1&year=2021&display=all'
+
+    try:
+        cache = ResponseCache(str(tmp_path), ttls=[(r'/episodeList\.php', 3600)])
+        async with HttpClient(response_cache=cache, memory_cache_bytes=0) as http_client:
+            titles = []
+            for _ in range(2):
+                parser = await http_client.get_incremental(url, etree.XMLPullParser)
+                titles.append(parser.close().findtext('title'))
+        assert titles == ['節目', '節目']
+        assert cache.stats['hit'] == 1
+    finally:
+        await runner.cleanup()
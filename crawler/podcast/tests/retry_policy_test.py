@@ -0,0 +1,110 @@
+import asyncio
+import types
+
+import pytest
+from aiohttp import web
+
+from crawler.podcast import client
+from crawler.podcast.client import HttpClient
+from crawler.podcast.retry_policy import CircuitBreaker, CircuitOpenError, PerHostCircuitBreaker, RetryPolicy, \
+    RetryableStatusError
+
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('stmw.rthk.hk', failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.is_open
+
+    # Half open: a single trial request is let through
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_success()
+    assert not breaker.is_open
+
+
+async def _start_server(handler) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    return runner
+
+
+@pytest.mark.asyncio
+async def test_client_retries_retryable_statuses():
+    num_requests = 0
+
+    async def _handle(request: web.Request) -> web.Response:
+        nonlocal num_requests
+        num_requests += 1
+        if num_requests < 3:
+            return web.Response(status=503)
+        return web.Response(text='ok')
+
+    runner = await _start_server(_handle)
+    try:
+        url = f'http://127.0.0.1:{runner.addresses[0][1]}/podcast/item.php?pid=1'
+        async with HttpClient(retry_policy=RetryPolicy(base_delay=0.01)) as http_client:
+            assert await http_client.get(url) == 'ok'
+            assert http_client.stats['retries'] == 2
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_client_gives_up_and_opens_circuit():
+    async def _handle(request: web.Request) -> web.Response:
+        return web.Response(status=500)
+
+    runner = await _start_server(_handle)
+    try:
+        url = f'http://127.0.0.1:{runner.addresses[0][1]}/hls/chunklist.m3u8'
+        async with HttpClient(retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01, deadline=5),
+                              circuit_breaker=PerHostCircuitBreaker(failure_threshold=3,
+                                                                    reset_timeout=60)) as http_client:
+            with pytest.raises(RetryableStatusError):
+                await http_client.get(url)
+            with pytest.raises(CircuitOpenError):
+                await http_client.get(url)
+            assert http_client.stats['gave_up'] == 2
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_client_keeps_resuming_progressing_download_past_deadline(tmp_path, monkeypatch):
+    content = b'0123456789'
+    now = 0.0
+    monkeypatch.setattr(client, 'time', types.SimpleNamespace(monotonic=lambda: now))
+
+    async def _handle(request: web.Request) -> web.StreamResponse:
+        nonlocal now
+        if request.method == 'HEAD':
+            return web.Response(headers={'Accept-Ranges': 'bytes', 'Content-Length': str(len(content))})
+        # Each request takes longer than the deadline, sends 2 bytes and then drops the connection
+        now += 400
+        start = int(request.headers['Range'][len('bytes='):].split('-')[0])
+        resp = web.StreamResponse(status=206,
+                                  headers={'Content-Range': f'bytes {start}-{len(content) - 1}/{len(content)}',
+                                           'Content-Length': str(len(content) - start)})
+        await resp.prepare(request)
+        await resp.write(content[start:start + 2])
+        if start + 2 < len(content):
+            # Lets the client write the bytes before the connection drops
+            await asyncio.sleep(0.05)
+            raise ConnectionResetError()
+        return resp
+
+    runner = await _start_server(_handle)
+    try:
+        url = f'http://127.0.0.1:{runner.addresses[0][1]}/podcast/media/1.mp4'
+        async with HttpClient(retry_policy=RetryPolicy(max_attempts=10, base_delay=0.01, deadline=600)) as http_client:
+            await http_client.get_resumable(url, str(tmp_path / '1.mp4'))
+            assert http_client.stats['retries'] == 4
+        assert (tmp_path / '1.mp4').read_bytes() == content
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,38 @@
+import pytest
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.episode_list_crawler import EpisodeListCrawler
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from crawler.podcast.rss_change_detector import RssChangeDetector
+
+
+@pytest.mark.asyncio
+async def test_detects_new_episodes_and_revalidates_offline():
+    site = SyntheticSite(num_programmes=1, num_years=2, episodes_per_year=20)
+    pid = site.pids[0]
+    async with ReplayServer(site) as server:
+        async with HttpClient(url_rewrites=server.url_rewrites) as http_client:
+            _, episodes = await EpisodeListCrawler(http_client).list_all_episodes(pid, fetch_episode_pages=False)
+            latest_episode = max(episodes, key=lambda e: e.episode_date)
+            stale_episodes = [e for e in episodes if e.eid != latest_episode.eid]
+
+            check = await RssChangeDetector(http_client).check(pid, stale_episodes)
+            assert check.changed and check.reason == 'new RSS items'
+
+            check = await RssChangeDetector(http_client).check(pid, episodes)
+            assert not check.changed and check.reason == 'no new RSS items'
+            assert check.state.etag
+
+            requests_before = server.stats['requests']
+            check = await RssChangeDetector(http_client, {pid: check.state}).check(pid, episodes)
+            assert not check.changed and check.reason == 'not modified'
+            assert server.stats['not_modified'] == 1
+            assert server.stats['requests'] - requests_before == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_programmes_count_as_changed_offline():
+    async with HttpClient() as http_client:
+        check = await RssChangeDetector(http_client).check(1000, [])
+        assert check.changed and check.state is None
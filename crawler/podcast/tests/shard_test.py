@@ -0,0 +1,29 @@
+from crawler.podcast.shard import Shard, ShardManifest, find_conflicts, find_missing, manifest_path_for
+
+
+def test_shards_partition_pids():
+    shards = [Shard(index, 4) for index in range(1, 5)]
+    for pid in range(100):
+        assert sum(shard.contains(pid) for shard in shards) == 1
+
+
+def test_manifest_roundtrip(tmp_path):
+    manifest = ShardManifest(Shard(2, 3), discovered_pids=[3, 1, 4], written_pids=[4, 1], empty_pids=[])
+    path = manifest_path_for(str(tmp_path / 'out.csv'))
+    manifest.write(path)
+    assert ShardManifest.read(path) == manifest._replace(discovered_pids=[1, 3, 4], written_pids=[1, 4])
+
+
+def test_complete_shards_have_no_problems():
+    discovered_pids = list(range(10))
+    manifests = [ShardManifest(shard, discovered_pids, [pid for pid in discovered_pids if shard.contains(pid)], [])
+                 for shard in [Shard(1, 2), Shard(2, 2)]]
+    assert find_conflicts(manifests) == []
+    assert find_missing(manifests) == []
+
+
+def test_finds_pids_in_wrong_shard():
+    manifests = [ShardManifest(Shard(1, 2), [2, 3], [2, 3], []), ShardManifest(Shard(2, 2), [2, 3], [3], [])]
+    assert find_conflicts(manifests) == ['pid 3 does not belong to shard 1/2',
+                                         'pid 3 is in more than one shard: 1/2, 2/2']
+    assert find_missing(manifests) == []
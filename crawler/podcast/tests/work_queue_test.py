@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from crawler.podcast.work_queue import JobCancelledError, WorkQueue
+
+
+@pytest.mark.asyncio
+async def test_map_unordered_bounds_work_in_flight():
+    running, max_running, num_consumed = 0, 0, 0
+
+    async def _job(i: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        return i
+
+    def _items():
+        for i in range(200):
+            # Items are only pulled a bounded distance ahead of the results consumed
+            assert i - num_consumed <= 4 + 4
+            yield i
+
+    async with WorkQueue('test', num_workers=4) as work_queue:
+        results = []
+        async for result in work_queue.map_unordered(_job, _items()):
+            results.append(result)
+            num_consumed += 1
+        assert sorted(results) == list(range(200))
+        assert max_running == 4
+        assert work_queue.counts == {'queued': 0, 'running': 0, 'done': 200, 'failed': 0}
+
+
+@pytest.mark.asyncio
+async def test_map_unordered_raises_job_errors():
+    async def _job(i: int) -> int:
+        if i == 3:
+            raise ValueError(i)
+        return i
+
+    async with WorkQueue('test', num_workers=2) as work_queue:
+        with pytest.raises(ValueError):
+            async for _ in work_queue.map_unordered(_job, range(10)):
+                pass
+        assert work_queue.counts['failed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_map_unordered_with_no_items():
+    async def _job(i: int) -> int:
+        return i
+
+    async with WorkQueue('test', num_workers=2) as work_queue:
+        assert [result async for result in work_queue.map_unordered(_job, [])] == []
+
+
+@pytest.mark.asyncio
+async def test_map_unordered_with_async_items():
+    async def _job(i: int) -> int:
+        return 2 * i
+
+    async def _items():
+        for i in range(10):
+            # Items still being produced while earlier jobs run
+            await asyncio.sleep(0)
+            yield i
+
+    async with WorkQueue('test', num_workers=2) as work_queue:
+        assert sorted([result async for result in work_queue.map_unordered(_job, _items())]) == list(range(0, 20, 2))
+
+
+@pytest.mark.asyncio
+async def test_job_cancelled_from_inside_fails_without_stopping_worker():
+    async def _cancelled_job():
+        raise asyncio.CancelledError()
+
+    async def _job():
+        return 1
+
+    async with WorkQueue('test', num_workers=1) as work_queue:
+        with pytest.raises(JobCancelledError):
+            await (await work_queue.submit(_cancelled_job))
+        assert await (await work_queue.submit(_job)) == 1
+        assert work_queue.counts == {'queued': 0, 'running': 0, 'done': 1, 'failed': 1}
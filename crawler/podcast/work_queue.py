@@ -0,0 +1,161 @@
+import asyncio
+import collections
+import collections.abc
+import functools
+import logging
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar, Union
+
+A = TypeVar('A')
+T = TypeVar('T')
+
+_END_OF_ITEMS = object()
+
+
+class JobCancelledError(Exception):
+    # A job cancelled from inside, raised as a regular exception so that it fails the job rather than its caller
+    pass
+
+
+class WorkQueue:
+    """
+    Runs jobs on a fixed number of worker tasks pulling from a bounded queue, so the number of pending coroutines
+    and futures stays constant however many jobs there are. submit() waits while the queue is full.
+    Jobs must not wait on jobs of the same queue, or workers can deadlock; use separate queues per level instead.
+
+    >>> async def _double_all() -> List[int]:
+    ...     async def _double(i: int) -> int:
+    ...         return 2 * i
+    ...     async with WorkQueue('double', num_workers=2) as work_queue:
+    ...         return sorted([result async for result in work_queue.map_unordered(_double, range(5))])
+    >>> asyncio.run(_double_all())
+    [0, 2, 4, 6, 8]
+    """
+
+    def __init__(self, name: str, num_workers: int, max_queued: Optional[int] = None):
+        self._name = name
+        self._num_workers = num_workers
+        self._max_queued = max_queued or num_workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._counts = collections.Counter(queued=0, running=0, done=0, failed=0)
+
+    async def __aenter__(self) -> 'WorkQueue':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self._max_queued)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self._num_workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logging.info(f'{self._name} work queue: {self.counts}')
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        return dict(self._counts)
+
+    async def submit(self, job: Callable[[], Awaitable[T]]) -> 'asyncio.Future[T]':
+        future = asyncio.get_running_loop().create_future()
+        self._counts['queued'] += 1
+        try:
+            await self._queue.put((job, future))
+        except BaseException:
+            self._counts['queued'] -= 1
+            raise
+        return future
+
+    async def map_unordered(self,
+                            job: Callable[[A], Awaitable[T]],
+                            items: Union[Iterable[A], AsyncIterable[A]]) -> AsyncIterator[T]:
+        # Yields results as jobs finish. At most num_workers + max_queued items are submitted ahead of the results
+        # consumed, so items can be a lazy iterable of any length, or an async iterable still producing them.
+        in_flight = asyncio.Semaphore(self._num_workers + self._max_queued)
+        finished = asyncio.Queue()
+
+        async def _submit_all():
+            try:
+                async for item in _as_async_iterable(items):
+                    await in_flight.acquire()
+                    future = await self.submit(functools.partial(job, item))
+                    future.add_done_callback(finished.put_nowait)
+                    pending.add(future)
+            finally:
+                finished.put_nowait(_END_OF_ITEMS)
+
+        pending = set()
+        submitter = asyncio.create_task(_submit_all())
+        try:
+            while True:
+                future = await finished.get()
+                if future is _END_OF_ITEMS:
+                    submitter.result()  # Raises errors of iterating items
+                    if not pending:
+                        return
+                    continue
+                pending.discard(future)
+                in_flight.release()
+                yield future.result()
+                if submitter.done() and not pending and finished.empty():
+                    return
+        finally:
+            submitter.cancel()
+            for future in pending:
+                future.cancel()
+
+    async def _work(self):
+        while True:
+            job, future = await self._queue.get()
+            self._counts['queued'] -= 1
+            if future.cancelled():
+                continue
+            self._counts['running'] += 1
+            # The job runs as its own task, so that a job cancelled from inside, e.g. by a cancelled inner request,
+            # fails like any other job, with JobCancelledError, rather than looking like the worker being cancelled
+            job_task = asyncio.ensure_future(job())
+            try:
+                await asyncio.wait([job_task])
+            except asyncio.CancelledError:
+                job_task.cancel()
+                future.cancel()
+                raise
+            finally:
+                self._counts['running'] -= 1
+            try:
+                result = job_task.result()
+            except asyncio.CancelledError as e:
+                error = JobCancelledError(f'{self._name} job was cancelled')
+                error.__cause__ = e
+                self._fail(future, error)
+            except Exception as e:
+                self._fail(future, e)
+            else:
+                self._counts['done'] += 1
+                if not future.done():
+                    future.set_result(result)
+
+    def _fail(self, future: asyncio.Future, error: Exception):
+        self._counts['failed'] += 1
+        if not future.done():
+            future.set_exception(error)
+
+
+async def _as_async_iterable(items: Union[Iterable[A], AsyncIterable[A]]) -> AsyncIterator[A]:
+    if isinstance(items, collections.abc.AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -3,6 +3,7 @@ import logging
 import pandas as pd
 
 from model.backup_table import BackupTable
+from util.paths import atomic_path
 
 
 class BackupTableWriter:
@@ -13,5 +14,6 @@ class BackupTableWriter:
         frame = pd.DataFrame.from_records([row._asdict() for row in self._backup_table]) \
             .sort_values(by=["programme", "dt"]) \
             .rename(columns={'dt': 'date'})
-        frame.to_csv(path, index=False)
+        with atomic_path(path) as tmp_path:
+            frame.to_csv(tmp_path, index=False)
         logging.info(f"Wrote CSV file to: {path}")
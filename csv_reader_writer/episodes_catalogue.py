@@ -0,0 +1,168 @@
+import operator
+import os
+from datetime import date, datetime
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from csv_reader_writer.episodes_csv_writer import EpisodesCsvWriter
+from csv_reader_writer.episodes_parquet_reader import EpisodesParquetReader
+from csv_reader_writer.episodes_parquet_schema import Filters
+from csv_reader_writer.episodes_parquet_writer import EpisodesParquetWriter
+from csv_reader_writer.episodes_sqlite_store import EpisodesSqliteStore
+from model.podcast.episode import Episode
+from model.podcast.episode_table import EpisodeTable
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+SQLITE_SUFFIXES = ('.sqlite', '.db')
+
+_OPS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda value, values: value in values,
+    'not in': lambda value, values: value not in values,
+    'has any': lambda value, values: any(v in values for v in value),
+}
+
+# Filters the parquet reader can't push down
+_RESIDUAL_OPS = ('has any',)
+
+
+def is_parquet(path: str) -> bool:
+    return path.endswith(PARQUET_SUFFIXES)
+
+
+def is_sqlite(path: str) -> bool:
+    return path.endswith(SQLITE_SUFFIXES)
+
+
+def read_episodes(path: str, columns: Optional[List[str]] = None,
+                  filters: Optional[Filters] = None) -> List[Episode]:
+    # Reads a csv or, by its suffix, parquet or sqlite catalogue. Csv catalogues are read whole and then filtered and
+    # projected, so that all give the same episodes.
+    if is_sqlite(path):
+        with EpisodesSqliteStore(path, read_only=True) as store:
+            return store.query(columns=columns, filters=filters)
+    if is_parquet(path):
+        read_columns, pushed_down_filters, filters = _split_parquet_filters(columns, filters)
+        episodes = EpisodesParquetReader().read_to_episodes(path, columns=read_columns, filters=pushed_down_filters)
+    else:
+        episodes = EpisodesCsvReader().read_to_episodes(path)
+    return list(_filter_and_project(episodes, columns, filters))
+
+
+def iter_episodes(path: str, columns: Optional[List[str]] = None, filters: Optional[Filters] = None,
+                  chunk_size: int = 10_000) -> Iterator[Episode]:
+    """
+    Yields the same episodes as read_episodes, reading chunk_size episodes at a time, so that memory doesn't grow
+    with the size of the catalogue.
+    """
+    if is_sqlite(path):
+        with EpisodesSqliteStore(path, read_only=True) as store:
+            yield from store.iter_query(columns=columns, filters=filters, chunk_size=chunk_size)
+    elif is_parquet(path):
+        read_columns, pushed_down_filters, filters = _split_parquet_filters(columns, filters)
+        yield from _filter_and_project(EpisodesParquetReader().iter_episodes(path, columns=read_columns,
+                                                                             filters=pushed_down_filters,
+                                                                             chunk_size=chunk_size),
+                                       columns, filters)
+    else:
+        yield from EpisodesCsvReader().iter_episodes(path, columns=columns, filters=filters, chunk_size=chunk_size)
+
+
+def read_episode_table(path: str, columns: Optional[List[str]] = None,
+                       filters: Optional[Filters] = None) -> EpisodeTable:
+    # Whole csv catalogues go into the table column by column, without holding every Episode at once
+    if not is_sqlite(path) and not is_parquet(path) and columns is None and not filters:
+        return EpisodesCsvReader().read_to_episode_table(path)
+    return EpisodeTable(read_episodes(path, columns=columns, filters=filters))
+
+
+def read_episodes_by_pid_eid(path: str, pid_eids: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], Episode]:
+    # Filtering on both pids and eids lets indexed catalogues only read the given episodes
+    pid_eids = set(pid_eids)
+    if not pid_eids:
+        return {}
+    filters = [('pid', 'in', sorted({pid for pid, _ in pid_eids})), ('eid', 'in', sorted({eid for _, eid in pid_eids}))]
+    return {(e.pid, e.eid): e for e in iter_episodes(path, filters=filters) if (e.pid, e.eid) in pid_eids}
+
+
+def write_episodes(episodes: Collection[Episode], path: str):
+    if is_sqlite(path):
+        with EpisodesSqliteStore(path) as store:
+            store.write(episodes)
+    elif is_parquet(path):
+        EpisodesParquetWriter(episodes).write_to_parquet(path)
+    else:
+        EpisodesCsvWriter(episodes).write_to_csv(path)
+
+
+def upsert_episodes(episodes: Collection[Episode], path: str):
+    # Adds the episodes to the catalogue, replacing those with the same (pid, eid)
+    if is_sqlite(path):
+        with EpisodesSqliteStore(path) as store:
+            store.upsert(episodes)
+    elif is_parquet(path):
+        # Parquet files can't be changed in place, so the whole catalogue is rewritten
+        episodes_by_pid_eid = {(e.pid, e.eid): e for e in read_episodes(path)} if os.path.exists(path) else {}
+        episodes_by_pid_eid.update(((e.pid, e.eid), e) for e in episodes)
+        write_episodes(list(episodes_by_pid_eid.values()), path)
+    else:
+        EpisodesCsvWriter(episodes).upsert_to_csv(path)
+
+
+def _split_parquet_filters(columns: Optional[List[str]],
+                           filters: Optional[Filters]) -> Tuple[Optional[List[str]], Filters, Filters]:
+    # Columns to read, filters pushed down to the parquet reader and filters applied after reading
+    pushed_down_filters = [f for f in filters or [] if f[1] not in _RESIDUAL_OPS]
+    filters = [f for f in filters or [] if f[1] in _RESIDUAL_OPS]
+    read_columns = list(dict.fromkeys(columns + [column for column, _, _ in filters])) if columns is not None \
+        else None
+    return read_columns, pushed_down_filters, filters
+
+
+def _filter_and_project(episodes: Iterable[Episode], columns: Optional[List[str]],
+                        filters: Optional[Filters]) -> Iterator[Episode]:
+    if filters:
+        episodes = (episode for episode in episodes if _matches(episode, filters))
+    if columns is not None:
+        kept_fields = {'pid', 'eid', *columns}
+        defaults = {field: default for field, default in Episode._field_defaults.items() if field not in kept_fields}
+        episodes = (episode._replace(**defaults) for episode in episodes)
+    return iter(episodes)
+
+
+def _matches(episode: Episode, filters: Filters) -> bool:
+    """
+    >>> episode = Episode(pid=1, eid=2, episode_date=datetime(2021, 1, 1))
+    >>> _matches(episode, [('pid', 'in', [1, 3]), ('episode_date', '>=', date(2020, 12, 31))])
+    True
+    >>> _matches(episode, [('eid', '!=', 2)])
+    False
+    >>> _matches(episode._replace(cids=[3, 4]), [('cids', 'has any', [1, 4])])
+    True
+    """
+    for column, op, value in filters:
+        episode_value = getattr(episode, column)
+        if episode_value is None or episode_value != episode_value:  # None, nan or NaT never match, as in parquet
+            return False
+        if column == 'episode_date':
+            episode_value = _to_date(episode_value)
+            value = [_to_date(v) for v in value] if op in ('in', 'not in') else _to_date(value)
+        if not _OPS[op](episode_value, value):
+            return False
+    return True
+
+
+def _to_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
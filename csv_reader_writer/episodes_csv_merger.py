@@ -0,0 +1,120 @@
+import concurrent.futures
+import csv
+import heapq
+import logging
+import math
+import os
+import tempfile
+from typing import Iterator, List, Tuple
+
+from csv_reader_writer.episodes_csv_segments import atomic_catalogue_path, segment_paths_for
+from model.podcast.episode import Episode
+
+
+class DuplicateEpisodeError(ValueError):
+    pass
+
+
+class EpisodesCsvMerger:
+    """
+    Merges episode csvs that are each sorted by (pid, eid), e.g. written by EpisodesCsvWriter, into one sorted csv.
+    Rows are streamed, so memory use doesn't depend on the size of the csvs.
+    At most max_open_files csvs are merged at once: more csvs are first merged in groups into temporary csvs next to
+    the output, using up to parallelism processes.
+    Duplicate (pid, eid) rows raise DuplicateEpisodeError, or with drop_duplicates only the first one is kept.
+    The merged csv replaces path once complete.
+    """
+
+    def __init__(self, paths: List[str], drop_duplicates: bool = False, max_open_files: int = 256,
+                 parallelism: int = 1):
+        self._paths = paths
+        self._drop_duplicates = drop_duplicates
+        self._max_open_files = max(max_open_files, 2)
+        self._parallelism = max(parallelism, 1)
+        self.num_dropped = 0
+
+    def merge_to_csv(self, path: str) -> int:
+        # Returns the number of episodes written
+        paths = self._paths
+        num_dropped = 0
+        with tempfile.TemporaryDirectory(prefix='.merge-', dir=os.path.dirname(path) or None) as tmp_dir:
+            num_passes = 0
+            while len(paths) > self._max_open_files or num_passes == 0 and self._parallelism > 1 and len(paths) > 2:
+                group_size = self._max_open_files if num_passes else self._first_group_size(paths)
+                paths, num_dropped_in_pass = self._merge_groups(paths, group_size,
+                                                                os.path.join(tmp_dir, str(num_passes)))
+                num_dropped += num_dropped_in_pass
+                num_passes += 1
+            with atomic_catalogue_path(path) as tmp_path:
+                num_episodes, num_dropped_in_pass = _merge_files(paths, tmp_path, self._drop_duplicates)
+            num_dropped += num_dropped_in_pass
+        self.num_dropped = num_dropped
+        if num_dropped:
+            logging.info(f'Dropped {num_dropped} rows with a duplicate (pid, eid)')
+        logging.info(f'Merged {len(self._paths)} CSV files with {num_episodes} episodes to: {path}')
+        return num_episodes
+
+    def _first_group_size(self, paths: List[str]) -> int:
+        # Enough groups to keep every process busy
+        return max(min(self._max_open_files, math.ceil(len(paths) / self._parallelism)), 2)
+
+    def _merge_groups(self, paths: List[str], group_size: int, tmp_dir: str) -> Tuple[List[str], int]:
+        os.makedirs(tmp_dir)
+        groups = [paths[i:i + group_size] for i in range(0, len(paths), group_size)]
+        group_paths = [os.path.join(tmp_dir, f'{index}.csv') for index in range(len(groups))]
+        if self._parallelism > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(self._parallelism, len(groups))) as executor:
+                results = list(executor.map(_merge_files, groups, group_paths,
+                                            [self._drop_duplicates] * len(groups)))
+        else:
+            results = [_merge_files(group, group_path, self._drop_duplicates)
+                       for group, group_path in zip(groups, group_paths)]
+        logging.debug(f'Merged {len(paths)} CSV files into {len(groups)} in: {tmp_dir}')
+        return group_paths, sum(num_dropped for _, num_dropped in results)
+
+
+def compact_segments(path: str, parallelism: int = 1) -> int:
+    """
+    Merges the segments upserted into the episodes csv at path into it, newer episodes replacing older ones with the
+    same (pid, eid). Returns the number of episodes written.
+    """
+    segment_paths = segment_paths_for(path)
+    # The merger keeps the first of rows with the same (pid, eid), so the newest segment goes first
+    paths = segment_paths[::-1] + ([path] if os.path.exists(path) else [])
+    num_episodes = EpisodesCsvMerger(paths, drop_duplicates=True, parallelism=parallelism).merge_to_csv(path)
+    logging.info(f'Compacted {len(segment_paths)} segments into CSV file: {path}')
+    return num_episodes
+
+
+def _merge_files(paths: List[str], path: str, drop_duplicates: bool) -> Tuple[int, int]:
+    # Returns the number of episodes written and of duplicate rows dropped
+    num_episodes, num_dropped = 0, 0
+    last_key = None
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(Episode._fields)
+        for key, row in heapq.merge(*map(_read_keyed_rows, paths), key=lambda keyed_row: keyed_row[0]):
+            if key == last_key:
+                if not drop_duplicates:
+                    raise DuplicateEpisodeError(f'(pid, eid) = {key} is in more than one row')
+                num_dropped += 1
+                continue
+            writer.writerow(row)
+            last_key = key
+            num_episodes += 1
+    return num_episodes, num_dropped
+
+
+def _read_keyed_rows(path: str) -> Iterator[Tuple[Tuple[int, int], List[str]]]:
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header != list(Episode._fields):
+            raise ValueError(f'Not an episodes CSV file: {path}')
+        last_key = None
+        for row in reader:
+            key = (int(row[0]), int(row[1]))
+            if last_key and key < last_key:
+                raise ValueError(f'CSV file is not sorted by (pid, eid) at {key}: {path}')
+            yield key, row
+            last_key = key
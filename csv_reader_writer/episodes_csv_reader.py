@@ -1,35 +1,137 @@
-import ast
+import heapq
 import logging
-import math
-from typing import List
+import operator
+import os
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
 
-import numpy as np
 import pandas as pd
 
+from csv_reader_writer.episodes_csv_segments import segment_paths_for
+from csv_reader_writer.episodes_parquet_schema import Filters
 from model.podcast.episode import Episode
-from util.dates import ymd_to_date
+from model.podcast.episode_table import EpisodeTable
+from util.frames import frame_to_columns, literal_column_to_lists, ymd_column_to_dates
+
+_DTYPES = {'episode_date': str, 'cids': str, 'category_names': str}
+
+_LIST_COLUMNS = ('cids', 'category_names')
+
+_COMPARISONS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
 
 
 class EpisodesCsvReader:
+    """
+    Reads episode csvs, together with any segments upserted into them by EpisodesCsvWriter.upsert_to_csv, in which
+    the newest episode with a (pid, eid) replaces the others.
+    """
+
     def read_to_episodes(self, path: str) -> List[Episode]:
-        def _nan_to_none(v: any) -> any:
-            if isinstance(v, float) and math.isnan(v):
-                return None
-            return v
-
-        def _parse_list(s: str) -> List[str]:
-            return ast.literal_eval(s) if s else []
-
-        episodes = []
-        frame = pd.read_csv(path,
-                            parse_dates=['episode_date'],
-                            date_parser=np.vectorize(ymd_to_date),
-                            converters={
-                                'cids': _parse_list,
-                                'category_names': _parse_list
-                            })
+        if segment_paths_for(path):
+            return list(self.iter_episodes(path))
+        return list(map(Episode._make, zip(*self._read_columns(path))))
+
+    def read_to_episode_table(self, path: str) -> EpisodeTable:
+        if segment_paths_for(path):
+            return EpisodeTable(self.iter_episodes(path))
+        # Rows go into the table without becoming Episodes first
+        return EpisodeTable(zip(*self._read_columns(path)))
+
+    def iter_episodes(self, path: str, columns: Optional[List[str]] = None, filters: Optional[Filters] = None,
+                      chunk_size: int = 10_000) -> Iterator[Episode]:
+        """
+        Yields the episodes matching all filters, reading chunk_size rows at a time, so that memory doesn't grow with
+        the size of the csv. Only the given columns are read, with the other fields of Episode left at their defaults;
+        pid and eid are always read. Rows are filtered before they become Episodes.
+        """
+        segment_paths = segment_paths_for(path)
+        if not segment_paths:
+            yield from self._iter_file(path, columns, filters, chunk_size)
+            return
+        # Segments hold the upserted episodes, which are few, so they are read whole
+        newest_segment_by_key: Dict[Tuple[int, int], int] = {}
+        for index, segment_path in enumerate(segment_paths):
+            keys = pd.read_csv(segment_path, usecols=['pid', 'eid'])
+            newest_segment_by_key.update(dict.fromkeys(zip(keys['pid'].tolist(), keys['eid'].tolist()), index))
+        upserted_episodes = sorted((episode
+                                    for index, segment_path in enumerate(segment_paths)
+                                    for episode in self._iter_file(segment_path, columns, filters, chunk_size)
+                                    if newest_segment_by_key[(episode.pid, episode.eid)] == index),
+                                   key=_pid_eid)
+        episodes = (episode for episode in self._iter_file(path, columns, filters, chunk_size)
+                    if (episode.pid, episode.eid) not in newest_segment_by_key) if os.path.exists(path) else iter(())
+        yield from heapq.merge(episodes, upserted_episodes, key=_pid_eid)
+
+    def _iter_file(self, path: str, columns: Optional[List[str]], filters: Optional[Filters],
+                   chunk_size: int) -> Iterator[Episode]:
+        filters = filters or []
+        usecols = None
+        if columns is not None:
+            columns = list(dict.fromkeys(['pid', 'eid', *columns]))
+            usecols = list(dict.fromkeys(columns + [column for column, _, _ in filters]))
+        num_episodes = 0
+        with pd.read_csv(path, dtype=_DTYPES, usecols=usecols, chunksize=chunk_size) as chunks:
+            for frame in chunks:
+                frame = _parse_dates(frame)
+                if filters:
+                    frame = frame[_filter_mask(frame, filters)]
+                if columns is not None:
+                    frame = frame[columns]
+                num_episodes += len(frame)
+                yield from map(Episode._make, zip(*_to_columns(frame)))
+        logging.info(f"Read {num_episodes} matching episodes from CSV file: {path}")
+
+    def _read_columns(self, path: str) -> List[list]:
+        # Columns are converted at once rather than row by row, which is much faster on large catalogues
+        frame = pd.read_csv(path, dtype=_DTYPES)
         logging.info(f"Read CSV file from: {path}")
-        for i, row in frame.iterrows():
-            episode = Episode(**{k: _nan_to_none(v) for k, v in row.to_dict().items()})
-            episodes.append(episode)
-        return episodes
+        return _to_columns(_parse_dates(frame))
+
+
+def _pid_eid(episode: Episode) -> Tuple[int, int]:
+    return episode.pid, episode.eid
+
+
+def _parse_dates(frame: pd.DataFrame) -> pd.DataFrame:
+    if 'episode_date' in frame.columns:
+        frame['episode_date'] = ymd_column_to_dates(frame['episode_date'])
+    return frame
+
+
+def _to_columns(frame: pd.DataFrame) -> List[list]:
+    converted_columns = {column: literal_column_to_lists(frame[column])
+                         for column in _LIST_COLUMNS if column in frame.columns}
+    return frame_to_columns(frame, Episode, converted_columns)
+
+
+def _filter_mask(frame: pd.DataFrame, filters: Filters) -> pd.Series:
+    # Empty cells never match, as in parquet
+    mask = pd.Series(True, index=frame.index)
+    for column, op, value in filters:
+        values = frame[column]
+        if op == 'has any' and column in _LIST_COLUMNS:
+            wanted = set(value)
+            mask &= pd.Series([any(v in wanted for v in row_values) for row_values in literal_column_to_lists(values)],
+                              index=frame.index, dtype=bool)
+            continue
+        if op in ('in', 'not in'):
+            matches = values.isin([_to_frame_value(v) for v in value])
+            matches = matches if op == 'in' else ~matches
+        elif op in _COMPARISONS:
+            matches = _COMPARISONS[op](values, _to_frame_value(value))
+        else:
+            raise ValueError(f'Unsupported filter on {column}: {op}')
+        mask &= matches & values.notna()
+    return mask
+
+
+def _to_frame_value(value):
+    return pd.Timestamp(value) if isinstance(value, date) else value
@@ -0,0 +1,63 @@
+import contextlib
+import glob
+import os
+import shutil
+from typing import Iterator, List
+
+from util.paths import atomic_path
+
+
+def segments_dir_for(path: str) -> str:
+    return f'{path}.segments'
+
+
+def segment_paths_for(path: str) -> List[str]:
+    # Oldest first. Segments upserted into a csv that has since been replaced are stale and ignored
+    if not _segments_are_for(path):
+        return []
+    return sorted(glob.glob(os.path.join(segments_dir_for(path), '*.csv')))
+
+
+def new_segment_path(path: str) -> str:
+    segments_dir = segments_dir_for(path)
+    if os.path.isdir(segments_dir) and not _segments_are_for(path):
+        shutil.rmtree(segments_dir)
+    segment_paths = segment_paths_for(path)
+    index = int(os.path.basename(segment_paths[-1]).split('.')[0]) + 1 if segment_paths else 0
+    os.makedirs(segments_dir, exist_ok=True)
+    if not os.path.exists(_base_path_for(path)):
+        with atomic_path(_base_path_for(path)) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(_identity_of(path))
+    return os.path.join(segments_dir, f'{index:06d}.csv')
+
+
+@contextlib.contextmanager
+def atomic_catalogue_path(path: str) -> Iterator[str]:
+    # Writes a whole episodes csv, which supersedes the segments upserted into the previous one. The segments are
+    # removed after the csv is replaced, and are already stale if that doesn't happen
+    with atomic_path(path) as tmp_path:
+        yield tmp_path
+    if os.path.isdir(segments_dir_for(path)):
+        shutil.rmtree(segments_dir_for(path))
+
+
+def _base_path_for(path: str) -> str:
+    # Identifies the csv that the segments were upserted into
+    return os.path.join(segments_dir_for(path), 'base')
+
+
+def _identity_of(path: str) -> str:
+    # Replacing the csv changes its mtime, while upserting segments leaves it untouched
+    if not os.path.exists(path):
+        return 'missing'
+    stat = os.stat(path)
+    return f'{stat.st_mtime_ns} {stat.st_size}'
+
+
+def _segments_are_for(path: str) -> bool:
+    try:
+        with open(_base_path_for(path), encoding='utf-8') as f:
+            return f.read() == _identity_of(path)
+    except FileNotFoundError:
+        # Segments written before they recorded their csv
+        return True
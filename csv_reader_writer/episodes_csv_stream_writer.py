@@ -0,0 +1,172 @@
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+from datetime import date
+from typing import Collection, Iterable, Iterator, List, Optional
+
+from csv_reader_writer.episodes_csv_merger import EpisodesCsvMerger
+from csv_reader_writer.episodes_csv_segments import atomic_catalogue_path
+from model.podcast.episode import Episode
+from util.dates import date_to_ymd
+
+
+class EpisodesCsvStreamWriter:
+    """
+    Writes episodes to a csv file as they are crawled, in the same format as EpisodesCsvWriter.
+    A background task buffers up to max_buffered_episodes and spills them as sorted runs to a temporary directory
+    next to path; close() merges the runs, and any csvs added with add_sorted_csv(), into path sorted by (pid, eid),
+    using up to merge_parallelism processes. Of rows with the same (pid, eid), only the first is kept.
+    write() waits while max_pending_batches batches are queued, so memory stays bounded however large the site.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_buffered_episodes: int = 50_000,
+                 max_pending_batches: int = 16,
+                 merge_parallelism: int = 1):
+        self._path = path
+        self._max_buffered_episodes = max_buffered_episodes
+        self._max_pending_batches = max_pending_batches
+        self._merge_parallelism = merge_parallelism
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self._run_dir: Optional[tempfile.TemporaryDirectory] = None
+        self._run_paths: List[str] = []
+        self._sorted_csv_paths: List[str] = []
+        self._buffer: List[Episode] = []
+        self.num_episodes = 0
+
+    async def __aenter__(self) -> 'EpisodesCsvStreamWriter':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            await self.abort()
+        else:
+            await self.close()
+
+    async def open(self):
+        self._queue = asyncio.Queue(maxsize=self._max_pending_batches)
+        self._run_dir = tempfile.TemporaryDirectory(prefix='.episodes-', dir=os.path.dirname(self._path))
+        self._writer_task = asyncio.create_task(self._write_batches())
+
+    async def write(self, episodes: Collection[Episode]):
+        self._raise_for_writer_error()
+        await self._queue.put(list(episodes))
+
+    def add_sorted_csv(self, path: str):
+        # The csv, sorted by (pid, eid) as written by EpisodesCsvWriter, is merged at close() without being parsed
+        self._sorted_csv_paths.append(path)
+
+    @property
+    def pending_batches(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self):
+        await self._queue.put(None)
+        await self._writer_task
+        try:
+            self._raise_for_writer_error()
+            if self._run_paths or self._sorted_csv_paths:
+                await self._spill()
+                merger = EpisodesCsvMerger(self._run_paths + self._sorted_csv_paths, drop_duplicates=True,
+                                           parallelism=self._merge_parallelism)
+                self.num_episodes = await asyncio.to_thread(merger.merge_to_csv, self._path)
+                if merger.num_dropped:
+                    logging.warning(f'Dropped {merger.num_dropped} rows with a duplicate (pid, eid)')
+            else:
+                self._buffer.sort(key=_sort_key)
+                with atomic_catalogue_path(self._path) as tmp_path:
+                    self.num_episodes = await asyncio.to_thread(_write_csv, tmp_path,
+                                                                map(_to_row, _drop_duplicates(self._buffer)))
+            logging.info(f'Wrote CSV file with {self.num_episodes} episodes to: {self._path}')
+        finally:
+            self._cleanup()
+
+    async def abort(self):
+        self._writer_task.cancel()
+        await asyncio.gather(self._writer_task, return_exceptions=True)
+        self._cleanup()
+
+    async def _write_batches(self):
+        # Keeps draining the queue after an error, so that writers blocked on a full queue are released
+        while True:
+            batch = await self._queue.get()
+            if batch is None:
+                return
+            if self._error:
+                continue
+            try:
+                self._buffer.extend(batch)
+                self.num_episodes += len(batch)
+                if len(self._buffer) >= self._max_buffered_episodes:
+                    await self._spill()
+            except Exception as e:
+                logging.error(f'Failed to write episodes to: {self._path}', exc_info=True)
+                self._error = e
+
+    async def _spill(self):
+        run, self._buffer = sorted(self._buffer, key=_sort_key), []
+        run_path = os.path.join(self._run_dir.name, f'{len(self._run_paths)}.csv')
+        await asyncio.to_thread(_write_csv, run_path, map(_to_row, run))
+        self._run_paths.append(run_path)
+        logging.debug(f'Spilled {len(run)} episodes to: {run_path}')
+
+    def _raise_for_writer_error(self):
+        if self._error:
+            raise self._error
+
+    def _cleanup(self):
+        self._buffer = []
+        self._run_paths = []
+        self._sorted_csv_paths = []
+        if self._run_dir:
+            self._run_dir.cleanup()
+            self._run_dir = None
+
+
+def _sort_key(episode: Episode):
+    return episode.pid, episode.eid
+
+
+def _to_csv_value(value) -> str:
+    # Formats values like pandas.DataFrame.to_csv does for the columns of Episode
+    if value is None or value != value:  # None, nan or NaT
+        return ''
+    if isinstance(value, date):
+        return date_to_ymd(value)
+    return str(value)
+
+
+def _to_row(episode: Episode) -> List[str]:
+    return [_to_csv_value(value) for value in episode]
+
+
+def _drop_duplicates(episodes: List[Episode]) -> Iterator[Episode]:
+    # Keeps the first of sorted episodes with the same (pid, eid), like EpisodesCsvMerger(drop_duplicates=True)
+    last_key = None
+    num_dropped = 0
+    for episode in episodes:
+        if _sort_key(episode) == last_key:
+            num_dropped += 1
+            continue
+        last_key = _sort_key(episode)
+        yield episode
+    if num_dropped:
+        logging.warning(f'Dropped {num_dropped} rows with a duplicate (pid, eid)')
+
+
+def _write_csv(path: str, rows: Iterable[List[str]]) -> int:
+    # Returns the number of rows written
+    num_rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(Episode._fields)
+        for row in rows:
+            writer.writerow(row)
+            num_rows += 1
+    return num_rows
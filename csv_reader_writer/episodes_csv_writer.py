@@ -3,6 +3,8 @@ from typing import Collection
 
 import pandas as pd
 
+from csv_reader_writer.episodes_csv_merger import compact_segments
+from csv_reader_writer.episodes_csv_segments import atomic_catalogue_path, new_segment_path, segment_paths_for
 from model.podcast.episode import Episode
 
 
@@ -11,7 +13,26 @@ class EpisodesCsvWriter:
         self._episodes = episodes
 
     def write_to_csv(self, path: str):
-        frame = pd.DataFrame.from_records([e._asdict() for e in self._episodes]) \
+        # Durations stay integers when some are missing, as EpisodesCsvStreamWriter writes them
+        frame = pd.DataFrame.from_records([e._asdict() for e in self._episodes], columns=Episode._fields) \
+            .astype({'duration_seconds': 'Int64'}) \
             .sort_values(by=["pid", "eid"])
-        frame.to_csv(path, index=False)
+        with atomic_catalogue_path(path) as tmp_path:
+            frame.to_csv(tmp_path, index=False)
         logging.info(f"Wrote CSV file to: {path}")
+
+    def upsert_to_csv(self, path: str, max_segments: int = 16):
+        """
+        Writes the episodes as a segment of the csv at path, in which they replace the episodes with the same
+        (pid, eid) when read with EpisodesCsvReader, so that the cost depends on the episodes written rather than on
+        the csv. The csv isn't read to compare them, so callers should pass the episodes they changed; unchanged ones
+        only take space until segments are compacted into the csv, which happens once there are more than
+        max_segments.
+        """
+        if not self._episodes:
+            return
+        segment_path = new_segment_path(path)
+        self.write_to_csv(segment_path)
+        logging.info(f"Upserted {len(self._episodes)} episodes to CSV file: {path}")
+        if len(segment_paths_for(path)) > max_segments:
+            compact_segments(path)
@@ -0,0 +1,68 @@
+import importlib
+import itertools
+import logging
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from csv_reader_writer.episodes_parquet_schema import Filters, import_pyarrow
+from model.podcast.episode import Episode
+
+
+class EpisodesParquetReader:
+    """
+    Reads episodes written by EpisodesParquetWriter.
+    Only the given columns are read, with the other fields of Episode left at their defaults; pid and eid are always
+    read. filters are pushed down to the parquet reader, which skips row groups whose statistics can't match.
+    """
+
+    def read_to_episodes(self, path: str, columns: Optional[List[str]] = None,
+                         filters: Optional[Filters] = None) -> List[Episode]:
+        _, pq = import_pyarrow()
+        table = pq.read_table(path, columns=_with_ids(columns),
+                              filters=_to_parquet_filters(filters) if filters else None)
+        episodes = _to_episodes(table)
+        logging.info(f"Read {len(episodes)} episodes from parquet file: {path}")
+        return episodes
+
+    def iter_episodes(self, path: str, columns: Optional[List[str]] = None, filters: Optional[Filters] = None,
+                      chunk_size: int = 10_000) -> Iterator[Episode]:
+        # Reads batches of at most chunk_size episodes, still skipping the row groups that can't match
+        pa, pq = import_pyarrow()
+        dataset = importlib.import_module('pyarrow.dataset').dataset(path, format='parquet')
+        expression = pq.filters_to_expression(_to_parquet_filters(filters)) if filters else None
+        num_episodes = 0
+        for batch in dataset.to_batches(columns=_with_ids(columns), filter=expression, batch_size=chunk_size):
+            episodes = _to_episodes(pa.Table.from_batches([batch]))
+            num_episodes += len(episodes)
+            yield from episodes
+        logging.info(f"Read {num_episodes} matching episodes from parquet file: {path}")
+
+
+def _with_ids(columns: Optional[List[str]]) -> Optional[List[str]]:
+    if columns is None:
+        return None
+    return ['pid', 'eid'] + [column for column in dict.fromkeys(columns) if column not in ('pid', 'eid')]
+
+
+def _to_episodes(table) -> List[Episode]:
+    pa, _ = import_pyarrow()
+    if 'episode_date' in table.column_names:
+        # Dates are read as datetimes, like EpisodesCsvReader does
+        table = table.set_column(table.column_names.index('episode_date'), 'episode_date',
+                                 table.column('episode_date').cast(pa.timestamp('s')))
+    values_by_column = {name: table.column(name).to_pylist() for name in table.column_names}
+    return list(map(Episode._make, zip(*[
+        values_by_column[field] if field in values_by_column else itertools.repeat(Episode._field_defaults[field])
+        for field in Episode._fields
+    ])))
+
+
+def _to_parquet_filters(filters: Filters) -> Filters:
+    def _to_parquet_value(value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, (list, set, tuple)):
+            return [_to_parquet_value(v) for v in value]
+        return value
+
+    return [(column, op, _to_parquet_value(value)) for column, op, value in filters]
@@ -0,0 +1,35 @@
+import importlib
+from typing import Any, List, Tuple
+
+# (column, op, value) conditions that must all hold, as in pyarrow.parquet.read_table(filters=...).
+# op is one of: =, ==, !=, <, <=, >, >=, in, not in, or 'has any' for list columns sharing a value with value
+Filters = List[Tuple[str, str, Any]]
+
+
+def import_pyarrow():
+    # pyarrow is an optional dependency, only needed for parquet catalogues: poetry install -E parquet
+    try:
+        return importlib.import_module('pyarrow'), importlib.import_module('pyarrow.parquet')
+    except ImportError as e:
+        raise ImportError('Reading and writing parquet catalogues needs pyarrow: poetry install -E parquet') from e
+
+
+def episodes_schema():
+    pa, _ = import_pyarrow()
+    return pa.schema([
+        ('pid', pa.int64()),
+        ('eid', pa.int64()),
+        ('programme_title', pa.string()),
+        ('episode_title', pa.string()),
+        ('episode_date', pa.date32()),
+        ('duration_seconds', pa.int64()),
+        ('og_title', pa.string()),
+        ('og_description', pa.string()),
+        ('cids', pa.list_(pa.int64())),
+        ('category_names', pa.list_(pa.string())),
+        ('file_url', pa.string()),
+        ('m3u8_url', pa.string()),
+        ('rss_url', pa.string()),
+        ('language', pa.string()),
+        ('format', pa.string()),
+    ])
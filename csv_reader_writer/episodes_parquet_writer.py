@@ -0,0 +1,42 @@
+import logging
+from datetime import datetime
+from typing import Collection
+
+from csv_reader_writer.episodes_parquet_schema import episodes_schema, import_pyarrow
+from model.podcast.episode import Episode
+from util.paths import atomic_path
+
+
+class EpisodesParquetWriter:
+    """
+    Writes episodes sorted by (pid, eid) to a parquet file with typed date and list columns.
+    Row groups of row_group_size episodes keep min/max statistics, so readers filtering on pid, eid or episode_date
+    skip the row groups that can't match.
+    """
+
+    def __init__(self, episodes: Collection[Episode], row_group_size: int = 16 * 1024):
+        self._episodes = episodes
+        self._row_group_size = row_group_size
+
+    def write_to_parquet(self, path: str):
+        pa, pq = import_pyarrow()
+        schema = episodes_schema()
+        episodes = sorted(self._episodes, key=lambda e: (e.pid, e.eid))
+        columns = [[_to_parquet_value(value) for value in column] for column in zip(*episodes)] if episodes \
+            else [[] for _ in Episode._fields]
+        table = pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                                     schema=schema)
+        with atomic_path(path) as tmp_path:
+            pq.write_table(table, tmp_path, row_group_size=self._row_group_size)
+        logging.info(f"Wrote parquet file with {len(episodes)} episodes to: {path}")
+
+
+def _to_parquet_value(value):
+    if value is None or value != value:  # None, nan or NaT
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, float) and value.is_integer():
+        # Integer columns read from csv with missing values are floats
+        return int(value)
+    return value
@@ -0,0 +1,170 @@
+import logging
+import os
+import sqlite3
+import urllib.request
+from datetime import date
+from typing import Collection, Iterator, List, Optional, Tuple
+
+import ujson
+
+from csv_reader_writer.episodes_parquet_schema import Filters
+from model.podcast.episode import Episode
+from util.dates import date_to_ymd, ymd_to_date
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS episodes (
+    pid INTEGER NOT NULL,
+    eid INTEGER NOT NULL,
+    programme_title TEXT,
+    episode_title TEXT,
+    episode_date TEXT,
+    duration_seconds INTEGER,
+    og_title TEXT,
+    og_description TEXT,
+    cids TEXT,
+    category_names TEXT,
+    file_url TEXT,
+    m3u8_url TEXT,
+    rss_url TEXT,
+    language TEXT,
+    format TEXT,
+    PRIMARY KEY (pid, eid)
+);
+CREATE INDEX IF NOT EXISTS episodes_eid ON episodes (eid);
+CREATE INDEX IF NOT EXISTS episodes_episode_date ON episodes (episode_date);
+CREATE INDEX IF NOT EXISTS episodes_language ON episodes (language);
+CREATE INDEX IF NOT EXISTS episodes_format ON episodes (format);
+'''
+
+_LIST_FIELDS = ('cids', 'category_names')
+
+_COMPARISONS = {'=': '=', '==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+
+class EpisodesSqliteStore:
+    """
+    Episode catalogue in a sqlite database, indexed on pid, eid, episode_date, language and format, so queries
+    filtering on them only read the matching episodes.
+    Dates are stored as ymd strings and category lists as json arrays.
+    With read_only, the database must exist and is only queried, rather than created if missing.
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self._path = path
+        self._read_only = read_only
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> 'EpisodesSqliteStore':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        if self._read_only:
+            if not os.path.isfile(self._path):
+                raise FileNotFoundError(f'No such sqlite file: {self._path}')
+            self._connection = sqlite3.connect(f'file:{urllib.request.pathname2url(self._path)}?mode=ro', uri=True)
+        else:
+            self._connection = sqlite3.connect(self._path)
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+    def write(self, episodes: Collection[Episode]):
+        # Replaces all episodes in one transaction
+        with self._connection:
+            self._connection.execute('DELETE FROM episodes')
+            self._insert(episodes)
+        logging.info(f"Wrote {len(episodes)} episodes to sqlite file: {self._path}")
+
+    def upsert(self, episodes: Collection[Episode]):
+        with self._connection:
+            self._insert(episodes)
+        logging.info(f"Upserted {len(episodes)} episodes to sqlite file: {self._path}")
+
+    def query(self, columns: Optional[List[str]] = None, filters: Optional[Filters] = None) -> List[Episode]:
+        """
+        Episodes matching all filters, ordered by (pid, eid). Only the given columns are read, with the other fields
+        of Episode left at their defaults; pid and eid are always read.
+        """
+        episodes = list(self.iter_query(columns=columns, filters=filters))
+        logging.info(f"Read {len(episodes)} episodes from sqlite file: {self._path}")
+        return episodes
+
+    def iter_query(self, columns: Optional[List[str]] = None, filters: Optional[Filters] = None,
+                   chunk_size: int = 10_000) -> Iterator[Episode]:
+        # Like query, but fetching chunk_size rows at a time
+        fields = [field for field in Episode._fields
+                  if columns is None or field in ('pid', 'eid') or field in columns]
+        where, params = _to_where_clause(filters or [])
+        cursor = self._connection.execute(f'SELECT {", ".join(fields)} FROM episodes{where} ORDER BY pid, eid', params)
+        defaults = {field: default for field, default in Episode._field_defaults.items() if field not in fields}
+        while rows := cursor.fetchmany(chunk_size):
+            for row in rows:
+                yield Episode(**defaults,
+                              **{field: _from_sqlite_value(field, value) for field, value in zip(fields, row)})
+
+    def _insert(self, episodes: Collection[Episode]):
+        placeholders = ', '.join('?' * len(Episode._fields))
+        self._connection.executemany(f'INSERT OR REPLACE INTO episodes VALUES ({placeholders})',
+                                     ([_to_sqlite_value(field, value) for field, value in zip(Episode._fields, episode)]
+                                      for episode in episodes))
+
+
+def _to_where_clause(filters: Filters) -> Tuple[str, list]:
+    """
+    >>> _to_where_clause([('pid', 'in', [1, 2]), ('episode_date', '>=', date(2021, 1, 1))])
+    (' WHERE pid IN (SELECT value FROM json_each(?)) AND episode_date >= ?', ['[1,2]', '2021-01-01'])
+    >>> _to_where_clause([('cids', 'has any', [3])])
+    (' WHERE EXISTS (SELECT 1 FROM json_each(cids) WHERE value IN (SELECT value FROM json_each(?)))', ['[3]'])
+    """
+    conditions, params = [], []
+    for column, op, value in filters:
+        if column not in Episode._fields:
+            raise ValueError(f'Unknown episode column: {column}')
+        if op in _COMPARISONS:
+            conditions.append(f'{column} {_COMPARISONS[op]} ?')
+            params.append(_to_sqlite_value(column, value))
+        elif op in ('in', 'not in'):
+            # One json parameter rather than one parameter per value, which sqlite limits
+            conditions.append(f'{column} {op.upper()} (SELECT value FROM json_each(?))')
+            params.append(ujson.dumps([_to_sqlite_value(column, v) for v in value], ensure_ascii=False))
+        elif op == 'has any' and column in _LIST_FIELDS:
+            conditions.append(f'EXISTS (SELECT 1 FROM json_each({column}) '
+                              f'WHERE value IN (SELECT value FROM json_each(?)))')
+            params.append(ujson.dumps(list(value), ensure_ascii=False))
+        else:
+            raise ValueError(f'Unsupported filter on {column}: {op}')
+    return (f' WHERE {" AND ".join(conditions)}' if conditions else ''), params
+
+
+def _to_sqlite_value(field: str, value):
+    if field in _LIST_FIELDS:
+        return ujson.dumps(list(value) if value is not None else [], ensure_ascii=False)
+    if value is None or value != value:  # None, nan or NaT
+        return None
+    if isinstance(value, date):
+        return date_to_ymd(value)
+    if isinstance(value, float) and value.is_integer():
+        # Integer columns read from csv with missing values are floats
+        return int(value)
+    return value
+
+
+def _from_sqlite_value(field: str, value):
+    if field in _LIST_FIELDS:
+        return ujson.loads(value) if value else []
+    if field == 'episode_date' and value:
+        return ymd_to_date(value)
+    return value
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -4,6 +4,7 @@ from typing import Collection
 import pandas as pd
 
 from model.youtube.record import Record
+from util.paths import atomic_path
 
 
 class RecordsCsvWriter:
@@ -15,5 +16,6 @@ class RecordsCsvWriter:
             .astype({'episode': 'Int64'}) \
             .sort_values(by=["programme", "episode", "dt", "title"]) \
             .rename(columns={'dt': 'date'})
-        frame.to_csv(path, index=False)
+        with atomic_path(path) as tmp_path:
+            frame.to_csv(tmp_path, index=False)
         logging.info(f"Wrote CSV file to: {path}")
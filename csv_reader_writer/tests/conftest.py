@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Callable, Iterable, List
+
+import pytest
+
+from model.podcast.episode import Episode
+
+
+def _make_episodes(pids: Iterable[int], episodes_per_pid: int = 2) -> List[Episode]:
+    # Episode i of a pid has eid pid * 1000 + i, is dated in month pid % 12 + 1, and alternates audio and video.
+    # Tests add the quotes, missing values and other edge cases they exercise.
+    return [Episode(pid=pid,
+                    eid=pid * 1000 + i,
+                    programme_title=f'Programme {pid}',
+                    episode_title=f'Episode {i}',
+                    episode_date=datetime(2021, pid % 12 + 1, i + 1),
+                    duration_seconds=1800 + i,
+                    cids=[1, pid],
+                    category_names=['Category 1', f'Category {pid}'],
+                    language='中文',
+                    format='video' if i % 2 else 'audio')
+            for pid in pids for i in range(episodes_per_pid)]
+
+
+@pytest.fixture
+def make_episodes() -> Callable[..., List[Episode]]:
+    return _make_episodes
@@ -0,0 +1,31 @@
+from datetime import date, datetime
+
+import pytest
+
+from csv_reader_writer.episodes_catalogue import iter_episodes, read_episodes, write_episodes
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet', '.sqlite'])
+@pytest.mark.parametrize('columns, filters', [
+    (None, None),
+    (None, [('pid', 'in', [3, 5]), ('episode_date', '>=', datetime(2021, 6, 1))]),
+    (['episode_title'], [('episode_date', '<', date(2021, 3, 1)), ('format', '=', 'audio')]),
+    (['duration_seconds'], [('cids', 'has any', [4, 7]), ('eid', 'not in', [4001, 7001])]),
+    (['cids'], [('duration_seconds', '!=', 1801), ('pid', '>', 7)]),
+])
+def test_iter_episodes_yields_same_episodes_as_read_episodes(tmp_path, make_episodes, suffix, columns, filters):
+    if suffix == '.parquet':
+        pytest.importorskip('pyarrow')
+    episodes = make_episodes([1, 3, 4, 5, 7, 8, 9])
+    # Empty cells never match filters
+    episodes[2] = episodes[2]._replace(episode_date=None)
+    episodes[11] = episodes[11]._replace(duration_seconds=None)
+    path = str(tmp_path / f'episodes{suffix}')
+    write_episodes(episodes, path)
+    expected = read_episodes(path, columns=columns, filters=filters)
+    assert expected
+    assert list(iter_episodes(path, columns=columns, filters=filters, chunk_size=3)) == expected
+    if suffix != '.csv':
+        csv_path = str(tmp_path / 'episodes.csv')
+        write_episodes(episodes, csv_path)
+        assert expected == read_episodes(csv_path, columns=columns, filters=filters)
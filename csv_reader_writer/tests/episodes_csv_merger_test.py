@@ -0,0 +1,67 @@
+import pytest
+
+from csv_reader_writer.episodes_csv_merger import DuplicateEpisodeError, EpisodesCsvMerger
+from csv_reader_writer.episodes_csv_writer import EpisodesCsvWriter
+
+
+@pytest.fixture
+def episodes_of(make_episodes):
+    # Quotes and newlines, which the merger has to keep quoted as EpisodesCsvWriter does
+    def _episodes_of(pids):
+        return [e._replace(programme_title=f'Programme, "{e.pid}"', episode_title=f'Episode\n{e.eid % 1000}')
+                for e in make_episodes(pids)]
+
+    return _episodes_of
+
+
+def test_merges_to_same_csv_as_episodes_csv_writer(tmp_path, episodes_of):
+    shard_paths = []
+    for index in range(3):
+        shard_paths.append(str(tmp_path / f'shard{index}.csv'))
+        EpisodesCsvWriter(episodes_of(range(index, 6, 3))).write_to_csv(shard_paths[-1])
+    EpisodesCsvWriter(episodes_of(range(6))).write_to_csv(str(tmp_path / 'expected.csv'))
+
+    num_episodes = EpisodesCsvMerger(shard_paths).merge_to_csv(str(tmp_path / 'actual.csv'))
+
+    assert num_episodes == 12
+    assert (tmp_path / 'actual.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
+
+
+def test_raises_on_duplicate_episode(tmp_path, episodes_of):
+    EpisodesCsvWriter(episodes_of([1, 2])).write_to_csv(str(tmp_path / 'a.csv'))
+    EpisodesCsvWriter(episodes_of([2, 3])).write_to_csv(str(tmp_path / 'b.csv'))
+    with pytest.raises(DuplicateEpisodeError):
+        EpisodesCsvMerger([str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]).merge_to_csv(str(tmp_path / 'out.csv'))
+
+
+@pytest.mark.parametrize('max_open_files, parallelism', [(2, 1), (3, 1), (256, 4), (3, 2)])
+def test_merges_many_csvs_in_groups(tmp_path, episodes_of, max_open_files, parallelism):
+    pid_paths = []
+    for pid in reversed(range(6)):
+        pid_paths.append(str(tmp_path / f'{pid}.csv'))
+        EpisodesCsvWriter(episodes_of([pid])).write_to_csv(pid_paths[-1])
+    EpisodesCsvWriter(episodes_of(range(6))).write_to_csv(str(tmp_path / 'expected.csv'))
+
+    num_episodes = EpisodesCsvMerger(pid_paths, max_open_files=max_open_files, parallelism=parallelism) \
+        .merge_to_csv(str(tmp_path / 'actual.csv'))
+
+    assert num_episodes == 12
+    assert (tmp_path / 'actual.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(['actual.csv', 'expected.csv'] +
+                                                                      [f'{pid}.csv' for pid in range(6)])
+
+
+@pytest.mark.parametrize('max_open_files', [2, 256])
+def test_drops_duplicate_episodes_keeping_the_first(tmp_path, episodes_of, max_open_files):
+    EpisodesCsvWriter(episodes_of([1, 2])).write_to_csv(str(tmp_path / 'a.csv'))
+    b_episodes = [e._replace(programme_title='b') for e in episodes_of([2, 3])]
+    EpisodesCsvWriter(b_episodes).write_to_csv(str(tmp_path / 'b.csv'))
+    expected_episodes = episodes_of([1, 2]) + [e for e in b_episodes if e.pid == 3]
+    EpisodesCsvWriter(expected_episodes).write_to_csv(str(tmp_path / 'expected.csv'))
+
+    num_episodes = EpisodesCsvMerger([str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv'), str(tmp_path / 'a.csv')],
+                                     drop_duplicates=True, max_open_files=max_open_files) \
+        .merge_to_csv(str(tmp_path / 'out.csv'))
+
+    assert num_episodes == len(expected_episodes)
+    assert (tmp_path / 'out.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
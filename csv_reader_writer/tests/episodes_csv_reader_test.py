@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+from csv_reader_writer.backup_table_reader import BackupTableReader
+from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from model.backup_table import BackupTableRow
+from model.podcast.episode import Episode
+
+_EPISODES_CSV = '''pid,eid,programme_title,episode_title,episode_date,duration_seconds,og_title,og_description,cids,category_names,file_url,m3u8_url,rss_url,language,format
+1,10,"Programme, ""1""","Episode
+1",2021-01-02,1800,,,"[7, 8]","['Category 7', '類別 8']",https://a/10.mp4,,,中文,video
+1,11,Programme,Episode 2,,,,,[],[],,,,,
+2,20,Programme,Episode 3,2021-13-01,60,,,"[7, 8]","['Category 7', '類別 8']",,,,,audio
+'''
+
+
+def test_read_to_episodes(tmp_path):
+    (tmp_path / 'episodes.csv').write_text(_EPISODES_CSV, encoding='utf-8')
+    episodes = EpisodesCsvReader().read_to_episodes(str(tmp_path / 'episodes.csv'))
+    assert episodes == [
+        Episode(pid=1, eid=10, programme_title='Programme, "1"', episode_title='Episode\n1',
+                episode_date=datetime(2021, 1, 2), duration_seconds=1800, cids=[7, 8],
+                category_names=['Category 7', '類別 8'], file_url='https://a/10.mp4', language='中文', format='video'),
+        Episode(pid=1, eid=11, programme_title='Programme', episode_title='Episode 2'),
+        Episode(pid=2, eid=20, programme_title='Programme', episode_title='Episode 3', duration_seconds=60,
+                cids=[7, 8], category_names=['Category 7', '類別 8'], format='audio'),
+    ]
+    assert [type(episode.pid) for episode in episodes] == [int, int, int]
+    # Rows get their own lists
+    assert episodes[0].cids is not episodes[2].cids
+
+
+def test_read_to_backup_table(tmp_path):
+    (tmp_path / 'backup.csv').write_text('programme,date,title,content_description,youtube_link,backup_link\n'
+                                         'Programme,2021-01-02,Title,,https://youtu.be/a,https://b/a\n',
+                                         encoding='utf-8')
+    assert BackupTableReader().read_to_backup_table(str(tmp_path / 'backup.csv')) == [
+        BackupTableRow(programme='Programme', dt=datetime(2021, 1, 2), title='Title', content_description=None,
+                       youtube_link='https://youtu.be/a', backup_link='https://b/a')
+    ]
+
+
+def test_read_to_episode_table(tmp_path):
+    (tmp_path / 'episodes.csv').write_text(_EPISODES_CSV, encoding='utf-8')
+    episodes = EpisodesCsvReader().read_to_episodes(str(tmp_path / 'episodes.csv'))
+    table = EpisodesCsvReader().read_to_episode_table(str(tmp_path / 'episodes.csv'))
+    assert list(table) == episodes
+    assert [row.to_episode() for row in table] == episodes
+    assert [row._asdict() for row in table] == [episode._asdict() for episode in episodes]
+    assert table[-1].format == 'audio' and table[1].episode_date is None and table[1].duration_seconds is None
+    # Rows get their own lists
+    table[0].cids.append(9)
+    assert table[0].cids == table[2].cids == [7, 8]
+
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+def test_iter_episodes_with_list_filter(tmp_path):
+    (tmp_path / 'episodes.csv').write_text(_EPISODES_CSV, encoding='utf-8')
+    episodes = EpisodesCsvReader().iter_episodes(str(tmp_path / 'episodes.csv'), columns=['eid'],
+                                                 filters=[('cids', 'has any', [8, 9]), ('pid', '=', 1)])
+    assert [episode.eid for episode in episodes] == [10]
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from csv_reader_writer.episodes_csv_stream_writer import EpisodesCsvStreamWriter
+from csv_reader_writer.episodes_csv_writer import EpisodesCsvWriter
+from model.podcast.episode import Episode
+
+
+@pytest.fixture
+def episodes(make_episodes):
+    # In no particular order, with missing dates and durations and an episode missing most fields
+    episodes = make_episodes([7, 2, 0], episodes_per_pid=3) + make_episodes([5])
+    episodes = episodes[1::2] + episodes[::2]
+    episodes[1] = episodes[1]._replace(episode_date=None)
+    episodes[2] = episodes[2]._replace(duration_seconds=None)
+    return episodes + [Episode(pid=5, eid=1, duration_seconds=0)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('max_buffered_episodes', [1000, 3])
+async def test_writes_same_csv_as_episodes_csv_writer(tmp_path, episodes, max_buffered_episodes):
+    EpisodesCsvWriter(episodes).write_to_csv(str(tmp_path / 'expected.csv'))
+    async with EpisodesCsvStreamWriter(str(tmp_path / 'actual.csv'),
+                                       max_buffered_episodes=max_buffered_episodes,
+                                       max_pending_batches=2) as writer:
+        for i in range(0, len(episodes), 2):
+            await writer.write(episodes[i:i + 2])
+    assert writer.num_episodes == len(episodes)
+    assert (tmp_path / 'actual.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
+    assert EpisodesCsvReader().read_to_episodes(str(tmp_path / 'actual.csv')) == \
+           EpisodesCsvReader().read_to_episodes(str(tmp_path / 'expected.csv'))
+    assert sorted(os.listdir(tmp_path)) == ['actual.csv', 'expected.csv']
+
+
+@pytest.mark.asyncio
+async def test_abort_leaves_no_output(tmp_path, episodes):
+    with pytest.raises(RuntimeError):
+        async with EpisodesCsvStreamWriter(str(tmp_path / 'out.csv'), max_buffered_episodes=3) as writer:
+            await writer.write(episodes)
+            raise RuntimeError()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('max_buffered_episodes', [1000, 3])
+async def test_merges_added_sorted_csvs(tmp_path, episodes, max_buffered_episodes):
+    EpisodesCsvWriter(episodes).write_to_csv(str(tmp_path / 'expected.csv'))
+    for pid in [2, 7]:
+        EpisodesCsvWriter([e for e in episodes if e.pid == pid]).write_to_csv(str(tmp_path / f'{pid}.rthk.tmp.csv'))
+    async with EpisodesCsvStreamWriter(str(tmp_path / 'actual.csv'),
+                                       max_buffered_episodes=max_buffered_episodes) as writer:
+        # Episodes of pid 7 are also written, and kept only once
+        await writer.write([e for e in episodes if e.pid != 2])
+        writer.add_sorted_csv(str(tmp_path / '2.rthk.tmp.csv'))
+        writer.add_sorted_csv(str(tmp_path / '7.rthk.tmp.csv'))
+    assert writer.num_episodes == len(episodes)
+    assert (tmp_path / 'actual.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
@@ -0,0 +1,118 @@
+import pytest
+
+from csv_reader_writer.episodes_catalogue import iter_episodes
+from csv_reader_writer.episodes_csv_merger import compact_segments
+from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from csv_reader_writer.episodes_csv_segments import segment_paths_for
+from csv_reader_writer.episodes_csv_writer import EpisodesCsvWriter
+from model.podcast.episode import Episode
+from util.paths import atomic_path
+
+
+@pytest.fixture
+def episodes_of(make_episodes):
+    def episodes_of(pids, title=None):
+        # With quotes in the programme titles and an episode missing its date and duration
+        episodes = [e._replace(programme_title=f'Programme, "{e.pid}"') for e in make_episodes(sorted(pids))]
+        episodes = [e._replace(episode_date=None, duration_seconds=None) if e.eid == 3000 else e for e in episodes]
+        return [e._replace(episode_title=f'{title} {e.eid % 1000}') for e in episodes] if title else episodes
+
+    return episodes_of
+
+
+def _upserted(episodes, upserts):
+    episodes_by_pid_eid = {(e.pid, e.eid): e for e in episodes}
+    for upsert in upserts:
+        episodes_by_pid_eid.update(((e.pid, e.eid), e) for e in upsert)
+    return sorted(episodes_by_pid_eid.values(), key=lambda e: (e.pid, e.eid))
+
+
+def test_failed_write_keeps_previous_csv(tmp_path, episodes_of, monkeypatch):
+    path = str(tmp_path / 'episodes.csv')
+    EpisodesCsvWriter(episodes_of([1])).write_to_csv(path)
+    previous_bytes = (tmp_path / 'episodes.csv').read_bytes()
+
+    def fail(frame, path, **kwargs):
+        with open(path, 'w') as f:
+            f.write('pid,eid\n1,')
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr('pandas.DataFrame.to_csv', fail)
+    with pytest.raises(OSError):
+        EpisodesCsvWriter(episodes_of([2])).write_to_csv(path)
+
+    assert (tmp_path / 'episodes.csv').read_bytes() == previous_bytes
+    assert [p.name for p in tmp_path.iterdir()] == ['episodes.csv']
+
+
+def test_reads_newest_upserted_episodes(tmp_path, episodes_of):
+    path = str(tmp_path / 'episodes.csv')
+    EpisodesCsvWriter(episodes_of([1, 2, 3])).write_to_csv(path)
+    upserts = [episodes_of([2], title='Updated'), episodes_of([4, 0]), episodes_of([2, 4], title='Updated again')]
+    for upsert in upserts:
+        EpisodesCsvWriter(upsert).upsert_to_csv(path)
+
+    expected = _upserted(episodes_of([1, 2, 3]), upserts)
+    assert len(segment_paths_for(path)) == 3
+    assert EpisodesCsvReader().read_to_episodes(path) == expected
+    assert list(EpisodesCsvReader().read_to_episode_table(path)) == expected
+    assert list(iter_episodes(path, columns=['episode_title'],
+                              filters=[('episode_title', '==', 'Updated 1'), ('pid', 'in', [2, 3])])) == []
+    assert list(iter_episodes(path, columns=['episode_title'], filters=[('pid', 'in', [2, 3])], chunk_size=2)) == \
+        [Episode(pid=e.pid, eid=e.eid, episode_title=e.episode_title) for e in expected if e.pid in (2, 3)]
+
+
+def test_upserts_into_missing_csv(tmp_path, episodes_of):
+    path = str(tmp_path / 'episodes.csv')
+    EpisodesCsvWriter(episodes_of([2])).upsert_to_csv(path)
+    EpisodesCsvWriter(episodes_of([1])).upsert_to_csv(path)
+
+    assert EpisodesCsvReader().read_to_episodes(path) == episodes_of([1, 2])
+
+
+def test_upserting_unchanged_episodes_reads_them_once(tmp_path, episodes_of):
+    path = str(tmp_path / 'episodes.csv')
+    EpisodesCsvWriter(episodes_of([1, 2])).write_to_csv(path)
+    EpisodesCsvWriter(episodes_of([1, 2])).upsert_to_csv(path)
+    EpisodesCsvWriter(episodes_of([2], title='Updated')).upsert_to_csv(path)
+
+    assert len(segment_paths_for(path)) == 2
+    assert EpisodesCsvReader().read_to_episodes(path) == episodes_of([1]) + episodes_of([2], title='Updated')
+    assert compact_segments(path) == 4
+
+
+def test_compacts_segments_into_csv(tmp_path, episodes_of):
+    path = str(tmp_path / 'episodes.csv')
+    EpisodesCsvWriter(episodes_of([1, 2, 3])).write_to_csv(path)
+    upserts = [episodes_of([2], title='Updated'), episodes_of([4]), episodes_of([2], title='Updated again')]
+    for upsert in upserts:
+        EpisodesCsvWriter(upsert).upsert_to_csv(path, max_segments=2)
+    EpisodesCsvWriter(_upserted(episodes_of([1, 2, 3]), upserts)).write_to_csv(str(tmp_path / 'expected.csv'))
+
+    assert segment_paths_for(path) == []
+    assert (tmp_path / 'episodes.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
+    assert compact_segments(path) == 8
+
+
+def test_write_replaces_upserted_episodes(tmp_path, episodes_of):
+    path = str(tmp_path / 'episodes.csv')
+    EpisodesCsvWriter(episodes_of([1])).write_to_csv(path)
+    EpisodesCsvWriter(episodes_of([1, 2], title='Updated')).upsert_to_csv(path)
+    EpisodesCsvWriter(episodes_of([3])).write_to_csv(path)
+
+    assert segment_paths_for(path) == []
+    assert EpisodesCsvReader().read_to_episodes(path) == episodes_of([3])
+
+
+def test_ignores_segments_of_replaced_csv(tmp_path, episodes_of):
+    path = str(tmp_path / 'episodes.csv')
+    EpisodesCsvWriter(episodes_of([1])).write_to_csv(path)
+    EpisodesCsvWriter(episodes_of([1, 2], title='Updated')).upsert_to_csv(path)
+    # As if writing crashed after replacing the csv but before removing its segments
+    with atomic_path(path) as tmp_path:
+        EpisodesCsvWriter(episodes_of([3])).write_to_csv(tmp_path)
+
+    assert segment_paths_for(path) == []
+    assert EpisodesCsvReader().read_to_episodes(path) == episodes_of([3])
+    EpisodesCsvWriter(episodes_of([4])).upsert_to_csv(path)
+    assert EpisodesCsvReader().read_to_episodes(path) == episodes_of([3, 4])
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+from csv_reader_writer.episodes_catalogue import read_episodes, write_episodes
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def episodes(make_episodes):
+    # With an episode missing its date and duration, which no date filter matches
+    episodes = make_episodes([2, 3, 5, 7], episodes_per_pid=3)
+    return [e._replace(episode_date=None, duration_seconds=None) if e.eid == 3002 else e for e in episodes]
+
+
+def test_parquet_reads_same_episodes_as_csv(tmp_path, episodes):
+    write_episodes(episodes, str(tmp_path / 'episodes.csv'))
+    write_episodes(read_episodes(str(tmp_path / 'episodes.csv')), str(tmp_path / 'episodes.parquet'))
+    assert read_episodes(str(tmp_path / 'episodes.parquet')) == read_episodes(str(tmp_path / 'episodes.csv'))
+
+    write_episodes(read_episodes(str(tmp_path / 'episodes.parquet')), str(tmp_path / 'roundtrip.csv'))
+    assert (tmp_path / 'roundtrip.csv').read_bytes() == (tmp_path / 'episodes.csv').read_bytes()
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet'])
+def test_projection_and_filters(tmp_path, episodes, suffix):
+    path = str(tmp_path / f'episodes{suffix}')
+    write_episodes(episodes, path)
+    episodes = read_episodes(path,
+                             columns=['episode_date'],
+                             filters=[('pid', 'in', [3, 5]), ('episode_date', '>=', datetime(2021, 4, 2))])
+    assert [(e.pid, e.eid, e.episode_date) for e in episodes] == [
+        (3, 3001, datetime(2021, 4, 2)), (5, 5000, datetime(2021, 6, 1)), (5, 5001, datetime(2021, 6, 2)),
+        (5, 5002, datetime(2021, 6, 3))
+    ]
+    assert all(e.programme_title is None and e.cids == [] for e in episodes)
+
+
+def test_filters_on_lists_after_reading(tmp_path, episodes):
+    write_episodes(episodes, str(tmp_path / 'episodes.csv'))
+    write_episodes(episodes, str(tmp_path / 'episodes.parquet'))
+    filters = [('pid', '<', 5), ('category_names', 'has any', ['Category 2', 'Category 7'])]
+    expected = read_episodes(str(tmp_path / 'episodes.csv'), columns=['episode_title'], filters=filters)
+    assert {e.pid for e in expected} == {2}
+    assert read_episodes(str(tmp_path / 'episodes.parquet'), columns=['episode_title'], filters=filters) == expected
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from csv_reader_writer.episodes_catalogue import read_episodes, write_episodes
+from csv_reader_writer.episodes_sqlite_store import EpisodesSqliteStore
+from model.podcast.episode import Episode
+
+
+@pytest.fixture
+def episodes(make_episodes):
+    # In two languages, with an episode missing its date and duration
+    episodes = [e._replace(language='English') if e.eid % 2 else e for e in make_episodes([1, 2, 3, 4, 5, 7])]
+    return [e._replace(episode_date=None, duration_seconds=None) if e.eid == 2000 else e for e in episodes]
+
+
+def test_reads_same_episodes_as_csv(tmp_path, episodes):
+    write_episodes(episodes, str(tmp_path / 'episodes.csv'))
+    write_episodes(read_episodes(str(tmp_path / 'episodes.csv')), str(tmp_path / 'episodes.sqlite'))
+    assert read_episodes(str(tmp_path / 'episodes.sqlite')) == read_episodes(str(tmp_path / 'episodes.csv'))
+
+
+@pytest.mark.parametrize('filters', [
+    [('pid', 'in', [3, 5]), ('episode_date', '>=', datetime(2021, 4, 2))],
+    [('episode_date', '>=', datetime(2021, 2, 2)), ('episode_date', '<', datetime(2021, 4, 2))],
+    [('cids', 'has any', [4, 7]), ('format', '=', 'audio')],
+    [('eid', 'not in', [1001, 2002]), ('language', '!=', 'English')],
+])
+def test_filters_match_csv(tmp_path, episodes, filters):
+    write_episodes(episodes, str(tmp_path / 'episodes.csv'))
+    write_episodes(episodes, str(tmp_path / 'episodes.sqlite'))
+    expected = read_episodes(str(tmp_path / 'episodes.csv'), columns=['episode_date', 'cids'], filters=filters)
+    assert expected
+    assert read_episodes(str(tmp_path / 'episodes.sqlite'), columns=['episode_date', 'cids'],
+                         filters=filters) == expected
+
+
+def test_upsert_replaces_episodes_by_pid_and_eid(tmp_path):
+    with EpisodesSqliteStore(str(tmp_path / 'episodes.sqlite')) as store:
+        store.write([Episode(pid=1, eid=1, episode_title='a'), Episode(pid=1, eid=2, episode_title='b')])
+        store.upsert([Episode(pid=1, eid=2, episode_title='c'), Episode(pid=2, eid=1, episode_title='d')])
+        assert [(e.pid, e.eid, e.episode_title) for e in store.query()] == [(1, 1, 'a'), (1, 2, 'c'), (2, 1, 'd')]
+        store.write([Episode(pid=3, eid=1)])
+        assert store.query() == [Episode(pid=3, eid=1)]
+
+
+def test_rejects_unknown_columns(tmp_path):
+    with EpisodesSqliteStore(str(tmp_path / 'episodes.sqlite')) as store:
+        with pytest.raises(ValueError):
+            store.query(filters=[('pid; DROP TABLE episodes', '=', 1)])
+
+
+def test_reading_missing_file_raises_without_creating_it(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        read_episodes(str(tmp_path / 'typo.sqlite'))
+    assert list(tmp_path.iterdir()) == []
@@ -7,13 +7,12 @@ import aiofiles
 import ffmpeg
 import tqdm
 
-from crawler.podcast import client
-from crawler.podcast.client import NotResumableError
+from crawler.podcast.client import HttpClient, NotResumableError
 
 
 class M3U8Downloader:
-    def __init__(self, sem: asyncio.Semaphore):
-        self._sem = sem
+    def __init__(self, http_client: HttpClient):
+        self._http_client = http_client
 
     async def save_download(self, m3u8_url: str, out_path: str):
         if os.path.exists(out_path):
@@ -44,7 +43,7 @@ class M3U8Downloader:
     async def _initialise_progress_bar(self, chunk_urls: List[str]) -> tqdm.tqdm:
         content_lengths = await asyncio.gather(
             *[
-                client.get_content_length(chunk_url, sem=self._sem, num_retries=2, timeout=30)
+                self._http_client.get_content_length(chunk_url, num_retries=2, timeout=30)
                 for chunk_url in chunk_urls
             ]
         )
@@ -58,19 +57,17 @@ class M3U8Downloader:
         chunk_ext = f'{ext}.chunk.{chunk_num}'
         chunk_out_path = basename + chunk_ext
         try:
-            await client.get_resumable(chunk_url,
-                                       write_to_file=chunk_out_path,
-                                       sem=self._sem,
-                                       progress_bar=progress_bar)
+            await self._http_client.get_resumable(chunk_url,
+                                                  write_to_file=chunk_out_path,
+                                                  progress_bar=progress_bar)
         except NotResumableError:
             logging.warning(f'Cannot resume download chunk: {chunk_url}')
             if os.path.exists(chunk_out_path):
                 logging.info(f'Chunk already downloaded: {chunk_url}')
             else:
                 logging.warning(f'Falling back to non-resumable download: {chunk_url}')
-                raw_bytes = await client.get_bytes(chunk_url,
-                                                   sem=self._sem,
-                                                   progress_bar=progress_bar)
+                raw_bytes = await self._http_client.get_bytes(chunk_url,
+                                                              progress_bar=progress_bar)
                 async with aiofiles.open(chunk_out_path, mode='wb') as f:
                     await f.write(raw_bytes)
 
@@ -101,7 +98,7 @@ class M3U8Downloader:
                 return relative_url
             return f'{m3u8_url[:m3u8_url.rfind("/")]}/{relative_url}'
 
-        txt = await client.get(m3u8_url, sem=self._sem)
+        txt = await self._http_client.get(m3u8_url)
         return [_to_absolute_url(line)
                 for line in txt.splitlines()
                 if not line.startswith('#')]
@@ -1,16 +1,22 @@
 import logging
 
-from scripts import create_odysee_channel, create_odysee_readme, download_podcast, list_odysee_videos, \
+from scripts import convert_episodes_catalogue, create_odysee_channel, create_odysee_readme, download_podcast, \
+    list_odysee_videos, \
     list_podcast_programmes, \
+    merge_podcast_shards, \
+    serve_podcast_replay, \
     upload_to_internet_archive, \
     upload_to_odysee, \
     youtube_json_to_csv
 from scripts.args import parse_args
+from scripts.convert_episodes_catalogue import ConvertEpisodesCatalogueArgs
 from scripts.create_odysee_channel import CreateOdyseeChannelArgs
 from scripts.create_odysee_readme import CreateOdyseeReadmeArgs
 from scripts.download_podcast import DownloadPodcastArgs
 from scripts.list_odysee_videos import ListOdyseeVideosArgs
 from scripts.list_podcast_programmes import ListPodcastProgrammesArgs
+from scripts.merge_podcast_shards import MergePodcastShardsArgs
+from scripts.serve_podcast_replay import ServePodcastReplayArgs
 from scripts.upload_to_internet_archive import UploadToInternetArchiveArgs
 from scripts.upload_to_odysee import UploadToOdyseeArgs
 from scripts.youtube_json_to_csv import YoutubeToJsonArgs
@@ -21,6 +27,9 @@ logging.basicConfig()
 def main():
     args = parse_args()
 
+    if isinstance(args, ConvertEpisodesCatalogueArgs):
+        convert_episodes_catalogue.run(args)
+
     if isinstance(args, CreateOdyseeChannelArgs):
         create_odysee_channel.run(args)
 
@@ -36,6 +45,12 @@ def main():
     if isinstance(args, ListPodcastProgrammesArgs):
         list_podcast_programmes.run(args)
 
+    if isinstance(args, MergePodcastShardsArgs):
+        merge_podcast_shards.run(args)
+
+    if isinstance(args, ServePodcastReplayArgs):
+        serve_podcast_replay.run(args)
+
     if isinstance(args, UploadToInternetArchiveArgs):
         upload_to_internet_archive.run(args)
 
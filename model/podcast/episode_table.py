@@ -0,0 +1,196 @@
+from array import array
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from model.podcast.episode import Episode
+
+# Stands for None in integer columns
+_MISSING = -2 ** 63
+
+
+class _IntColumn:
+    def __init__(self):
+        self._values = array('q')
+
+    def append(self, value: Optional[int]):
+        self._values.append(_MISSING if value is None or value != value else int(value))
+
+    def get(self, index: int) -> Optional[int]:
+        value = self._values[index]
+        return None if value == _MISSING else value
+
+
+class _DateColumn:
+    # Dates are kept to the day, as proleptic Gregorian ordinals with 0 for None
+    def __init__(self):
+        self._ordinals = array('i')
+
+    def append(self, value: Optional[date]):
+        self._ordinals.append(0 if value is None or value != value else value.toordinal())
+
+    def get(self, index: int) -> Optional[datetime]:
+        ordinal = self._ordinals[index]
+        return datetime.fromordinal(ordinal) if ordinal else None
+
+
+class _EncodedColumn:
+    # Each distinct value is kept once, lists as tuples, and rows keep the index of their value
+    def __init__(self, is_list: bool):
+        self._is_list = is_list
+        self._values: List[Any] = []
+        self._codes_by_value: Dict[Any, int] = {}
+        self._codes = array('I')
+
+    def append(self, value):
+        if value != value:  # nan
+            value = None
+        if self._is_list and value is not None:
+            value = tuple(value)
+        code = self._codes_by_value.get(value)
+        if code is None:
+            code = self._codes_by_value[value] = len(self._values)
+            self._values.append(value)
+        self._codes.append(code)
+
+    def get(self, index: int):
+        value = self._values[self._codes[index]]
+        # Rows get their own lists, so changing one doesn't change the others
+        return list(value) if self._is_list and value is not None else value
+
+
+class _StringColumn:
+    # Strings are packed as utf-8 in one buffer, with the end offset of each row, negated for None
+    def __init__(self):
+        self._buffer = bytearray()
+        self._ends = array('q')
+
+    def append(self, value: Optional[str]):
+        if value is None or value != value:  # None or nan
+            self._ends.append(~len(self._buffer))
+        else:
+            self._buffer += str(value).encode('utf-8')
+            self._ends.append(len(self._buffer))
+
+    def get(self, index: int) -> Optional[str]:
+        end = self._ends[index]
+        if end < 0:
+            return None
+        start = self._ends[index - 1] if index else 0
+        start = ~start if start < 0 else start
+        return self._buffer[start:end].decode('utf-8')
+
+
+def _new_column(field: str):
+    if field in ('pid', 'eid', 'duration_seconds'):
+        return _IntColumn()
+    if field == 'episode_date':
+        return _DateColumn()
+    if field in ('programme_title', 'rss_url', 'language', 'format'):
+        return _EncodedColumn(is_list=False)
+    if field in ('cids', 'category_names'):
+        return _EncodedColumn(is_list=True)
+    return _StringColumn()
+
+
+class EpisodeTable:
+    """
+    Episodes stored as columns rather than as one Episode per row, to hold whole catalogues in little memory:
+    ids, durations and dates are packed in arrays, other strings in utf-8 buffers, and programme titles, rss urls,
+    languages, formats and category lists are kept once per distinct value.
+    Rows are EpisodeRow views, which can be used in place of Episode.
+    """
+
+    def __init__(self, episodes: Iterable[Episode] = ()):
+        self._columns = [_new_column(field) for field in Episode._fields]
+        self._num_rows = 0
+        self.extend(episodes)
+
+    def append(self, episode: Episode):
+        for column, value in zip(self._columns, episode):
+            column.append(value)
+        self._num_rows += 1
+
+    def extend(self, episodes: Iterable[Episode]):
+        for episode in episodes:
+            self.append(episode)
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    def __getitem__(self, index: int) -> 'EpisodeRow':
+        if index < 0:
+            index += self._num_rows
+        if not 0 <= index < self._num_rows:
+            raise IndexError(f'Episode index out of range: {index}')
+        return EpisodeRow(self, index)
+
+    def __iter__(self) -> Iterator['EpisodeRow']:
+        return (EpisodeRow(self, index) for index in range(self._num_rows))
+
+    def value(self, field_index: int, index: int):
+        return self._columns[field_index].get(index)
+
+
+class EpisodeRow:
+    """
+    View of one row of an EpisodeTable, with the fields, equality and the _asdict and _replace methods of Episode.
+
+    >>> table = EpisodeTable([Episode(pid=1, eid=2, episode_date=datetime(2021, 1, 2), cids=[3])])
+    >>> table[0].eid, table[0].episode_date, table[0].cids, table[0].programme_title
+    (2, datetime.datetime(2021, 1, 2, 0, 0), [3], None)
+    >>> table[0] == Episode(pid=1, eid=2, episode_date=datetime(2021, 1, 2), cids=[3])
+    True
+    >>> table[0]._replace(eid=4)
+    Episode(pid=1, eid=4, programme_title=None, episode_title=None, episode_date=datetime.datetime(2021, 1, 2, 0, 0), \
+duration_seconds=None, og_title=None, og_description=None, cids=[3], category_names=[], file_url=None, m3u8_url=None, \
+rss_url=None, language=None, format=None)
+    """
+    __slots__ = ('_table', '_index')
+
+    _fields = Episode._fields
+    _field_defaults = Episode._field_defaults
+
+    def __init__(self, table: EpisodeTable, index: int):
+        self._table = table
+        self._index = index
+
+    def __iter__(self) -> Iterator:
+        return (self._table.value(field_index, self._index) for field_index in range(len(Episode._fields)))
+
+    def __len__(self) -> int:
+        return len(Episode._fields)
+
+    def __getitem__(self, field_index: int):
+        return self.to_episode()[field_index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (EpisodeRow, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(self.to_episode())
+
+    def to_episode(self) -> Episode:
+        return Episode._make(self)
+
+    def _asdict(self) -> Dict[str, Any]:
+        return dict(zip(Episode._fields, self))
+
+    def _replace(self, **fields) -> Episode:
+        return self.to_episode()._replace(**fields)
+
+
+def _field_property(field_index: int) -> property:
+    return property(lambda row: row._table.value(field_index, row._index))
+
+
+for _field_index, _field in enumerate(Episode._fields):
+    setattr(EpisodeRow, _field, _field_property(_field_index))
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,54 @@
+import re
+
+from bs4 import BeautifulSoup
+
+from parser.podcast.item_page_parser import ItemPage
+
+
+class BeautifulSoupItemPageParser:
+    """
+    Extracts the fields of a podcast item.php page with the CSS selectors the crawlers used before ItemPageParser.
+    Slower, but kept as the reference ItemPageParser's results are checked against.
+
+    >>> page = BeautifulSoupItemPageParser().parse('<html><head><meta property="og:title" content="Title" /></head>'
+    ...                                            '<body><select id="switch-years"><option value="0000"></option>'
+    ...                                            '<option value="2021"></option></select></body></html>')
+    >>> page.og_title, page.years, page.programme_title
+    ('Title', [2021], None)
+    """
+
+    def parse(self, html: str) -> ItemPage:
+        soup = BeautifulSoup(html, features="lxml")
+
+        def _text(selector: str):
+            element = soup.select_one(selector)
+            return element.get_text() if element else None
+
+        def _attr(selector: str, attr: str):
+            element = soup.select_one(selector)
+            return element[attr] if element else None
+
+        category_divs = soup.select('#prog-detail > div > div.prog-box > div.prog-box-info > ul > li:nth-child(3) > a')
+        m3u8_match = re.search(r'[^"]+\.m3u8', html)
+        return ItemPage(
+            years=[int(option['value'])
+                   for option in soup.select('#switch-years > option')
+                   if int(option['value']) > 1900],
+            programme_title=_text('#prog-detail > div > div.prog-box > div.prog-box-title > div.prog-title > h2'),
+            description=_text('#prog-detail > div > div.tab-box-about > div'),
+            language=_text('#prog-detail > div > div.prog-box > div.prog-box-info > ul > li:nth-child(2) > span'),
+            cids=[int(re.fullmatch(r'category.php\?cid=(\d+)&lang=.*', div['href']).group(1))
+                  for div in category_divs],
+            category_names=[div.get_text() for div in category_divs],
+            rss_url=_attr('#prog-detail > div > div.prog-box > div.subscribe-divs > div > div > a:nth-child(2)',
+                          'href'),
+            og_title=_attr('meta[property="og:title"]', 'content'),
+            og_description=_attr('meta[property="og:description"]', 'content'),
+            m3u8_url=m3u8_match and m3u8_match.group()
+        )
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
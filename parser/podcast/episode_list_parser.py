@@ -0,0 +1,86 @@
+from typing import Iterable, Iterator, List, Optional
+
+from lxml import etree
+
+from model.podcast.episode import Episode
+from util.dates import duration_to_seconds, ymd_to_date
+
+
+class IncrementalEpisodeListParser:
+    """
+    Parses an episodeList.php document fed in chunks, e.g. as it arrives from the socket.
+    Each <episode> becomes an Episode as soon as it is complete and is then dropped from the tree,
+    so memory use doesn't grow with the size of the document.
+
+    >>> parser = IncrementalEpisodeListParser()
+    >>> parser.feed(b'<episodeList><episode><pid>1</pid><eid>2</eid><episodeTitle>T</episodeTitle>'
+    ...             b'<episodeDate>2021-01-01</episodeDate><duration>00:01:00</duration>')
+    []
+    >>> [(e.eid, e.duration_seconds) for e in parser.feed(b'<mediafile>m</mediafile><format>video</format></episode>')]
+    [(2, 60)]
+    >>> parser.feed(b'</episodeList>')
+    []
+    >>> len(parser.close())
+    1
+    """
+
+    def __init__(self):
+        self._parser = etree.XMLPullParser(events=('end',), tag='episode', resolve_entities=False)
+        self._episodes: List[Episode] = []
+
+    def feed(self, chunk: bytes) -> List[Episode]:
+        # Returns the episodes completed by this chunk
+        self._parser.feed(chunk)
+        return self._read_episodes()
+
+    def close(self) -> List[Episode]:
+        # Returns all episodes of the document
+        self._parser.close()
+        self._read_episodes()
+        return self._episodes
+
+    def _read_episodes(self) -> List[Episode]:
+        episodes = []
+        for _, element in self._parser.read_events():
+            episodes.append(Episode(
+                pid=int(_text(element, 'pid')),
+                eid=int(_text(element, 'eid')),
+                episode_title=_text(element, 'episodeTitle'),
+                episode_date=ymd_to_date(_text(element, 'episodeDate')),
+                duration_seconds=duration_to_seconds(_text(element, 'duration')),
+                file_url=_text(element, 'mediafile'),
+                format=_text(element, 'format')
+            ))
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        self._episodes.extend(episodes)
+        return episodes
+
+
+class EpisodeListParser:
+    def incremental(self) -> IncrementalEpisodeListParser:
+        return IncrementalEpisodeListParser()
+
+    def iterparse(self, chunks: Iterable[bytes]) -> Iterator[Episode]:
+        parser = self.incremental()
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+        parser.close()
+
+    def parse(self, xml: str) -> List[Episode]:
+        return list(self.iterparse([xml.encode('utf-8')]))
+
+
+def _text(element: etree.Element, tag: str) -> Optional[str]:
+    # Same as xmltodict: missing elements are an error, empty ones are None and whitespace is stripped
+    child = element.find(tag)
+    if child is None:
+        raise KeyError(tag)
+    return child.text.strip() or None if child.text else None
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,88 @@
+import re
+from typing import List, NamedTuple, Optional
+
+import lxml.html
+from lxml import etree
+
+
+class ItemPage(NamedTuple):
+    years: List[int]
+    programme_title: Optional[str]
+    description: Optional[str]
+    language: Optional[str]  # '中文' / '英文'
+    cids: List[int]
+    category_names: List[str]
+    rss_url: Optional[str]
+    og_title: Optional[str]
+    og_description: Optional[str]
+    m3u8_url: Optional[str]
+
+
+def _has_class(name: str) -> str:
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+def _nth_child(n: int) -> str:
+    return f'count(preceding-sibling::*) = {n - 1}'
+
+
+# XPath equivalents of the CSS selectors the crawlers used with BeautifulSoup
+_PROG_BOX = f'//*[@id="prog-detail"]/div/div[{_has_class("prog-box")}]'
+_PROGRAMME_TITLE = etree.XPath(
+    f'{_PROG_BOX}/div[{_has_class("prog-box-title")}]/div[{_has_class("prog-title")}]/h2')
+_DESCRIPTION = etree.XPath(f'//*[@id="prog-detail"]/div/div[{_has_class("tab-box-about")}]/div')
+_LANGUAGE = etree.XPath(f'{_PROG_BOX}/div[{_has_class("prog-box-info")}]/ul/li[{_nth_child(2)}]/span')
+_CATEGORY_LINKS = etree.XPath(f'{_PROG_BOX}/div[{_has_class("prog-box-info")}]/ul/li[{_nth_child(3)}]/a')
+_RSS_LINK = etree.XPath(f'{_PROG_BOX}/div[{_has_class("subscribe-divs")}]/div/div/a[{_nth_child(2)}]/@href')
+_YEAR_OPTIONS = etree.XPath('//*[@id="switch-years"]/option/@value')
+_OG_TITLE = etree.XPath('//meta[@property="og:title"]/@content')
+_OG_DESCRIPTION = etree.XPath('//meta[@property="og:description"]/@content')
+_M3U8_URL = re.compile(r'[^"]+\.m3u8')
+_CATEGORY_HREF = re.compile(r'category.php\?cid=(\d+)&lang=.*')
+
+
+class ItemPageParser:
+    """
+    Extracts the fields of a podcast item.php page with lxml, without building a BeautifulSoup tree.
+
+    >>> page = ItemPageParser().parse('<html><head><meta property="og:title" content="Title" /></head>'
+    ...                               '<body><select id="switch-years"><option value="0000"></option>'
+    ...                               '<option value="2021"></option></select></body></html>')
+    >>> page.og_title, page.years, page.programme_title
+    ('Title', [2021], None)
+    """
+
+    def parse(self, html: str) -> ItemPage:
+        root = lxml.html.document_fromstring(html)
+        # Links that aren't to a category are skipped rather than failing the whole programme, and cids and category
+        # names are taken from the same links so that they stay paired
+        category_matches = [(link, _CATEGORY_HREF.fullmatch(link.get('href') or '')) for link in _CATEGORY_LINKS(root)]
+        category_matches = [(link, match) for link, match in category_matches if match]
+        m3u8_match = _M3U8_URL.search(html)
+        return ItemPage(
+            years=[int(value) for value in _YEAR_OPTIONS(root)
+                   if int(value) > 1900],  # Filter out invalid years, e.g. 0000
+            programme_title=_first_text(_PROGRAMME_TITLE(root)),
+            description=_first_text(_DESCRIPTION(root)),
+            language=_first_text(_LANGUAGE(root)),
+            cids=[int(match.group(1)) for _, match in category_matches],
+            category_names=[link.text_content() for link, _ in category_matches],
+            rss_url=_first(_RSS_LINK(root)),
+            og_title=_first(_OG_TITLE(root)),
+            og_description=_first(_OG_DESCRIPTION(root)),
+            m3u8_url=m3u8_match and m3u8_match.group()
+        )
+
+
+def _first(values: list) -> Optional[str]:
+    return str(values[0]) if values else None
+
+
+def _first_text(elements: list) -> Optional[str]:
+    return elements[0].text_content() if elements else None
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,25 @@
+import math
+from typing import List, Tuple
+
+import xmltodict
+
+from model.podcast.programme import Programme
+
+
+class ProgrammeListParser:
+    def parse_total_pages(self, xml: str) -> int:
+        root = xmltodict.parse(xml)
+        total_series = int(root['programmeList']['total'])
+        programme_per_page = int(root['programmeList']['programmePerPage'])
+        return math.ceil(total_series / programme_per_page)
+
+    def parse(self, xml: str) -> List[Programme]:
+        root = xmltodict.parse(xml, force_list={'programme'})
+        return [Programme(
+            pid=int(p['link'].removeprefix('item.php?pid=')),
+            title=p['title'],
+            format=p['format']
+        ) for p in root['programmeList']['programme']]
+
+    def parse_first_page(self, xml: str) -> Tuple[int, List[Programme]]:
+        return self.parse_total_pages(xml), self.parse(xml)
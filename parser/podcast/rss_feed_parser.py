@@ -0,0 +1,50 @@
+import logging
+from datetime import date
+from email.utils import parsedate_to_datetime
+from typing import List, NamedTuple, Optional
+
+from lxml import etree
+
+
+class RssItem(NamedTuple):
+    title: Optional[str]
+    pub_date: Optional[date]
+    enclosure_url: Optional[str]
+
+
+class RssFeedParser:
+    """
+    Parses the items of a programme's RSS 2.0 feed.
+
+    >>> RssFeedParser().parse(b'<rss><channel><item><title>T</title><pubDate>Fri, 01 Jan 2021 00:00:00 +0800</pubDate>'
+    ...                       b'<enclosure url="https://x/1.mp4" /></item></channel></rss>')
+    [RssItem(title='T', pub_date=datetime.date(2021, 1, 1), enclosure_url='https://x/1.mp4')]
+    """
+
+    def __init__(self):
+        self._parser = etree.XMLParser(resolve_entities=False, no_network=True, recover=True)
+
+    def parse(self, xml: bytes) -> List[RssItem]:
+        root = etree.fromstring(xml, self._parser)
+        if root is None:
+            return []
+        return [RssItem(title=item.findtext('title'),
+                        pub_date=_parse_pub_date(item.findtext('pubDate')),
+                        enclosure_url=item.find('enclosure').get('url') if item.find('enclosure') is not None else None)
+                for item in root.iter('item')]
+
+
+def _parse_pub_date(pub_date: Optional[str]) -> Optional[date]:
+    if not pub_date:
+        return None
+    try:
+        return parsedate_to_datetime(pub_date.strip()).date()
+    except (TypeError, ValueError):
+        logging.warning(f'Failed to parse RSS pubDate: {pub_date}')
+        return None
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,38 @@
+import xmltodict
+
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from model.podcast.episode import Episode
+from parser.podcast.episode_list_parser import EpisodeListParser
+from util.dates import duration_to_seconds, ymd_to_date
+
+
+def _parse_with_xmltodict(xml: str):
+    root = xmltodict.parse(xml, force_list={'episode'})
+    return [Episode(
+        pid=int(e['pid']),
+        eid=int(e['eid']),
+        episode_title=e['episodeTitle'],
+        episode_date=ymd_to_date(e['episodeDate']),
+        duration_seconds=duration_to_seconds(e['duration']),
+        file_url=e['mediafile'],
+        format=e['format']
+    ) for e in root['episodeList']['episode']]
+
+
+def test_parse_matches_xmltodict():
+    site = SyntheticSite(num_programmes=1, episodes_per_year=30)
+    xml = site.episode_list_xml(site.pids[0], site.years(site.pids[0])[0])
+    episodes = EpisodeListParser().parse(xml)
+    assert len(episodes) == 30
+    assert episodes == _parse_with_xmltodict(xml)
+
+
+def test_incremental_parse_yields_episodes_before_document_ends():
+    site = SyntheticSite(num_programmes=1, episodes_per_year=100)
+    xml = site.episode_list_xml(site.pids[0], site.years(site.pids[0])[0]).encode('utf-8')
+    chunks = [xml[i:i + 997] for i in range(0, len(xml), 997)]  # splits multi-byte characters too
+
+    parser = EpisodeListParser().incremental()
+    episodes_per_chunk = [len(parser.feed(chunk)) for chunk in chunks]
+    assert sum(episodes_per_chunk[:len(chunks) // 2]) > 0
+    assert parser.close() == _parse_with_xmltodict(xml.decode('utf-8'))
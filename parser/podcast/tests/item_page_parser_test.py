@@ -0,0 +1,62 @@
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from parser.podcast.beautiful_soup_item_page_parser import BeautifulSoupItemPageParser
+from parser.podcast.item_page_parser import ItemPageParser
+
+
+def test_parse_programme_page():
+    site = SyntheticSite(num_programmes=2)
+    for pid in site.pids:
+        html = site.item_html(pid)
+        page = ItemPageParser().parse(html)
+        assert page == BeautifulSoupItemPageParser().parse(html)
+        assert page.years == site.years(pid)
+        assert page.programme_title == site.programme_title(pid)
+        assert page.cids == [cid for cid, _ in site.categories(pid)]
+        assert page.rss_url == site.rss_url(pid)
+
+
+def test_parse_episode_page():
+    site = SyntheticSite(num_programmes=1)
+    pid = site.pids[0]
+    eid = site.episodes(pid, site.years(pid)[0])[0].eid
+    html = site.item_html(pid, eid)
+    page = ItemPageParser().parse(html)
+    assert page == BeautifulSoupItemPageParser().parse(html)
+    assert page.m3u8_url == site.m3u8_url(pid, eid)
+    assert page.og_title.startswith(site.programme_title(pid))
+
+
+def test_parse_matches_beautiful_soup_on_unusual_markup():
+    html = '''<html><head><meta property="og:description" content="a &amp; b"></head><body>
+    <div id="prog-detail"><div class="container">
+      <div class="prog-box extra">
+        <div class="prog-box-title"><div class="prog-title"><h2>Title <b>bold</b></h2></div></div>
+        <div class="prog-box-info"><ul>
+          <li>first</li><!-- comment -->
+          <li><span>英文</span><span>ignored</span></li>
+          <li><a href="category.php?cid=3&lang=en-US">Three</a><span>not a link</span></li>
+        </ul></div>
+      </div>
+      <div class="prog-boxes"><div class="prog-box-title"><div class="prog-title"><h2>Other</h2></div></div></div>
+    </div></div>
+    <select id="switch-years"><option value="0000">All</option><option value="2020">2020</option></select>
+    </body></html>'''
+    page = ItemPageParser().parse(html)
+    assert page == BeautifulSoupItemPageParser().parse(html)
+    assert page.programme_title == 'Title bold'
+    assert page.language == '英文'
+    assert page.og_description == 'a & b'
+    assert page.og_title is None
+
+
+def test_parse_skips_category_links_without_cid_keeping_names_paired():
+    html = '''<html><body><div id="prog-detail"><div class="container"><div class="prog-box">
+      <div class="prog-box-info"><ul>
+        <li>first</li><li><span>中文</span></li>
+        <li><a href="category.php?cid=3&lang=zh-CN">Three</a><a href="/search?q=news">News</a><a>No link</a>
+          <a href="category.php?cid=5&lang=zh-CN">Five</a></li>
+      </ul></div>
+    </div></div></div></body></html>'''
+    page = ItemPageParser().parse(html)
+    assert page.cids == [3, 5]
+    assert page.category_names == ['Three', 'Five']
@@ -1,6 +1,7 @@
 import argparse
 import logging
 import sys
+from typing import List, Optional
 
 
 class Args:
@@ -14,16 +15,22 @@ class Parser(argparse.ArgumentParser):
         sys.exit(2)
 
 
-def parse_args() -> Args:
+def parse_args(argv: Optional[List[str]] = None) -> Args:
     parser = Parser()
     parser.add_argument('-d', '--debug', default=False, action='store_true', help='Debug mode')
     subparsers = parser.add_subparsers(required=True, dest='subcommand')
 
-    from scripts import create_odysee_channel, create_odysee_readme, download_podcast, list_odysee_videos, \
+    from scripts import convert_episodes_catalogue, create_odysee_channel, create_odysee_readme, download_podcast, \
+        list_odysee_videos, \
         list_podcast_programmes, \
+        merge_podcast_shards, \
+        serve_podcast_replay, \
         upload_to_internet_archive, \
         upload_to_odysee, \
         youtube_json_to_csv
+    convert_episodes_catalogue.configure(
+        subparsers.add_parser('convert-episodes-catalogue', help='Convert podcast list between csv, parquet and sqlite')
+    )
     create_odysee_channel.configure(
         subparsers.add_parser('create-odysee-channel', help='Create Odysee channel')
     )
@@ -39,6 +46,12 @@ def parse_args() -> Args:
     list_podcast_programmes.configure(
         subparsers.add_parser('list-podcast-programmes', help='List podcast programmes')
     )
+    merge_podcast_shards.configure(
+        subparsers.add_parser('merge-podcast-shards', help='Merge podcast lists crawled in shards')
+    )
+    serve_podcast_replay.configure(
+        subparsers.add_parser('serve-podcast-replay', help='Serve a local replay of the podcast site')
+    )
     upload_to_internet_archive.configure(
         subparsers.add_parser('upload-to-internet-archive', help='Upload videos to archive.org')
     )
@@ -49,25 +62,35 @@ def parse_args() -> Args:
         subparsers.add_parser('youtube-json-to-csv', help='Convert youtube metadata JSON to csv')
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     _configure_logging(debug_mode=args.debug)
 
-    if args.subcommand == 'create-odysee-channel':
-        return create_odysee_channel.parse_args(args)
-    elif args.subcommand == 'create-odysee-readme':
-        return create_odysee_readme.parse_args(args)
-    elif args.subcommand == 'download-podcast':
-        return download_podcast.parse_args(args)
-    elif args.subcommand == 'list-odysee-videos':
-        return list_odysee_videos.parse_args(args)
-    elif args.subcommand == 'list-podcast-programmes':
-        return list_podcast_programmes.parse_args(args)
-    elif args.subcommand == 'upload-to-internet-archive':
-        return upload_to_internet_archive.parse_args(args)
-    elif args.subcommand == 'upload-to-odysee':
-        return upload_to_odysee.parse_args(args)
-    elif args.subcommand == 'youtube-json-to-csv':
-        return youtube_json_to_csv.parse_args(args)
+    # Subcommands check some arguments after parsing, and these are usage errors like those argparse finds
+    try:
+        if args.subcommand == 'convert-episodes-catalogue':
+            return convert_episodes_catalogue.parse_args(args)
+        elif args.subcommand == 'create-odysee-channel':
+            return create_odysee_channel.parse_args(args)
+        elif args.subcommand == 'create-odysee-readme':
+            return create_odysee_readme.parse_args(args)
+        elif args.subcommand == 'download-podcast':
+            return download_podcast.parse_args(args)
+        elif args.subcommand == 'list-odysee-videos':
+            return list_odysee_videos.parse_args(args)
+        elif args.subcommand == 'list-podcast-programmes':
+            return list_podcast_programmes.parse_args(args)
+        elif args.subcommand == 'merge-podcast-shards':
+            return merge_podcast_shards.parse_args(args)
+        elif args.subcommand == 'serve-podcast-replay':
+            return serve_podcast_replay.parse_args(args)
+        elif args.subcommand == 'upload-to-internet-archive':
+            return upload_to_internet_archive.parse_args(args)
+        elif args.subcommand == 'upload-to-odysee':
+            return upload_to_odysee.parse_args(args)
+        elif args.subcommand == 'youtube-json-to-csv':
+            return youtube_json_to_csv.parse_args(args)
+    except argparse.ArgumentError as e:
+        subparsers.choices[args.subcommand].error(str(e))
     raise ValueError(f'Unsupported command: {args.subcommand}')
 
 
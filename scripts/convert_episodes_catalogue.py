@@ -0,0 +1,43 @@
+import argparse
+import os
+from dataclasses import dataclass
+
+from csv_reader_writer.episodes_catalogue import read_episodes, upsert_episodes, write_episodes
+from scripts.args import Args
+from util.paths import to_abs_path
+
+
+@dataclass
+class ConvertEpisodesCatalogueArgs(Args):
+    catalogue_in: str
+    catalogue_out: str
+    upsert: bool
+
+
+def configure(parser: argparse.ArgumentParser):
+    parser.add_argument('--catalogue-in', required=True, help='Path of podcast list csv, parquet or sqlite file')
+    parser.add_argument('--catalogue-out', required=True,
+                        help='Path for output file, parquet if it ends with .parquet, sqlite if it ends with .sqlite '
+                             'and csv otherwise')
+    parser.add_argument('--upsert', action='store_true',
+                        help='Add the episodes to the output catalogue, replacing those with the same pid and eid, '
+                             'instead of overwriting it. --catalogue-in should only hold new or changed episodes, '
+                             'as csv catalogues add them without comparing')
+
+
+def parse_args(raw_args: argparse.Namespace) -> ConvertEpisodesCatalogueArgs:
+    catalogue_in = to_abs_path(raw_args.catalogue_in)
+    if not os.path.isfile(catalogue_in):
+        raise argparse.ArgumentError(None, f'--catalogue-in is not a file: {catalogue_in}')
+    return ConvertEpisodesCatalogueArgs(
+        catalogue_in=catalogue_in,
+        catalogue_out=to_abs_path(raw_args.catalogue_out),
+        upsert=raw_args.upsert
+    )
+
+
+def run(args: ConvertEpisodesCatalogueArgs):
+    if args.upsert:
+        upsert_episodes(read_episodes(args.catalogue_in), args.catalogue_out)
+    else:
+        write_episodes(read_episodes(args.catalogue_in), args.catalogue_out)
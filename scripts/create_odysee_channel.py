@@ -3,6 +3,7 @@ import asyncio
 import re
 from dataclasses import dataclass
 
+from crawler.podcast.client import HttpClient
 from crawler.podcast.programme_info_crawler import ProgrammeInfoCrawler
 from model.odysee.publish import OdyseeChannelCreateApiRequest
 from model.podcast.programme import ProgrammeInfo
@@ -40,8 +41,8 @@ def run(args: CreateOdyseeChannelArgs):
 
 
 async def _create_odysee_channel(args: CreateOdyseeChannelArgs):
-    sem = asyncio.Semaphore()
-    programme_info = await ProgrammeInfoCrawler(sem=sem).get_programme_info(args.pid)
+    async with HttpClient(parallelism=1) as http_client:
+        programme_info = await ProgrammeInfoCrawler(http_client=http_client).get_programme_info(args.pid)
     channel_create_request = _build_channel_create_request(args, programme_info)
     await OdyseeUploader().create_channel(channel_create_request)
 
@@ -3,13 +3,20 @@ import asyncio
 import logging
 import os
 from dataclasses import dataclass
-from typing import List
-
-from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from crawler.podcast.client import HttpClient
+from crawler.podcast.programme_list_cache import ProgrammeListCache
+from crawler.podcast.programme_list_crawler import ALL_LANGUAGES, ProgrammeListCrawler
+from crawler.podcast.retry_policy import RetryPolicy
+from csv_reader_writer.episodes_catalogue import iter_episodes
+from csv_reader_writer.episodes_parquet_schema import Filters
 from downloader.M3U8Downloader import M3U8Downloader
 from downloader.Mp4Downloader import Mp4Downloader
 from model.podcast.episode import Episode
 from scripts.args import Args
+from util.dates import ymd_to_date
 from util.paths import to_abs_path
 
 
@@ -17,23 +24,59 @@ from util.paths import to_abs_path
 class DownloadPodcastArgs(Args):
     out_dir: str
     csv_in: str
-    pids: List[int]
+    pids: Optional[List[int]]
+    all_listed: bool
+    languages: List[str]
+    programme_list_cache: Optional[str]
+    programme_list_ttl: float
     eids: List[int]
     years: List[int]
+    from_date: Optional[date]
+    to_date: Optional[date]
+    cids: List[int]
+    formats: List[str]
     parallelism: int
+    limit_per_host: int
+    read_timeout: float
+    max_attempts: int
+    request_deadline: float
+    url_rewrites: Dict[str, str]
     force_mp4: bool
 
 
 def configure(parser: argparse.ArgumentParser):
     parser.add_argument('--out-dir', required=True, help='Directory to store downloaded files')
-    parser.add_argument('--csv-in', required=True, help='Path to podcast list csv')
-    parser.add_argument('--pid', nargs='+', action='extend', type=int, help='pids to download')
+    parser.add_argument('--csv-in', required=True, help='Path to podcast list csv, parquet or sqlite file')
+    pids_or_all_listed = parser.add_mutually_exclusive_group(required=True)
+    pids_or_all_listed.add_argument('--pid', nargs='+', action='extend', type=int, help='pids to download')
+    pids_or_all_listed.add_argument('--all-listed', default=False, action='store_true',
+                                    help='Download all programmes currently listed in --lang')
+    parser.add_argument('--lang', nargs='*', action='extend', choices=ALL_LANGUAGES,
+                        help='Languages of the listed programmes to download with --all-listed (defaults to all)')
+    parser.add_argument('--programme-list-cache',
+                        help='Path of a json file keeping the listed programmes, shared with list-podcast-programmes')
+    parser.add_argument('--programme-list-ttl', type=float, default=24 * 3600,
+                        help='Seconds for which programmes in --programme-list-cache are used instead of listing them')
 
     eids_or_years = parser.add_mutually_exclusive_group()
     eids_or_years.add_argument('--eid', nargs='+', action='extend', type=int, default=[], help='eids to download')
     eids_or_years.add_argument('--year', nargs='*', action='extend', type=int, default=[], help='restrict to years')
-
-    parser.add_argument('--parallelism', type=int, default=100, help='How many HTTP requests in parallel')
+    parser.add_argument('--from-date', help='Restrict to episodes on or after this date (yyyy-mm-dd)')
+    parser.add_argument('--to-date', help='Restrict to episodes on or before this date (yyyy-mm-dd)')
+    parser.add_argument('--cid', nargs='+', action='extend', type=int, default=[],
+                        help='Restrict to episodes in any of these category ids')
+    parser.add_argument('--format', nargs='+', action='extend', choices=['video', 'audio'], default=[],
+                        help='Restrict to episodes of these formats')
+
+    parser.add_argument('--parallelism', type=int, default=100, help='Upper bound on HTTP requests in parallel')
+    parser.add_argument('--limit-per-host', type=int, default=0,
+                        help='Upper bound on HTTP connections in parallel per host (0 for --parallelism)')
+    parser.add_argument('--read-timeout', type=float, default=300, help='Seconds to wait for HTTP response data')
+    parser.add_argument('--max-attempts', type=int, default=5, help='How many times to try each HTTP request')
+    parser.add_argument('--request-deadline', type=float, default=600,
+                        help='Seconds after which a failing HTTP request is no longer retried')
+    parser.add_argument('--rewrite-url', nargs='+', action='extend', default=[], metavar='FROM_PREFIX=TO_PREFIX',
+                        help='Send requests for urls starting with FROM_PREFIX to TO_PREFIX, e.g. a replay server')
     parser.add_argument('--force-mp4', default=False, action='store_true', help='Skip m3u8, force download mp4')
 
 
@@ -41,18 +84,47 @@ def parse_args(raw_args: argparse.Namespace) -> DownloadPodcastArgs:
     out_dir = to_abs_path(raw_args.out_dir)
     csv_in = to_abs_path(raw_args.csv_in)
     pid = raw_args.pid
+    all_listed = raw_args.all_listed
+    # Not a default of --lang, which action='extend' would append the given languages to
+    lang = raw_args.lang or ALL_LANGUAGES
+    programme_list_cache = raw_args.programme_list_cache
+    programme_list_ttl = raw_args.programme_list_ttl
     eid = raw_args.eid
     years = raw_args.year
+    from_date = ymd_to_date(raw_args.from_date) if raw_args.from_date else None
+    to_date = ymd_to_date(raw_args.to_date) if raw_args.to_date else None
+    if raw_args.from_date and not from_date or raw_args.to_date and not to_date:
+        raise argparse.ArgumentError(None, '--from-date and --to-date must be yyyy-mm-dd')
+    cids = raw_args.cid
+    formats = raw_args.format
     parallelism = raw_args.parallelism
+    limit_per_host = raw_args.limit_per_host
+    read_timeout = raw_args.read_timeout
+    max_attempts = raw_args.max_attempts
+    request_deadline = raw_args.request_deadline
+    url_rewrites = dict(rewrite.split('=', 1) for rewrite in raw_args.rewrite_url)
     force_mp4 = raw_args.force_mp4
 
     return DownloadPodcastArgs(
         out_dir=out_dir,
         csv_in=csv_in,
         pids=pid,
+        all_listed=all_listed,
+        languages=lang,
+        programme_list_cache=to_abs_path(programme_list_cache) if programme_list_cache else None,
+        programme_list_ttl=programme_list_ttl,
         eids=eid,
         years=years,
+        from_date=from_date,
+        to_date=to_date,
+        cids=cids,
+        formats=formats,
         parallelism=parallelism,
+        limit_per_host=limit_per_host,
+        read_timeout=read_timeout,
+        max_attempts=max_attempts,
+        request_deadline=request_deadline,
+        url_rewrites=url_rewrites,
         force_mp4=force_mp4
     )
 
@@ -66,39 +138,69 @@ def run(args: DownloadPodcastArgs):
 
 
 async def _download_and_save_podcast(args: DownloadPodcastArgs):
-    sem = asyncio.Semaphore(args.parallelism)
-    episodes = _filter_episodes_from_csv(pids=args.pids, eids=args.eids, years=args.years, csv_in=args.csv_in)
-
-    m3u8_episodes, mp4_episodes = [], []
-    for e in episodes:
-        if e.m3u8_url and not args.force_mp4:
-            m3u8_episodes.append(e)
-        elif e.file_url:
-            mp4_episodes.append(e)
-
-    failed_episodes = await _download_and_save_m3u8(m3u8_episodes, out_dir=args.out_dir, sem=sem)
-    mp4_episodes += failed_episodes
-    await _download_and_save_mp4(mp4_episodes, out_dir=args.out_dir, sem=sem)
+    async with HttpClient(parallelism=args.parallelism,
+                          limit_per_host=args.limit_per_host,
+                          read_timeout=args.read_timeout,
+                          retry_policy=RetryPolicy(max_attempts=args.max_attempts,
+                                                   deadline=args.request_deadline),
+                          url_rewrites=args.url_rewrites) as http_client:
+        pids = await _list_pids(args, http_client) if args.all_listed else args.pids
+        episodes = _filter_episodes_from_csv(pids=pids, args=args)
+
+        m3u8_episodes, mp4_episodes = [], []
+        for e in episodes:
+            if e.m3u8_url and not args.force_mp4:
+                m3u8_episodes.append(e)
+            elif e.file_url:
+                mp4_episodes.append(e)
+
+        failed_episodes = await _download_and_save_m3u8(m3u8_episodes, out_dir=args.out_dir, http_client=http_client)
+        mp4_episodes += failed_episodes
+        await _download_and_save_mp4(mp4_episodes, out_dir=args.out_dir, http_client=http_client)
+
+
+async def _list_pids(args: DownloadPodcastArgs, http_client: HttpClient) -> List[int]:
+    programme_list_cache = None
+    if args.programme_list_cache:
+        programme_list_cache = ProgrammeListCache(args.programme_list_cache, ttl=args.programme_list_ttl)
+    programmes = await ProgrammeListCrawler(http_client, programme_list_cache=programme_list_cache) \
+        .list_all_programmes(args.languages)
+    return list({programme.pid for programme in programmes})
+
+
+def _filter_episodes_from_csv(pids: List[int], args: DownloadPodcastArgs) -> List[Episode]:
+    years = set(args.years)
 
-
-def _filter_episodes_from_csv(pids: List[int], eids: List[int], years: List[int], csv_in: str) -> List[Episode]:
     def _matches_criteria(episode: Episode) -> bool:
-        if not episode.pid in pids:
-            return False
-        if eids and not episode.eid in eids:
-            return False
-        if years and not episode.episode_date.year in years:
-            return False
-        return True
-
-    episodes = EpisodesCsvReader().read_to_episodes(csv_in)
-    matching_episodes = list(filter(_matches_criteria, episodes))
+        return not years or episode.episode_date.year in years
+
+    # Episodes are read in chunks and only the matching ones are kept; parquet and sqlite catalogues only read those
+    filters = [('pid', 'in', pids)] + _to_filters(args)
+    matching_episodes = list(filter(_matches_criteria, iter_episodes(args.csv_in, filters=filters)))
     logging.info(f'Will download episodes: {matching_episodes}')
     return matching_episodes
 
 
-async def _download_and_save_m3u8(episodes: List[Episode], out_dir: str, sem: asyncio.Semaphore) -> List[Episode]:
-    m3u8_downloader = M3U8Downloader(sem=sem)
+def _to_filters(args: DownloadPodcastArgs) -> Filters:
+    filters = []
+    if args.eids:
+        filters.append(('eid', 'in', args.eids))
+    if args.years:
+        filters.append(('episode_date', '>=', datetime(min(args.years), 1, 1)))
+        filters.append(('episode_date', '<', datetime(max(args.years) + 1, 1, 1)))
+    if args.from_date:
+        filters.append(('episode_date', '>=', args.from_date))
+    if args.to_date:
+        filters.append(('episode_date', '<=', args.to_date))
+    if args.cids:
+        filters.append(('cids', 'has any', args.cids))
+    if args.formats:
+        filters.append(('format', 'in', args.formats))
+    return filters
+
+
+async def _download_and_save_m3u8(episodes: List[Episode], out_dir: str, http_client: HttpClient) -> List[Episode]:
+    m3u8_downloader = M3U8Downloader(http_client=http_client)
 
     async def _download(episode: Episode):
         filename = f'rthk_{episode.pid}_{episode.eid}.mp4'
@@ -119,8 +221,8 @@ async def _download_and_save_m3u8(episodes: List[Episode], out_dir: str, sem: as
     return failed_episodes
 
 
-async def _download_and_save_mp4(episodes: List[Episode], out_dir: str, sem: asyncio.Semaphore):
-    mp4_downloader = Mp4Downloader(sem=sem)
+async def _download_and_save_mp4(episodes: List[Episode], out_dir: str, http_client: HttpClient):
+    mp4_downloader = Mp4Downloader(http_client=http_client)
 
     async def _download(episode: Episode, tqdm_local_position: int):
         basename, ext = os.path.splitext(episode.file_url)
@@ -7,7 +7,7 @@ from datetime import date
 from typing import List, NamedTuple, Optional
 
 from csv_reader_writer.backup_table_writer import BackupTableWriter
-from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from csv_reader_writer.episodes_catalogue import read_episodes
 from model.backup_table import BackupTable, BackupTableRow
 from model.odysee.publish import OdyseeClaimSearchApiRequest
 from model.podcast.episode import Episode
@@ -33,7 +33,7 @@ class OdyseeVideoInfo(NamedTuple):
 
 def configure(parser: argparse.ArgumentParser):
     parser.add_argument('--channel-id', required=True, help='Odysee channel id')
-    parser.add_argument('--csv-in', required=True, help='Path to podcast list csv')
+    parser.add_argument('--csv-in', required=True, help='Path to podcast list csv, parquet or sqlite file')
     parser.add_argument('--csv-out', required=True, help='Path for output csv file')
 
 
@@ -58,7 +58,7 @@ def run(args: ListOdyseeVideosArgs):
 
 
 async def _list_odysee_videos(args: ListOdyseeVideosArgs):
-    episodes = EpisodesCsvReader().read_to_episodes(args.csv_in)
+    episodes = read_episodes(args.csv_in)
     odysee_video_infos = await _list_odysee_video_infos(channel_id=args.channel_id)
     backup_table = _merge_into_backup_table(odysee_video_infos, episodes)
     BackupTableWriter(backup_table).write_to_csv(args.csv_out)
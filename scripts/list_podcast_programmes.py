@@ -1,64 +1,196 @@
 import argparse
 import asyncio
+import collections
 import glob
 import logging
 import os
 import re
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
 
 import tqdm
 
+from crawler.podcast.checkpoint_journal import CheckpointJournal
+from crawler.podcast.client import HttpClient
+from crawler.podcast.crawl_order import largest_first_as_estimated
 from crawler.podcast.episode_list_crawler import EpisodeListCrawler
-from crawler.podcast.programme_list_crawler import ProgrammeListCrawler
-from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from crawler.podcast.parse_pool import PARSE_POOL_KINDS, ParsePool
+from crawler.podcast.programme_list_cache import ProgrammeListCache
+from crawler.podcast.programme_list_crawler import ALL_LANGUAGES, ProgrammeListCrawler
+from crawler.podcast.response_cache import DEFAULT_TTLS, ResponseCache
+from crawler.podcast.retry_policy import RetryPolicy
+from crawler.podcast.rss_change_detector import FeedCheck, FeedState, RssChangeDetector, feed_states_path_for, \
+    read_feed_states, write_feed_states
+from crawler.podcast.shard import Shard, ShardManifest, manifest_path_for
+from crawler.podcast.work_queue import WorkQueue
+from csv_reader_writer.episodes_catalogue import is_parquet, is_sqlite, read_episode_table
+from csv_reader_writer.episodes_csv_stream_writer import EpisodesCsvStreamWriter
 from csv_reader_writer.episodes_csv_writer import EpisodesCsvWriter
 from model.podcast.episode import Episode
 from scripts.args import Args
 from util.paths import to_abs_path
 
+CRAWL_ORDERS = ['largest-first', 'discovered']
+
+INCREMENTAL_CSV_PATTERN = re.compile(r'(\d+)\.rthk\.tmp\.csv')
+
 UNSUPPORTED_PIDS = {
     113,  # 視像新聞
     874  # English Video News
 }
 
-ALL_LANGUAGES = [
-    'zh-CN',
-    'en-US'
-]
-
 
 @dataclass
 class ListPodcastProgrammesArgs(Args):
     csv_out: str
+    previous_csv_in: Optional[str]
+    recent_years: int
+    rss_changes_only: bool
+    skip_episode_pages: bool
     incremental: bool
+    checkpoint: bool
     parallelism: int
+    limit_per_host: int
+    read_timeout: float
+    max_attempts: int
+    request_deadline: float
+    url_rewrites: Dict[str, str]
+    http_cache_dir: Optional[str]
+    http_cache_max_mb: int
+    http_cache_ttls: List[Tuple[str, float]]
+    programme_list_cache: Optional[str]
+    programme_list_ttl: float
+    parse_pool: str
+    parse_workers: Optional[int]
+    pid_workers: int
+    eid_workers: int
+    merge_workers: int
+    crawl_order: str
     languages: List[str]
     pids: List[int]
+    shard: Optional[Shard]
 
 
 def configure(parser: argparse.ArgumentParser):
-    parser.add_argument('--csv-out', required=True, help='Path for output csv file')
+    parser.add_argument('--csv-out', required=True,
+                        help='Path for output csv file (use convert-episodes-catalogue for parquet or sqlite)')
+    parser.add_argument('--previous-csv-in',
+                        help='Path for csv, parquet or sqlite file of a previous crawl, to only crawl episodes added since')
+    parser.add_argument('--recent-years', type=int, default=1,
+                        help='With --previous-csv-in, how many of the latest years to re-crawl for every pid')
+    parser.add_argument('--rss-changes-only', default=False, action='store_true',
+                        help='With --previous-csv-in, only crawl pids whose RSS feed has episodes not in it. '
+                             'Feed validators are kept next to the csvs for conditional requests')
+    parser.add_argument('--skip-episode-pages', default=False, action='store_true',
+                        help='Whether to skip fetching a page per episode, leaving og_title, og_description and '
+                             'm3u8_url empty for new episodes')
     parser.add_argument('--incremental', default=False, action='store_true', help='Whether to save csvs per pid')
-    parser.add_argument('--parallelism', type=int, default=20, help='How many HTTP requests in parallel')
-    parser.add_argument('--lang', nargs='*', action='extend', choices=ALL_LANGUAGES, default=ALL_LANGUAGES,
-                        help='Languages to crawl')
+    parser.add_argument('--checkpoint', default=False, action='store_true',
+                        help='Whether to journal crawled years, episodes and pids next to --csv-out, '
+                             'so that a restarted crawl skips them')
+    parser.add_argument('--parallelism', type=int, default=20, help='Upper bound on HTTP requests in parallel')
+    parser.add_argument('--limit-per-host', type=int, default=0,
+                        help='Upper bound on HTTP connections in parallel per host (0 for --parallelism)')
+    parser.add_argument('--read-timeout', type=float, default=300, help='Seconds to wait for HTTP response data')
+    parser.add_argument('--max-attempts', type=int, default=5, help='How many times to try each HTTP request')
+    parser.add_argument('--request-deadline', type=float, default=600,
+                        help='Seconds after which a failing HTTP request is no longer retried')
+    parser.add_argument('--rewrite-url', nargs='+', action='extend', default=[], metavar='FROM_PREFIX=TO_PREFIX',
+                        help='Send requests for urls starting with FROM_PREFIX to TO_PREFIX, e.g. a replay server')
+    parser.add_argument('--http-cache-dir', help='Directory for caching HTTP responses between runs')
+    parser.add_argument('--http-cache-max-mb', type=int, default=1024, help='Size limit of the HTTP response cache')
+    parser.add_argument('--http-cache-ttl', nargs='+', action='extend', default=[], metavar='URL_REGEX=SECONDS',
+                        help='Serve cached responses for matching urls without revalidation for this long')
+    parser.add_argument('--programme-list-cache',
+                        help='Path of a json file keeping the listed programmes, shared with download-podcast')
+    parser.add_argument('--programme-list-ttl', type=float, default=24 * 3600,
+                        help='Seconds for which programmes in --programme-list-cache are used instead of listing them')
+    parser.add_argument('--parse-pool', choices=PARSE_POOL_KINDS, default='process',
+                        help='Where to parse responses, so that parsing overlaps with HTTP requests')
+    parser.add_argument('--parse-workers', type=int, help='Number of parse workers (defaults to number of CPUs)')
+    parser.add_argument('--pid-workers', type=int, default=10, help='Number of pids to crawl in parallel')
+    parser.add_argument('--eid-workers', type=int, default=0,
+                        help='Number of episode pages to crawl in parallel across pids (0 for --parallelism)')
+    parser.add_argument('--merge-workers', type=int, default=1,
+                        help='Number of processes merging the sorted runs and per-pid csvs into --csv-out')
+    parser.add_argument('--crawl-order', choices=CRAWL_ORDERS, default='largest-first',
+                        help='Order to start crawling pids in: largest-first estimates their number of episodes '
+                             'from --previous-csv-in, or from their number of years while crawling the others')
+    parser.add_argument('--lang', nargs='*', action='extend', choices=ALL_LANGUAGES,
+                        help='Languages to crawl (defaults to all)')
     parser.add_argument('--pid', nargs='*', action='extend', type=int, default=[], help='pids to crawl')
+    parser.add_argument('--shard', type=Shard.parse, metavar='INDEX/COUNT',
+                        help='Only crawl pids of this shard, e.g. 3/8, and write a manifest for merge-podcast-shards')
 
 
 def parse_args(raw_args: argparse.Namespace) -> ListPodcastProgrammesArgs:
     csv_out = raw_args.csv_out
+    if is_parquet(csv_out) or is_sqlite(csv_out):
+        raise argparse.ArgumentError(None, f'--csv-out must be a csv file, convert it with convert-episodes-catalogue: '
+                                           f'{csv_out}')
+    previous_csv_in = raw_args.previous_csv_in
+    recent_years = raw_args.recent_years
+    rss_changes_only = raw_args.rss_changes_only
+    if rss_changes_only and not previous_csv_in:
+        raise argparse.ArgumentError(None, '--rss-changes-only requires --previous-csv-in')
+    skip_episode_pages = raw_args.skip_episode_pages
     incremental = raw_args.incremental
+    checkpoint = raw_args.checkpoint
     parallelism = raw_args.parallelism
-    lang = raw_args.lang
+    limit_per_host = raw_args.limit_per_host
+    read_timeout = raw_args.read_timeout
+    max_attempts = raw_args.max_attempts
+    request_deadline = raw_args.request_deadline
+    url_rewrites = dict(rewrite.split('=', 1) for rewrite in raw_args.rewrite_url)
+    http_cache_dir = raw_args.http_cache_dir
+    http_cache_max_mb = raw_args.http_cache_max_mb
+    http_cache_ttls = []
+    for ttl in raw_args.http_cache_ttl:
+        pattern, _, seconds = ttl.rpartition('=')
+        if not pattern:
+            raise argparse.ArgumentError(None, f'--http-cache-ttl is not of the form URL_REGEX=SECONDS: {ttl}')
+        http_cache_ttls.append((pattern, float(seconds)))
+    programme_list_cache = raw_args.programme_list_cache
+    programme_list_ttl = raw_args.programme_list_ttl
+    parse_pool = raw_args.parse_pool
+    parse_workers = raw_args.parse_workers
+    pid_workers = raw_args.pid_workers
+    eid_workers = raw_args.eid_workers or parallelism
+    merge_workers = raw_args.merge_workers
+    crawl_order = raw_args.crawl_order
+    # Not a default of --lang, which action='extend' would append the given languages to
+    lang = raw_args.lang or ALL_LANGUAGES
     pid = raw_args.pid
+    shard = raw_args.shard
 
     return ListPodcastProgrammesArgs(
         csv_out=to_abs_path(csv_out),
+        previous_csv_in=to_abs_path(previous_csv_in) if previous_csv_in else None,
+        recent_years=recent_years,
+        rss_changes_only=rss_changes_only,
+        skip_episode_pages=skip_episode_pages,
         incremental=incremental,
+        checkpoint=checkpoint,
         parallelism=parallelism,
+        limit_per_host=limit_per_host,
+        read_timeout=read_timeout,
+        max_attempts=max_attempts,
+        request_deadline=request_deadline,
+        url_rewrites=url_rewrites,
+        http_cache_dir=to_abs_path(http_cache_dir) if http_cache_dir else None,
+        http_cache_max_mb=http_cache_max_mb,
+        http_cache_ttls=http_cache_ttls + DEFAULT_TTLS,
+        programme_list_cache=to_abs_path(programme_list_cache) if programme_list_cache else None,
+        programme_list_ttl=programme_list_ttl,
+        parse_pool=parse_pool,
+        parse_workers=parse_workers,
+        pid_workers=pid_workers,
+        eid_workers=eid_workers,
+        merge_workers=merge_workers,
+        crawl_order=crawl_order,
         languages=lang,
-        pids=pid
+        pids=pid,
+        shard=shard
     )
 
 
@@ -71,56 +203,196 @@ def run(args: ListPodcastProgrammesArgs):
 
 
 async def _crawl_and_save_podcast_site(args: ListPodcastProgrammesArgs):
-    sem = asyncio.Semaphore(args.parallelism)
+    response_cache = None
+    if args.http_cache_dir:
+        response_cache = ResponseCache(args.http_cache_dir,
+                                       max_size_bytes=args.http_cache_max_mb * 1024 ** 2,
+                                       ttls=args.http_cache_ttls)
+    async with HttpClient(parallelism=args.parallelism,
+                          limit_per_host=args.limit_per_host,
+                          read_timeout=args.read_timeout,
+                          retry_policy=RetryPolicy(max_attempts=args.max_attempts,
+                                                   deadline=args.request_deadline),
+                          url_rewrites=args.url_rewrites,
+                          response_cache=response_cache) as http_client, \
+            ParsePool(args.parse_pool, max_workers=args.parse_workers) as parse_pool:
+        await _crawl_and_save_podcast_site_with_client(args, http_client, parse_pool)
+
+
+async def _crawl_and_save_podcast_site_with_client(args: ListPodcastProgrammesArgs, http_client: HttpClient,
+                                                   parse_pool: ParsePool):
     working_dir = to_abs_path(os.path.join(args.csv_out, '..'))
 
-    pids_to_crawl = await _determine_pids_to_crawl(args.languages, args.pids, working_dir=working_dir, sem=sem)
+    programme_list_cache = None
+    if args.programme_list_cache:
+        programme_list_cache = ProgrammeListCache(args.programme_list_cache, ttl=args.programme_list_ttl)
+    discovered_pids = await _discover_pids(args.languages, args.pids, http_client=http_client, parse_pool=parse_pool,
+                                           programme_list_cache=programme_list_cache)
+    pids_to_crawl = _determine_pids_to_crawl(discovered_pids, working_dir=working_dir, shard=args.shard)
     logging.info(f'Will crawl pids: {pids_to_crawl}...')
 
-    episode_crawler = EpisodeListCrawler(sem)
-    all_episodes = []
-    with tqdm.tqdm(total=len(pids_to_crawl)) as progress_bar:
-        for task in asyncio.as_completed(list(map(episode_crawler.list_all_episodes, pids_to_crawl))):
-            pid, episodes_for_pid = await task
-            if args.incremental:
-                if not episodes_for_pid:
+    previous_episodes_by_pid = _read_previous_episodes(args.previous_csv_in) if args.previous_csv_in else {}
+    if args.shard:
+        previous_episodes_by_pid = {pid: episodes for pid, episodes in previous_episodes_by_pid.items()
+                                    if args.shard.contains(pid)}
+
+    feed_states = {}
+    if args.rss_changes_only:
+        feed_states = read_feed_states(feed_states_path_for(args.previous_csv_in))
+        pids_to_crawl, checked_feed_states = await _select_changed_pids(pids_to_crawl, previous_episodes_by_pid,
+                                                                        http_client, feed_states,
+                                                                        num_workers=args.pid_workers)
+        feed_states.update(checked_feed_states)
+
+    checkpoint_journal = None
+    if args.checkpoint:
+        checkpoint_journal = CheckpointJournal(f'{args.csv_out}.checkpoint.sqlite')
+        checkpoint_journal.open()
+        pids_to_crawl = list(set(pids_to_crawl) - set(checkpoint_journal.finished_pids()))
+        logging.info(f'Will crawl pids not finished before: {pids_to_crawl}...')
+
+    written_pids, empty_pids, failed_pids = set(), set(), set()
+    async with EpisodesCsvStreamWriter(args.csv_out, merge_parallelism=args.merge_workers) as episodes_writer, \
+            WorkQueue('pid', num_workers=args.pid_workers) as pid_work_queue, \
+            WorkQueue('eid', num_workers=args.eid_workers) as eid_work_queue:
+        episode_crawler = EpisodeListCrawler(http_client, parse_pool, eid_work_queue, checkpoint_journal)
+
+        async def _list_all_episodes(pid_and_programme_page: Tuple[int, Optional[Tuple[List[int], Episode]]]
+                                     ) -> Tuple[int, Optional[List[Episode]]]:
+            pid, programme_page = pid_and_programme_page
+            try:
+                return await episode_crawler.list_all_episodes(pid,
+                                                               known_episodes=previous_episodes_by_pid.get(pid, []),
+                                                               recent_years=args.recent_years,
+                                                               fetch_episode_pages=not args.skip_episode_pages,
+                                                               programme_page=programme_page)
+            except Exception:
+                # One failing pid shouldn't abort the crawl of the others
+                logging.warning(f'Failed to crawl pid {pid}, will keep its previous episodes', exc_info=True)
+                return pid, None
+
+        if args.crawl_order == 'largest-first':
+            logging.info('Will crawl known pids largest first, while estimating the sizes of the others...')
+            pids_and_programme_pages = largest_first_as_estimated(pids_to_crawl, previous_episodes_by_pid,
+                                                                  episode_crawler, num_workers=args.pid_workers)
+        else:
+            pids_and_programme_pages = ((pid, None) for pid in pids_to_crawl)
+
+        with tqdm.tqdm(total=len(pids_to_crawl)) as progress_bar:
+            async for pid, episodes_for_pid in pid_work_queue.map_unordered(_list_all_episodes,
+                                                                            pids_and_programme_pages):
+                if episodes_for_pid is None:
+                    failed_pids.add(pid)
+                elif not episodes_for_pid:
                     logging.warning(f'No episodes to write for pid: {pid}!')
+                    empty_pids.add(pid)
                 else:
-                    EpisodesCsvWriter(episodes_for_pid) \
-                        .write_to_csv(
-                        to_abs_path(os.path.join(args.csv_out, '..', f'{pid}.rthk.tmp.csv')))
-            else:
-                all_episodes.extend(episodes_for_pid)
-            progress_bar.update(1)
+                    if args.incremental:
+                        await asyncio.to_thread(EpisodesCsvWriter(episodes_for_pid).write_to_csv,
+                                                to_abs_path(os.path.join(args.csv_out, '..', f'{pid}.rthk.tmp.csv')))
+                    if checkpoint_journal:
+                        checkpoint_journal.record_finished_pid(pid, episodes_for_pid)
+                    await episodes_writer.write(episodes_for_pid)
+                    written_pids.add(pid)
+                progress_bar.set_postfix(http_client.host_limits(),
+                                         pids=pid_work_queue.counts,
+                                         eids=eid_work_queue.counts,
+                                         parse_queue=parse_pool.queue_depth,
+                                         write_queue=episodes_writer.pending_batches)
+                progress_bar.update(1)
+
+        if checkpoint_journal:
+            for pid, episodes_for_pid in checkpoint_journal.finished_pid_episodes():
+                if pid not in written_pids:
+                    await episodes_writer.write(episodes_for_pid)
+                    written_pids.add(pid)
+        if args.incremental:
+            written_pids |= _write_incremental_csvs(working_dir, episodes_writer, skip_pids=written_pids,
+                                                    shard=args.shard)
+        # Keep previous episodes of pids that were not crawled, e.g. no longer listed or crawl failed
+        for pid, previous_episodes in previous_episodes_by_pid.items():
+            if pid not in written_pids:
+                await episodes_writer.write(previous_episodes)
+                written_pids.add(pid)
+
+    if failed_pids:
+        logging.warning(f'Failed to crawl pids: {sorted(failed_pids)}')
+    if args.rss_changes_only:
+        # Feeds of failed pids are checked afresh next time, as their new episodes weren't crawled
+        for pid in failed_pids:
+            feed_states.pop(pid, None)
+        write_feed_states(feed_states_path_for(args.csv_out), feed_states)
+    if args.shard:
+        ShardManifest(shard=args.shard,
+                      discovered_pids=discovered_pids,
+                      written_pids=list(written_pids),
+                      empty_pids=list(empty_pids - written_pids)).write(manifest_path_for(args.csv_out))
+    if checkpoint_journal:
+        # Only reached once the csv is written, so the next crawl starts afresh
+        checkpoint_journal.delete()
+
+
+async def _select_changed_pids(pids: List[int], previous_episodes_by_pid: Dict[int, List[Episode]],
+                               http_client: HttpClient, feed_states: Dict[int, FeedState],
+                               num_workers: int) -> Tuple[List[int], Dict[int, FeedState]]:
+    # Returns the pids whose RSS feeds changed, and the feeds' validators for the next run
+    rss_change_detector = RssChangeDetector(http_client, feed_states)
+    changed_pids, checked_feed_states = [], {}
+    reasons = collections.Counter()
 
-    if args.incremental:
-        all_episodes = _combine_incremental_csvs(working_dir)
-    EpisodesCsvWriter(all_episodes).write_to_csv(args.csv_out)
+    async def _check(pid: int) -> FeedCheck:
+        return await rss_change_detector.check(pid, previous_episodes_by_pid.get(pid, []))
 
+    async with WorkQueue('rss', num_workers=num_workers) as rss_work_queue:
+        async for feed_check in rss_work_queue.map_unordered(_check, pids):
+            reasons[feed_check.reason] += 1
+            if feed_check.changed:
+                changed_pids.append(feed_check.pid)
+            if feed_check.state:
+                checked_feed_states[feed_check.pid] = feed_check.state
+    logging.info(f'{len(changed_pids)} of {len(pids)} pids changed according to their RSS feeds: {dict(reasons)}')
+    return changed_pids, checked_feed_states
 
-async def _determine_pids_to_crawl(languages: List[str], pids: List[int], working_dir: os.path,
-                                   sem: asyncio.Semaphore) -> List[int]:
+
+async def _discover_pids(languages: List[str], pids: List[int], http_client: HttpClient, parse_pool: ParsePool,
+                         programme_list_cache: Optional[ProgrammeListCache]) -> List[int]:
     if not pids:
-        programme_list_crawler = ProgrammeListCrawler(sem)
-        all_programmes = []
-        for language in languages:
-            programmes = await programme_list_crawler.list_programmes(language)
-            all_programmes.extend(programmes)
+        programme_list_crawler = ProgrammeListCrawler(http_client, parse_pool, programme_list_cache)
+        all_programmes = await programme_list_crawler.list_all_programmes(languages)
         pids = list(set(programme.pid for programme in all_programmes))
+    return list(set(pids) - UNSUPPORTED_PIDS)
+
 
+def _determine_pids_to_crawl(pids: List[int], working_dir: os.path, shard: Optional[Shard]) -> List[int]:
     already_done_pids = [
-        int(re.search("(\d+)\.rthk\.tmp\.csv", filename).group(1))
+        int(INCREMENTAL_CSV_PATTERN.search(filename).group(1))
         for filename in glob.iglob(os.path.join(working_dir, "*.rthk.tmp.csv"))
     ]
 
-    pids = list(set(pids) - set(already_done_pids) - UNSUPPORTED_PIDS)
+    pids = list(set(pids) - set(already_done_pids))
+    if shard:
+        pids = [pid for pid in pids if shard.contains(pid)]
     return pids
 
 
-def _combine_incremental_csvs(working_dir) -> List[Episode]:
-    all_episodes = []
-    reader = EpisodesCsvReader()
+def _write_incremental_csvs(working_dir: str, episodes_writer: EpisodesCsvStreamWriter,
+                            skip_pids: Set[int], shard: Optional[Shard]) -> Set[int]:
+    # The per-pid csvs are already sorted, so they are merged into the output as they are rather than read
+    written_pids = set()
     for filename in glob.iglob(os.path.join(working_dir, "*.rthk.tmp.csv")):
-        episodes = reader.read_to_episodes(filename)
-        all_episodes.extend(episodes)
-    return all_episodes
+        pid = int(INCREMENTAL_CSV_PATTERN.search(filename).group(1))
+        if pid not in skip_pids and (not shard or shard.contains(pid)):
+            episodes_writer.add_sorted_csv(filename)
+            written_pids.add(pid)
+    return written_pids
+
+
+def _read_previous_episodes(previous_csv_in: str) -> Dict[int, List[Episode]]:
+    previous_episodes_by_pid = collections.defaultdict(list)
+    # Previous episodes are held as rows of a compact table, which take a fraction of the memory of Episodes
+    for episode in read_episode_table(previous_csv_in):
+        previous_episodes_by_pid[episode.pid].append(episode)
+    logging.info(f'Read {sum(map(len, previous_episodes_by_pid.values()))} previous episodes '
+                 f'of {len(previous_episodes_by_pid)} pids')
+    return previous_episodes_by_pid
+
@@ -0,0 +1,52 @@
+import argparse
+import logging
+import os
+from dataclasses import dataclass
+from typing import List
+
+from crawler.podcast.shard import ShardManifest, find_conflicts, find_missing, manifest_path_for
+from csv_reader_writer.episodes_csv_merger import EpisodesCsvMerger
+from scripts.args import Args
+from util.paths import to_abs_path
+
+
+@dataclass
+class MergePodcastShardsArgs(Args):
+    csv_in: List[str]
+    csv_out: str
+    allow_missing: bool
+
+
+def configure(parser: argparse.ArgumentParser):
+    parser.add_argument('--csv-in', nargs='+', action='extend', required=True,
+                        help='Paths of csv files written by list-podcast-programmes --shard')
+    parser.add_argument('--csv-out', required=True, help='Path for output csv file')
+    parser.add_argument('--allow-missing', default=False, action='store_true',
+                        help='Whether to merge even if shards or pids are missing')
+
+
+def parse_args(raw_args: argparse.Namespace) -> MergePodcastShardsArgs:
+    csv_in = [to_abs_path(path) for path in raw_args.csv_in]
+    for path in csv_in:
+        if not os.path.isfile(manifest_path_for(path)):
+            raise argparse.ArgumentError(None, f'--csv-in has no shard manifest: {manifest_path_for(path)}')
+    return MergePodcastShardsArgs(
+        csv_in=csv_in,
+        csv_out=to_abs_path(raw_args.csv_out),
+        allow_missing=raw_args.allow_missing
+    )
+
+
+def run(args: MergePodcastShardsArgs):
+    manifests = [ShardManifest.read(manifest_path_for(path)) for path in args.csv_in]
+    conflicts, missing = find_conflicts(manifests), find_missing(manifests)
+    for problem in conflicts + missing:
+        logging.warning(problem)
+    if conflicts:
+        raise ValueError(f'Shards overlap: {conflicts}')
+    if missing and not args.allow_missing:
+        raise ValueError(f'Shards are incomplete: {missing}')
+
+    num_episodes = EpisodesCsvMerger(args.csv_in).merge_to_csv(args.csv_out)
+    num_pids = sum(len(manifest.written_pids) for manifest in manifests)
+    logging.info(f'Merged {len(manifests)} shards with {num_pids} pids and {num_episodes} episodes')
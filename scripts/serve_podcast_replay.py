@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import PODCAST_BASE_URL, SyntheticSite
+from crawler.podcast.response_cache import ResponseCache
+from scripts.args import Args
+from util.paths import to_abs_path
+
+
+@dataclass
+class ServePodcastReplayArgs(Args):
+    port: int
+    recorded_dir: Optional[str]
+    programmes: int
+    years: int
+    episodes_per_year: int
+    latency: float
+    bandwidth: Optional[int]
+    error_rate: float
+    no_range: bool
+
+
+def configure(parser: argparse.ArgumentParser):
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    parser.add_argument('--recorded-dir', help='HTTP cache directory from list-podcast-programmes to replay')
+    parser.add_argument('--programmes', type=int, default=100, help='Number of synthetic programmes')
+    parser.add_argument('--years', type=int, default=3, help='Number of years per synthetic programme')
+    parser.add_argument('--episodes-per-year', type=int, default=50, help='Number of synthetic episodes per year')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of latency added to every response')
+    parser.add_argument('--bandwidth', type=int, help='Bytes per second per response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--no-range', default=False, action='store_true', help='Disable Range request support')
+
+
+def parse_args(raw_args: argparse.Namespace) -> ServePodcastReplayArgs:
+    return ServePodcastReplayArgs(
+        port=raw_args.port,
+        recorded_dir=to_abs_path(raw_args.recorded_dir) if raw_args.recorded_dir else None,
+        programmes=raw_args.programmes,
+        years=raw_args.years,
+        episodes_per_year=raw_args.episodes_per_year,
+        latency=raw_args.latency,
+        bandwidth=raw_args.bandwidth,
+        error_rate=raw_args.error_rate,
+        no_range=raw_args.no_range
+    )
+
+
+def run(args: ServePodcastReplayArgs):
+    asyncio.run(
+        _serve_podcast_replay(
+            args
+        )
+    )
+
+
+async def _serve_podcast_replay(args: ServePodcastReplayArgs):
+    site = SyntheticSite(num_programmes=args.programmes,
+                         num_years=args.years,
+                         episodes_per_year=args.episodes_per_year)
+    recorded_cache = ResponseCache(args.recorded_dir) if args.recorded_dir else None
+    async with ReplayServer(site=site,
+                            recorded_cache=recorded_cache,
+                            latency=args.latency,
+                            bandwidth=args.bandwidth,
+                            error_rate=args.error_rate,
+                            range_support=not args.no_range,
+                            port=args.port) as server:
+        logging.info(f'Point crawlers at the replay server with: --rewrite-url {PODCAST_BASE_URL}={server.base_url}')
+        logging.info(f'Synthetic pids: {site.pids[0]}-{site.pids[-1]}')
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            logging.info(f'Replay server stats: {dict(server.stats)}')
@@ -0,0 +1,17 @@
+import pytest
+
+from scripts.args import parse_args
+
+
+@pytest.mark.parametrize('argv, message', [
+    (['list-podcast-programmes', '--csv-out', 'episodes.sqlite'], '--csv-out must be a csv file'),
+    (['list-podcast-programmes', '--csv-out', 'episodes.csv', '--rss-changes-only'],
+     '--rss-changes-only requires --previous-csv-in'),
+    (['convert-episodes-catalogue', '--catalogue-in', 'missing.csv', '--catalogue-out', 'episodes.sqlite'],
+     '--catalogue-in is not a file'),
+])
+def test_checks_after_parsing_are_usage_errors(capsys, argv, message):
+    with pytest.raises(SystemExit) as exit_info:
+        parse_args(argv)
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
@@ -0,0 +1,15 @@
+import argparse
+
+from crawler.podcast.programme_list_crawler import ALL_LANGUAGES
+from scripts import download_podcast
+
+
+def _parse_args(*args: str) -> download_podcast.DownloadPodcastArgs:
+    parser = argparse.ArgumentParser()
+    download_podcast.configure(parser)
+    return download_podcast.parse_args(parser.parse_args(['--out-dir', 'out', '--csv-in', 'episodes.csv', *args]))
+
+
+def test_lang_narrows_listed_programmes():
+    assert _parse_args('--all-listed', '--lang', 'en-US').languages == ['en-US']
+    assert _parse_args('--all-listed').languages == ALL_LANGUAGES
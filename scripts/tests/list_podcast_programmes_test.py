@@ -0,0 +1,60 @@
+import argparse
+import dataclasses
+
+import pytest
+
+from crawler.podcast.programme_list_crawler import ALL_LANGUAGES
+from crawler.podcast.replay.server import ReplayServer
+from crawler.podcast.replay.synthetic_site import SyntheticSite
+from crawler.podcast.shard import Shard
+from csv_reader_writer.episodes_catalogue import read_episodes, write_episodes
+from model.podcast.episode import Episode
+from scripts import list_podcast_programmes
+
+
+@pytest.mark.asyncio
+async def test_keeps_previous_episodes_of_pids_failing_to_crawl_offline(tmp_path):
+    site = SyntheticSite(num_programmes=2, num_years=1, episodes_per_year=3)
+    crawled_pid, failing_pid = site.pids
+    previous_episodes = [Episode(pid=failing_pid, eid=1, programme_title='Programme', episode_title='Episode')]
+    write_episodes(previous_episodes, str(tmp_path / 'previous.csv'))
+
+    async with ReplayServer(site) as server, ReplayServer(site, error_rate=1.0) as failing_server:
+        parser = argparse.ArgumentParser()
+        list_podcast_programmes.configure(parser)
+        args = list_podcast_programmes.parse_args(parser.parse_args([
+            '--csv-out', str(tmp_path / 'episodes.csv'),
+            '--previous-csv-in', str(tmp_path / 'previous.csv'),
+            '--max-attempts', '1',
+            '--parse-pool', 'inline',
+            '--pid', str(crawled_pid), str(failing_pid),
+        ]))
+        failing_prefix = f'https://podcast.rthk.hk/podcast/item.php?pid={failing_pid}'
+        args = dataclasses.replace(args, url_rewrites={
+            failing_prefix: f'{failing_server.base_url}/podcast/item.php?pid={failing_pid}',
+            **server.url_rewrites
+        })
+        await list_podcast_programmes._crawl_and_save_podcast_site(args)
+        # Only the page of the failing pid is requested from the failing server, once
+        assert failing_server.stats['requests'] == 1
+
+    episodes = read_episodes(str(tmp_path / 'episodes.csv'))
+    assert len([episode for episode in episodes if episode.pid == crawled_pid]) == 3
+    assert [episode for episode in episodes if episode.pid == failing_pid] == previous_episodes
+
+
+def _parse_args(*args: str) -> list_podcast_programmes.ListPodcastProgrammesArgs:
+    parser = argparse.ArgumentParser()
+    list_podcast_programmes.configure(parser)
+    return list_podcast_programmes.parse_args(parser.parse_args(['--csv-out', 'episodes.csv', *args]))
+
+
+def test_lang_narrows_languages():
+    assert _parse_args('--lang', 'zh-CN').languages == ['zh-CN']
+    assert _parse_args().languages == ALL_LANGUAGES
+
+
+def test_shard_must_be_index_of_count():
+    assert _parse_args('--shard', '3/8').shard == Shard(index=3, count=8)
+    with pytest.raises(SystemExit):
+        _parse_args('--shard', '9/8')
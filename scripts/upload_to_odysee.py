@@ -7,7 +7,7 @@ import re
 from dataclasses import dataclass
 from typing import List
 
-from csv_reader_writer.episodes_csv_reader import EpisodesCsvReader
+from csv_reader_writer.episodes_catalogue import read_episodes_by_pid_eid
 from model.odysee.publish import OdyseePublishApiRequest
 from scripts.args import Args
 from uploader.odysee_uploader import OdyseeUploader
@@ -25,7 +25,7 @@ class UploadToOdyseeArgs(Args):
 
 def configure(parser: argparse.ArgumentParser):
     parser.add_argument('--upload-dir', required=True, help='Directory containing video files to upload')
-    parser.add_argument('--csv-in', required=True, help='Path to podcast list csv')
+    parser.add_argument('--csv-in', required=True, help='Path to podcast list csv, parquet or sqlite file')
     parser.add_argument('--channel-id', required=True, help='Odysee channel id')
     parser.add_argument('--bid', type=str, default="0.001", help='Odysee bid')
     parser.add_argument('--with-date', default=False, action='store_true', help='Whether to add date to title')
@@ -63,13 +63,13 @@ async def _upload_to_odysee(args: UploadToOdyseeArgs):
 
 
 def _build_publish_requests(args: UploadToOdyseeArgs) -> List[OdyseePublishApiRequest]:
-    episodes = EpisodesCsvReader().read_to_episodes(args.csv_in)
-    episodes_by_pid_eid = {(e.pid, e.eid): e for e in episodes}
+    paths = sorted(glob.iglob(os.path.join(args.upload_dir, 'rthk_*_*.*')), reverse=True)
+    matches = [(path, re.fullmatch(r'rthk_(\d+)_(\d+)\.[^.]+', path.rsplit('/', 1)[1])) for path in paths]
+    episodes_by_pid_eid = read_episodes_by_pid_eid(args.csv_in, [(int(match.group(1)), int(match.group(2)))
+                                                                 for _, match in matches if match])
     date_collision_counter = collections.Counter()
     publish_requests = []
-    for path in sorted(glob.iglob(os.path.join(args.upload_dir, 'rthk_*_*.*')), reverse=True):
-        filename = path.rsplit('/', 1)[1]
-        match = re.fullmatch(r'rthk_(\d+)_(\d+)\.[^.]+', filename)
+    for path, match in matches:
         if match:
             pid, eid = int(match.group(1)), int(match.group(2))
             episode = episodes_by_pid_eid[(pid, eid)]
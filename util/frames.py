@@ -0,0 +1,86 @@
+import ast
+import logging
+from typing import List, NamedTuple, Type, TypeVar
+
+import pandas as pd
+
+T = TypeVar('T', bound=NamedTuple)
+
+
+def ymd_column_to_dates(column: pd.Series) -> pd.Series:
+    """
+    Parses a column of ymd strings at once, with NaT for empty and unparsable dates.
+
+    >>> ymd_column_to_dates(pd.Series(['2021-01-02', None])).tolist()
+    [Timestamp('2021-01-02 00:00:00'), NaT]
+    """
+    dates = pd.to_datetime(column, format='%Y-%m-%d', errors='coerce')
+    for ymd_str in column[dates.isna() & column.notna()]:
+        logging.warning(f"Failed to parse ymd string: {ymd_str}")
+    return dates
+
+
+def literal_column_to_lists(column: pd.Series) -> List[list]:
+    """
+    Parses a column of list literals, each distinct literal only once, with [] for empty cells.
+
+    >>> literal_column_to_lists(pd.Series(['[1, 2]', None, '[1, 2]']))
+    [[1, 2], [], [1, 2]]
+    """
+    parsed = {literal: ast.literal_eval(literal) for literal in column.dropna().unique()}
+    # Every row gets its own list, as rows don't share lists when parsed one by one
+    return [list(parsed[literal]) if isinstance(literal, str) else [] for literal in column.tolist()]
+
+
+def column_to_list(column: pd.Series) -> list:
+    """
+    Converts a column to python values, with None for nan and NaT.
+
+    >>> column_to_list(pd.Series([1.0, float('nan')]))
+    [1.0, None]
+    >>> column_to_list(pd.Series(['a', None, float('nan')]))
+    ['a', None, None]
+    """
+    values = column.astype(object)
+    return values.where(column.notna(), None).tolist()
+
+
+def frame_to_columns(frame: pd.DataFrame, tuple_type: Type[T], converted_columns: dict = None) -> List[list]:
+    """
+    Values of the fields of tuple_type from the columns of frame, taking converted_columns as they are and leaving
+    fields without a column at their defaults.
+
+    >>> class Row(NamedTuple):
+    ...     a: int
+    ...     b: str = None
+    >>> frame_to_columns(pd.DataFrame({'a': [1, 2]}), Row)
+    [[1, 2], [None, None]]
+    """
+    converted_columns = converted_columns or {}
+    num_rows = len(frame)
+    columns = []
+    for field in tuple_type._fields:
+        if field in converted_columns:
+            columns.append(converted_columns[field])
+        elif field in frame.columns:
+            columns.append(column_to_list(frame[field]))
+        else:
+            columns.append([tuple_type._field_defaults[field]] * num_rows)
+    return columns
+
+
+def frame_to_tuples(frame: pd.DataFrame, tuple_type: Type[T], converted_columns: dict = None) -> List[T]:
+    """
+    >>> class Row(NamedTuple):
+    ...     a: int
+    ...     b: str = None
+    >>> frame_to_tuples(pd.DataFrame({'a': [1, 2]}), Row)
+    [Row(a=1, b=None), Row(a=2, b=None)]
+    """
+    return list(map(tuple_type._make, zip(*frame_to_columns(frame, tuple_type, converted_columns))))
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
@@ -1,5 +1,31 @@
+import contextlib
 import os
+import uuid
+from typing import Iterator
 
 
 def to_abs_path(path: str) -> str:
     return os.path.abspath(os.path.expanduser(path))
+
+
+def unique_tmp_path_for(path: str) -> str:
+    # Next to path, so that it can replace path, and unique, so that concurrent writers of path don't share it
+    return f'{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+
+
+@contextlib.contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """
+    Yields a temporary path to write instead of path, which then replaces path, so that a crash while writing leaves
+    either the old or the new file and never a partial one. The temporary file is removed if writing fails.
+    """
+    tmp_path = unique_tmp_path_for(path)
+    try:
+        yield tmp_path
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise